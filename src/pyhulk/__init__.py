@@ -0,0 +1,3 @@
+__version__ = "0.1.0"
+
+from pyhulk.api import Program, compile, cache_stats, set_cache_size, clear_cache
@@ -0,0 +1,112 @@
+"""
+Embedding API, for evaluating the same formulas many times:
+
+    program = pyhulk.compile("x * 2 + y;")
+    program.evaluate({"x": 1, "y": 2})
+
+`compile` keeps the compiled programs in a bounded, thread safe LRU cache
+keyed by source text, so repeated formulas skip lexing, parsing and code
+generation. Programs are translated to Python by `pyhulk.transpiler` once;
+every evaluation runs that code against its own global namespace, so a
+`Program` can be evaluated from several threads at the same time.
+"""
+from collections import OrderedDict
+from types import FunctionType
+import builtins
+import threading
+
+from pyhulk.lexer import tokenize
+from pyhulk.natives import flush
+from pyhulk.optimizer import optimize
+from pyhulk.parser import Parser
+from pyhulk.transpiler import python_name, transpile
+
+DEFAULT_CACHE_SIZE = 1024
+
+class Program:
+
+    def __init__(self, text: str, opt_level=1):
+        self.text = text
+        tree = optimize(Parser(tokenize(text)).parse(), opt_level)
+        namespace = {}
+        exec(builtins.compile(transpile(tree), "<hulk>", "exec"), namespace)
+        self._code = namespace["hulk_main"].__code__
+
+    def evaluate(self, bindings: dict = None):
+        """
+        Value of the last statement, `bindings` maps global variable
+        names to their values
+        """
+        namespace = {python_name(name): value for name, value in (bindings or {}).items()}
+        try:
+            return FunctionType(self._code, namespace)()
+        finally:
+            flush()
+
+    def __repr__(self):
+        return f"<(Program) [text: {self.text!r}]>"
+
+class ProgramCache:
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._programs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Program:
+        with self._lock:
+            program = self._programs.get(text)
+            if program is not None:
+                self._programs.move_to_end(text)
+                self.hits += 1
+                return program
+            self.misses += 1
+
+        # compiled outside the lock, a racing thread only wastes some work
+        program = Program(text)
+
+        with self._lock:
+            self._programs[text] = program
+            self._programs.move_to_end(text)
+            while len(self._programs) > self.maxsize:
+                self._programs.popitem(last=False)
+                self.evictions += 1
+        return program
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._programs) > self.maxsize:
+                self._programs.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._programs.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._programs),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+PROGRAMS = ProgramCache()
+
+def compile(text: str) -> Program:
+    return PROGRAMS.get(text)
+
+def cache_stats() -> dict:
+    return PROGRAMS.stats()
+
+def set_cache_size(maxsize: int):
+    PROGRAMS.resize(maxsize)
+
+def clear_cache():
+    PROGRAMS.clear()
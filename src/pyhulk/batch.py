@@ -0,0 +1,184 @@
+"""
+Many scripts, or one program over many sets of bindings, on a process pool.
+
+    for result in run_files(paths, engine="closure", workers=8):
+        print(result.task, result.value, result.error)
+
+    for result in evaluate_many("x * 2 + y;", [{"x": 1, "y": 2}, ...]):
+        ...
+
+Tasks are sent to the workers in chunks. A task that raises, or runs for
+longer than `timeout` seconds, gets a `Result` with its error and doesn't
+affect the others, and a worker that dies only takes its own task down: the
+tasks it was holding are retried one at a time. Results come in the order
+of the tasks, or as they finish with `ordered=False`.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import os
+import signal
+import time
+
+from pyhulk.api import Program
+from pyhulk.cache import load_program
+from pyhulk.parser import Context, Interpreter
+
+DEFAULT_CHUNKSIZE = 16
+
+class TaskTimeout(Exception):
+    pass
+
+class Result:
+    __slots__ = ("index", "task", "value", "error", "elapsed")
+
+    def __init__(self, index: int, task, value=None, error: str = None, elapsed: float = 0.0):
+        self.index = index
+        self.task = task
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"<(Result) [index: {self.index}, value: {self.value!r}, error: {self.error}]>"
+
+def _timeout(signum, frame):
+    raise TaskTimeout()
+
+def _run_chunk(function, chunk: list, timeout: float = None) -> list:
+    """In a worker, run every (index, task) of `chunk` on its own"""
+    # SIGALRM interrupts the task, there's no way to stop a worker from outside
+    alarm = timeout and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, _timeout)
+    results = []
+    for index, task in chunk:
+        start = time.perf_counter()
+        value = error = None
+        try:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                value = function(task)
+            finally:
+                if alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except TaskTimeout:
+            error = f"timed out after {timeout}s"
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        results.append(Result(index, task, value, error, time.perf_counter() - start))
+    return results
+
+class BatchRunner:
+
+    def __init__(
+        self,
+        workers: int = None,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        timeout: float = None,
+        ordered=True,
+        initializer=None,
+        initargs=(),
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = max(chunksize, 1)
+        self.timeout = timeout
+        self.ordered = ordered
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def _pool(self, workers):
+        return ProcessPoolExecutor(workers, initializer=self.initializer, initargs=self.initargs)
+
+    def _unordered(self, function, tasks: list):
+        chunks = [tasks[start:start + self.chunksize] for start in range(0, len(tasks), self.chunksize)]
+        # tasks of the chunks a dead worker took down
+        suspects = []
+        with self._pool(self.workers) as pool:
+            futures = {pool.submit(_run_chunk, function, chunk, self.timeout): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    suspects.extend(futures[future])
+                    continue
+                yield from results
+
+        # alone in their own worker, a crash only fails the task that caused it
+        pool = None
+        try:
+            for task in suspects:
+                if pool is None:
+                    pool = self._pool(1)
+                try:
+                    yield from pool.submit(_run_chunk, function, [task], self.timeout).result()
+                except BrokenProcessPool:
+                    yield Result(task[0], task[1], error="the worker process died")
+                    pool.shutdown()
+                    pool = None
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def run(self, function, tasks):
+        """
+        `Result`s of `function(task)` for every task, `function` must be
+        importable by the workers
+        """
+        tasks = list(enumerate(tasks))
+        results = self._unordered(function, tasks)
+        if not self.ordered:
+            yield from results
+            return
+
+        waiting = {}
+        expected = 0
+        for result in results:
+            waiting[result.index] = result
+            while expected in waiting:
+                yield waiting.pop(expected)
+                expected += 1
+
+# state of a worker process, set by the initializers
+_WORKER = {}
+
+def _init_files(engine, opt_level, options):
+    _WORKER.update(engine=engine, opt_level=opt_level, options=options)
+
+def run_file(path):
+    tree = load_program(path, _WORKER["opt_level"])
+    interpreter = Interpreter(engine=_WORKER["engine"], tree=tree, **_WORKER["options"])
+    interpreter.GLOBAL_SCOPE = Context()
+    return interpreter.interpret()
+
+def _init_program(text):
+    # compiled once per worker
+    _WORKER["program"] = Program(text)
+
+def evaluate(bindings):
+    return _WORKER["program"].evaluate(bindings)
+
+def run_files(
+    paths,
+    engine="tree",
+    opt_level=0,
+    workers=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+    timeout=None,
+    ordered=True,
+    **options,
+):
+    runner = BatchRunner(
+        workers, chunksize, timeout, ordered, initializer=_init_files, initargs=(engine, opt_level, options)
+    )
+    return runner.run(run_file, [str(path) for path in paths])
+
+def evaluate_many(text: str, bindings, workers=None, chunksize=DEFAULT_CHUNKSIZE, timeout=None, ordered=True):
+    # fail here on a syntax error, not once per task
+    Program(text)
+    runner = BatchRunner(workers, chunksize, timeout, ordered, initializer=_init_program, initargs=(text,))
+    return runner.run(evaluate, bindings)
@@ -0,0 +1,213 @@
+"""
+Benchmarks of the whole pipeline.
+
+Every repetition runs a program from scratch and times each phase on its
+own: lexing into a `TokenBuffer`, parsing it, optimizing and evaluating
+(the engines compile the tree while evaluating it). Results are in milliseconds:
+
+    pyhulk bench --engine closure --save baseline.json
+    pyhulk bench --engine closure --baseline baseline.json
+
+The second command exits with an error when a phase got slower than the
+baseline by more than `--threshold`.
+"""
+from contextlib import contextmanager
+from statistics import median
+import json
+import sys
+import time
+
+from pyhulk import __version__
+from pyhulk.lexer import tokenize
+from pyhulk.optimizer import optimize
+from pyhulk.parser import Context, Interpreter, Parser, tree_size
+
+PHASES = ("lex", "parse", "optimize", "evaluate")
+# the tree walker needs a few Python frames per HULK call
+RECURSION_LIMIT = 20_000
+# phases faster than this (ms) are mostly noise, don't flag them
+MIN_COMPARED = 0.05
+
+class Benchmark:
+
+    def __init__(self, name: str, description: str, sources: list):
+        self.name = name
+        self.description = description
+        self.sources = sources
+
+    def __repr__(self):
+        return f"<(Benchmark) [name: {self.name}]>"
+
+def _fib():
+    return [
+        "function fib(n) => if (n > 1) fib(n - 1) + fib(n - 2) else n;"
+        "fib(16);"
+    ]
+
+def _recursion():
+    return [
+        "function down(n) => if (n > 0) 1 + down(n - 1) else 0;"
+        "down(800);"
+    ]
+
+def _arithmetic():
+    # functions only see themselves in the tree walker, no helper for the body
+    return [
+        "function total(n) => if (n > 0)"
+        " 3 * n ^ 3 + 2 * n ^ 2 - 5 * n + 7 % 3 / 2 - n / 4 * 1.5 + total(n - 1)"
+        " else 0;"
+        "total(400);"
+    ]
+
+def _lexer():
+    lines = []
+    for i in range(2000):
+        lines.append(f"var v{i} = {i} * 2 + 3.25 / (1 + {i % 7});")
+        lines.append(f'"line {i}";')
+    return ["\n".join(lines)]
+
+def _formulas():
+    return [f"({i} + 1) * 2 - {i} / 3 + {i % 5} ^ 2;" for i in range(300)]
+
+def _let_chain():
+    # every `let` gets a fresh scope in the tree walker, only the innermost
+    # binding is visible to the body
+    depth = 150
+    head = "".join(f"let a{i} = {i} * 2 in " for i in range(depth))
+    return [head + f"a{depth - 1} + 1;"]
+
+BENCHMARKS = {
+    benchmark.name: benchmark
+    for benchmark in (
+        Benchmark("fib", "doubly recursive calls", _fib()),
+        Benchmark("recursion", "deep non tail recursion", _recursion()),
+        Benchmark("arithmetic", "arithmetic heavy function bodies", _arithmetic()),
+        Benchmark("lexer", "large generated script", _lexer()),
+        Benchmark("formulas", "many small programs", _formulas()),
+        Benchmark("let_chain", "long nested let-in chain", _let_chain()),
+    )
+}
+
+@contextmanager
+def recursion_limit(limit: int):
+    old = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old, limit))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(old)
+
+def measure(benchmark: Benchmark, engine="tree", opt_level=0) -> dict:
+    """Seconds spent in each phase by one run of `benchmark`"""
+    timer = time.perf_counter
+    timings = dict.fromkeys(PHASES, 0.0)
+    with recursion_limit(RECURSION_LIMIT):
+        for text in benchmark.sources:
+            start = timer()
+            tokens = tokenize(text)
+            lexed = timer()
+            tree = Parser(tokens).parse()
+            parsed = timer()
+            tree = optimize(tree, opt_level)
+            optimized = timer()
+            interpreter = Interpreter(engine=engine, tree=tree)
+            interpreter.GLOBAL_SCOPE = Context()
+            interpreter.interpret()
+            evaluated = timer()
+
+            timings["lex"] += lexed - start
+            timings["parse"] += parsed - lexed
+            timings["optimize"] += optimized - parsed
+            timings["evaluate"] += evaluated - optimized
+    return timings
+
+def run_benchmark(benchmark: Benchmark, engine="tree", opt_level=0, warmup=1, repeat=5) -> dict:
+    """min and median time (ms) of each phase"""
+    for _ in range(warmup):
+        measure(benchmark, engine, opt_level)
+    runs = [measure(benchmark, engine, opt_level) for _ in range(repeat)]
+    return {
+        phase: {
+            "min": min(run[phase] for run in runs) * 1000,
+            "median": median(run[phase] for run in runs) * 1000,
+        }
+        for phase in PHASES
+    }
+
+def ast_size(benchmark: Benchmark, opt_level=0) -> dict:
+    """Nodes and bytes of the (optimized) trees of `benchmark`"""
+    nodes = size = 0
+    with recursion_limit(RECURSION_LIMIT):
+        for text in benchmark.sources:
+            tree_nodes, tree_bytes = tree_size(optimize(Parser(tokenize(text)).parse(), opt_level))
+            nodes += tree_nodes
+            size += tree_bytes
+    return {"nodes": nodes, "bytes": size}
+
+def run_suite(names: list = None, engine="tree", opt_level=0, warmup=1, repeat=5) -> dict:
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks {unknown}, expected some of {list(BENCHMARKS)}")
+    return {
+        "version": __version__,
+        "engine": engine,
+        "opt_level": opt_level,
+        "warmup": warmup,
+        "repeat": repeat,
+        "benchmarks": {
+            name: run_benchmark(BENCHMARKS[name], engine, opt_level, warmup, repeat)
+            for name in names
+        },
+        "ast": {name: ast_size(BENCHMARKS[name], opt_level) for name in names},
+    }
+
+def compare(results: dict, baseline: dict, threshold=0.1) -> list:
+    """
+    (benchmark, phase, baseline ms, current ms) of every phase whose median
+    is more than `threshold` slower than in `baseline`
+    """
+    for key in ("engine", "opt_level"):
+        if baseline.get(key) != results[key]:
+            raise ValueError(f"The baseline was run with {key} {baseline.get(key)}, not {results[key]}")
+    regressions = []
+    for name, phases in results["benchmarks"].items():
+        old_phases = baseline.get("benchmarks", {}).get(name)
+        if old_phases is None:
+            continue
+        for phase, timing in phases.items():
+            old = old_phases.get(phase, {}).get("median")
+            if old is None or old < MIN_COMPARED:
+                continue
+            if timing["median"] > old * (1 + threshold):
+                regressions.append((name, phase, old, timing["median"]))
+    return regressions
+
+def format_results(results: dict) -> str:
+    lines = [
+        f"engine {results['engine']}, opt level {results['opt_level']}, "
+        f"median of {results['repeat']} (ms)",
+        f"{'benchmark':<12}" + "".join(f"{phase:>12}" for phase in PHASES) + f"{'nodes':>10}{'AST KiB':>10}",
+    ]
+    for name, phases in results["benchmarks"].items():
+        ast = results["ast"][name]
+        lines.append(
+            f"{name:<12}"
+            + "".join(f"{phases[phase]['median']:>12.3f}" for phase in PHASES)
+            + f"{ast['nodes']:>10}{ast['bytes'] / 1024:>10.1f}"
+        )
+    return "\n".join(lines)
+
+def format_regressions(regressions: list) -> str:
+    return "\n".join(
+        f"{name} {phase}: {old:.3f} ms -> {new:.3f} ms ({new / old - 1:+.0%})"
+        for name, phase, old, new in regressions
+    )
+
+def load_baseline(path) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+def save_results(results: dict, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
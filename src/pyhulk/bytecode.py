@@ -0,0 +1,254 @@
+"""
+Compiler from the tree produced by `Parser.parse` to a flat bytecode.
+
+Every instruction takes two slots of `Code.instructions`: the opcode and
+its argument (0 when the opcode doesn't need one). Every expression leaves
+exactly one value on the stack.
+
+Names are scoped like the tree walker does: the top level reads the
+globals, a function body its parameters and the function itself and a
+`let` only its own bindings, anything else raises NameError when it's read.
+
+Calls in tail position of a function body (the body itself, the branches
+of a conditional in tail position, the body of a `let` in tail position)
+compile to TAIL_CALL, which reuses the frame of the caller.
+"""
+from enum import IntEnum
+from typing import List
+import weakref
+
+from pyhulk.parser import (
+    BlockNode,
+    Division,
+    Equals,
+    Exp,
+    FunctionDeclaration,
+    Higher,
+    Lower,
+    Modulo,
+    Mult,
+    Substraction,
+    Sum,
+)
+
+class Op(IntEnum):
+    CONST = 1
+    LOAD_LOCAL = 2
+    STORE_LOCAL = 3
+    LOAD_GLOBAL = 4
+    STORE_GLOBAL = 5
+    POP = 6
+    ADD = 7
+    SUB = 8
+    MUL = 9
+    DIV = 10
+    MOD = 11
+    POW = 12
+    EQ = 13
+    GT = 14
+    LT = 15
+    JUMP = 16
+    JUMP_IF_FALSE = 17
+    CALL = 18
+    RETURN = 19
+    TAIL_CALL = 20
+    CALL_NATIVE = 21
+    LOAD_UNBOUND = 22
+
+BINARY_OPS = {
+    Sum: Op.ADD,
+    Substraction: Op.SUB,
+    Mult: Op.MUL,
+    Division: Op.DIV,
+    Modulo: Op.MOD,
+    Exp: Op.POW,
+    Equals: Op.EQ,
+    Higher: Op.GT,
+    Lower: Op.LT,
+}
+
+class CompileError(Exception):
+    pass
+
+class Code:
+    """
+    A compiled function (or the top level of a program)
+    """
+
+    def __init__(
+        self, name, nargs: int, nlocals: int, instructions: List[int], constants: list, self_slot: int = None
+    ):
+        self.name = name
+        self.nargs = nargs
+        self.nlocals = nlocals
+        # where a call puts the function, its body sees it by name
+        self.self_slot = self_slot
+        self.instructions = instructions
+        self.constants = constants
+
+    def disassemble(self):
+        lines = []
+        for pc in range(0, len(self.instructions), 2):
+            op = Op(self.instructions[pc])
+            arg = self.instructions[pc + 1]
+            line = f"{pc:>5} {op.name:<15} {arg}"
+            if op in {Op.CONST, Op.LOAD_GLOBAL, Op.STORE_GLOBAL, Op.LOAD_UNBOUND}:
+                line += f" ({self.constants[arg]!r})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def __str__(self):
+        return f"<(Code) [name: {self.name}, nargs: {self.nargs}, nlocals: {self.nlocals}]>"
+
+    def __repr__(self):
+        return self.__str__()
+
+class Compiler:
+    """
+    Compiles a single `Code` object.
+
+    Names bound by function parameters and `let` are stored in local slots,
+    names read at the top level are looked up in the global scope at runtime.
+    """
+
+    def __init__(self, name=None, params: List = ()):
+        self.name = name
+        self.instructions = []
+        self.constants = []
+        self._constant_index = {}
+        self.scopes = [{}]
+        self.nlocals = 0
+
+        for param in params:
+            self.declare(param.name)
+        self.nargs = len(params)
+        # after the parameters, it hides one with the same name
+        self.self_slot = self.declare(name) if name is not None else None
+
+    def emit(self, op: Op, arg: int = 0):
+        self.instructions.append(int(op))
+        self.instructions.append(arg)
+        return len(self.instructions) - 2
+
+    def patch(self, index: int):
+        """Point the jump at `index` to the next instruction"""
+        self.instructions[index + 1] = len(self.instructions)
+
+    def constant(self, value):
+        # 1, 1.0 and True are equal but not interchangeable
+        key = (type(value), value) if isinstance(value, (int, float, str)) else (type(value), id(value))
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self._constant_index[key]
+
+    def declare(self, name):
+        self.scopes[-1][name.value] = self.nlocals
+        self.nlocals += 1
+        return self.nlocals - 1
+
+    def resolve(self, name):
+        """Slot of `name`, the scopes around the innermost one aren't seen"""
+        return self.scopes[-1].get(name.value)
+
+    def load(self, name):
+        slot = self.resolve(name)
+        if slot is not None:
+            self.emit(Op.LOAD_LOCAL, slot)
+        elif self.name is None and len(self.scopes) == 1:
+            self.emit(Op.LOAD_GLOBAL, self.constant(name))
+        else:
+            self.emit(Op.LOAD_UNBOUND, self.constant(name))
+
+    def compile(self, node) -> Code:
+        # only function bodies return into a caller
+        self.visit(node, tail=self.name is not None)
+        self.emit(Op.RETURN)
+        return Code(self.name, self.nargs, self.nlocals, self.instructions, self.constants, self.self_slot)
+
+    def visit(self, node, tail=False):
+        if type(node) in BINARY_OPS:
+            return self.visit_binary(node, BINARY_OPS[type(node)])
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            raise CompileError(f"Can't compile {type(node).__name__}")
+        return method(node, tail)
+
+    def visit_Literal(self, node, tail=False):
+        self.emit(Op.CONST, self.constant(node._val))
+
+    visit_StrLiteral = visit_IntLiteral = visit_FloatLiteral = visit_BookLiteral = visit_Literal
+
+    def visit_binary(self, node, op):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(op)
+
+    def visit_BlockNode(self, node, tail=False):
+        if not node.blocks:
+            self.emit(Op.CONST, self.constant(None))
+            return
+        for index, block in enumerate(node.blocks):
+            if index:
+                self.emit(Op.POP)
+            self.visit(block, tail and index == len(node.blocks) - 1)
+
+    def visit_NonExpression(self, node, tail=False):
+        self.emit(Op.CONST, self.constant(None))
+
+    def visit_Variable(self, node, tail=False):
+        self.load(node.name)
+
+    def visit_VariableDeclaration(self, node, tail=False):
+        # `var` is only allowed at the top level, `let` bindings are
+        # handled by `visit_Lambda`
+        self.visit(node.expression)
+        self.emit(Op.STORE_GLOBAL, self.constant(node.name))
+        self.emit(Op.CONST, self.constant(None))
+
+    def visit_FunctionDeclaration(self, node, tail=False):
+        self.emit(Op.CONST, self.constant(node))
+        self.emit(Op.STORE_GLOBAL, self.constant(node.name))
+        self.emit(Op.CONST, self.constant(None))
+
+    def visit_Function(self, node, tail=False):
+        self.load(node.name)
+        for arg in node.args.blocks:
+            self.visit(arg)
+        self.emit(Op.TAIL_CALL if tail else Op.CALL, len(node.args.blocks))
+
+    def visit_NativeCall(self, node, tail=False):
+        for arg in node.args.blocks:
+            self.visit(arg)
+        # a native never takes the frame of its caller
+        self.emit(Op.CALL_NATIVE, self.constant((node.native.function, len(node.args.blocks))))
+
+    def visit_Lambda(self, node, tail=False):
+        self.scopes.append({})
+        for declaration in node.variables.blocks:
+            self.visit(declaration.expression)
+            self.emit(Op.STORE_LOCAL, self.declare(declaration.name))
+        self.visit(node.block_statement, tail)
+        self.scopes.pop()
+
+    def visit_Conditional(self, node, tail=False):
+        self.visit(node.hipotesis)
+        to_else = self.emit(Op.JUMP_IF_FALSE)
+        self.visit(node.tesis, tail)
+        to_end = self.emit(Op.JUMP)
+        self.patch(to_else)
+        self.visit(node.antitesis, tail)
+        self.patch(to_end)
+
+# FunctionDeclaration -> Code, compiled on the first call
+_FUNCTIONS = weakref.WeakKeyDictionary()
+
+def compile_function(fun_decl: FunctionDeclaration) -> Code:
+    code = _FUNCTIONS.get(fun_decl)
+    if code is None:
+        compiler = Compiler(fun_decl.name, fun_decl.args.blocks)
+        code = _FUNCTIONS[fun_decl] = compiler.compile(fun_decl.block_node)
+    return code
+
+def compile_program(tree: BlockNode) -> Code:
+    return Compiler().compile(tree)
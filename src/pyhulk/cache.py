@@ -0,0 +1,251 @@
+"""
+On-disk cache of parsed (and optimized) programs.
+
+Like `__pycache__`, the tree of `dir/script.hulk` is stored in
+`dir/__hulkcache__/script.pyhulk-<version>.hulkc` together with the hash of
+the source, the optimization level it was built with and the registered
+natives (calls to them are parsed differently). A cache file that doesn't
+match is rebuilt.
+
+Trees are encoded as nested tuples of primitive values and written with
+`marshal`, which is compact, fast to load and doesn't run code like pickle.
+"""
+from pathlib import Path
+import gc
+import hashlib
+import marshal
+import os
+import tempfile
+
+from pyhulk import __version__
+from pyhulk.lexer import Token, Tokens, tokenize
+from pyhulk.natives import signature
+from pyhulk.parser import (
+    BlockNode,
+    BookLiteral,
+    Conditional,
+    Division,
+    Equals,
+    Exp,
+    FloatLiteral,
+    Function,
+    FunctionDeclaration,
+    Higher,
+    IntLiteral,
+    Lambda,
+    Lower,
+    Modulo,
+    Mult,
+    NativeCall,
+    NonExpression,
+    Parser,
+    StrLiteral,
+    Substraction,
+    Sum,
+    Variable,
+    VariableDeclaration,
+)
+
+MAGIC = "pyhulk-tree"
+# bump when the encoding changes
+FORMAT_VERSION = 3
+CACHE_DIR = "__hulkcache__"
+
+# the position of a class is its tag in the encoded tree, only append
+NODE_TYPES = [
+    BlockNode,
+    StrLiteral,
+    IntLiteral,
+    FloatLiteral,
+    BookLiteral,
+    Sum,
+    Substraction,
+    Division,
+    Mult,
+    Modulo,
+    Exp,
+    Equals,
+    Higher,
+    Lower,
+    VariableDeclaration,
+    Variable,
+    FunctionDeclaration,
+    Function,
+    Lambda,
+    NonExpression,
+    Conditional,
+    NativeCall,
+]
+TAGS = {cls: tag for tag, cls in enumerate(NODE_TYPES)}
+LITERALS = (StrLiteral, IntLiteral, FloatLiteral, BookLiteral)
+BINARY = (Sum, Substraction, Division, Mult, Modulo, Exp, Equals, Higher, Lower)
+
+class CacheError(Exception):
+    pass
+
+def encode(node) -> tuple:
+    cls = type(node)
+    tag = TAGS.get(cls)
+    if tag is None:
+        raise CacheError(f"Can't encode {cls.__name__}")
+    if cls in LITERALS:
+        return (tag, node._val)
+    if cls in BINARY:
+        return (tag, encode(node.left), encode(node.right))
+    if cls is BlockNode:
+        return (tag, tuple(encode(block) for block in node.blocks))
+    if cls is Variable:
+        return (tag, node.name.value)
+    if cls is VariableDeclaration:
+        return (tag, node.name.value, encode(node.expression))
+    if cls is FunctionDeclaration:
+        return (tag, node.name.value, encode(node.args), encode(node.block_node))
+    if cls is Function or cls is NativeCall:
+        return (tag, node.name.value, encode(node.args))
+    if cls is Lambda:
+        return (tag, encode(node.variables), encode(node.block_statement))
+    if cls is Conditional:
+        return (tag, encode(node.hipotesis), encode(node.tesis), encode(node.antitesis))
+    return (tag,)
+
+class Decoder:
+    """
+    Rebuilds a tree, names are shared between the nodes that use them
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.decoders = [None] * len(NODE_TYPES)
+        for cls in LITERALS:
+            self.decoders[TAGS[cls]] = self.literal
+        for cls in BINARY:
+            self.decoders[TAGS[cls]] = self.binary
+        self.decoders[TAGS[BlockNode]] = self.block
+        self.decoders[TAGS[Variable]] = self.variable
+        self.decoders[TAGS[VariableDeclaration]] = self.variable_declaration
+        self.decoders[TAGS[FunctionDeclaration]] = self.function_declaration
+        self.decoders[TAGS[Function]] = self.function
+        self.decoders[TAGS[NativeCall]] = self.native_call
+        self.decoders[TAGS[Lambda]] = self.letin
+        self.decoders[TAGS[Conditional]] = self.conditional
+        self.decoders[TAGS[NonExpression]] = self.non_expression
+
+    def name(self, value):
+        token = self.names.get(value)
+        if token is None:
+            token = self.names[value] = Token(Tokens.ID, value)
+        return token
+
+    def decode(self, data: tuple):
+        return self.decoders[data[0]](data)
+
+    def literal(self, data):
+        return NODE_TYPES[data[0]](data[1])
+
+    def binary(self, data):
+        return NODE_TYPES[data[0]](left=self.decode(data[1]), right=self.decode(data[2]))
+
+    def block(self, data):
+        return BlockNode([self.decode(block) for block in data[1]])
+
+    def variable(self, data):
+        return Variable(self.name(data[1]))
+
+    def variable_declaration(self, data):
+        return VariableDeclaration(self.name(data[1]), self.decode(data[2]))
+
+    def function_declaration(self, data):
+        return FunctionDeclaration(self.name(data[1]), self.decode(data[2]), self.decode(data[3]))
+
+    def function(self, data):
+        return Function(self.name(data[1]), self.decode(data[2]))
+
+    def native_call(self, data):
+        # a KeyError when it isn't registered anymore
+        return NativeCall(self.name(data[1]), self.decode(data[2]))
+
+    def letin(self, data):
+        return Lambda(self.decode(data[1]), self.decode(data[2]))
+
+    def conditional(self, data):
+        return Conditional(self.decode(data[1]), self.decode(data[2]), self.decode(data[3]))
+
+    def non_expression(self, data):
+        return NonExpression()
+
+def decode(data: tuple):
+    return Decoder().decode(data)
+
+def dumps(tree) -> bytes:
+    return marshal.dumps(encode(tree))
+
+def loads(data: bytes):
+    return decode(marshal.loads(data))
+
+def source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def cache_path(path) -> Path:
+    path = Path(path)
+    return path.parent / CACHE_DIR / f"{path.stem}.pyhulk-{__version__}.hulkc"
+
+def parse(text: str, opt_level=0):
+    tree = Parser(tokenize(text)).parse()
+    if opt_level:
+        from pyhulk.optimizer import optimize
+        tree = optimize(tree, opt_level)
+    return tree
+
+def read(path, digest: str, opt_level=0):
+    """The cached tree, None if it's missing or stale"""
+    try:
+        with open(path, "rb") as file:
+            header = marshal.load(file)
+            if header != (MAGIC, FORMAT_VERSION, __version__, digest, opt_level, signature()):
+                return None
+            # `loads` is much faster than `load` on a file, and the
+            # collector has nothing to find in a tree being built
+            data = file.read()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return decode(marshal.loads(data))
+        finally:
+            if enabled:
+                gc.enable()
+    except (OSError, EOFError, ValueError, TypeError, IndexError, KeyError):
+        # missing, truncated or from an incompatible version
+        return None
+
+def write(path, digest: str, opt_level, tree):
+    path = Path(path)
+    header = (MAGIC, FORMAT_VERSION, __version__, digest, opt_level, signature())
+    try:
+        path.parent.mkdir(exist_ok=True)
+        # write and rename so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            marshal.dump(header, file)
+            marshal.dump(encode(tree), file)
+        os.replace(tmp, path)
+    except OSError:
+        # read only directory, the cache is best effort
+        return False
+    return True
+
+def load_program(path, opt_level=0, use_cache=True):
+    """
+    Parsed (and optimized) tree of the script at `path`, from the cache
+    when it's up to date
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if not use_cache:
+        return parse(text, opt_level)
+
+    digest = source_hash(text)
+    cached = cache_path(path)
+    tree = read(cached, digest, opt_level)
+    if tree is None:
+        tree = parse(text, opt_level)
+        write(cached, digest, opt_level, tree)
+    return tree
@@ -0,0 +1,318 @@
+"""
+Compiles the tree produced by `Parser.parse` into nested Python closures.
+
+Every node becomes a function of the current frame (a list of local
+slots), built once, so evaluating a node is a single direct call. Binary
+operations are specialized on the shape of their operands to avoid calls
+for local variables and constants.
+
+Names are scoped like the tree walker does: the top level reads the
+globals, a function body its parameters and the function itself and a
+`let` only its own bindings, anything else raises NameError when it's read.
+
+With a `pyhulk.memo.Memoizer` calls to pure functions go through its caches.
+"""
+from typing import List
+import weakref
+
+from pyhulk.memo import MISSING, Memoizer, cache_key
+from pyhulk.parser import (
+    Context,
+    Division,
+    Equals,
+    Exp,
+    FunctionDeclaration,
+    Higher,
+    Literal,
+    Lower,
+    Modulo,
+    Mult,
+    Substraction,
+    Sum,
+    Variable,
+)
+
+class CompileError(Exception):
+    pass
+
+OPERATORS = {
+    Sum: "+",
+    Substraction: "+ -",
+    Mult: "*",
+    Division: "/",
+    Modulo: "%",
+    Exp: "**",
+    Equals: "==",
+    Higher: ">",
+    Lower: "<",
+}
+
+# operand shape -> how the operand is written in the closure
+SHAPES = {
+    "node": "{name}(frame)",
+    "local": "frame[{name}]",
+    "const": "{name}",
+}
+
+_FACTORIES = {}
+
+def binary_factory(operator: str, left: str, right: str):
+    """
+    Returns a function building the closure of a binary operation
+    for the given operator and operand shapes
+    """
+    key = (operator, left, right)
+    if key not in _FACTORIES:
+        source = "lambda left, right: lambda frame: {} {} {}".format(
+            SHAPES[left].format(name="left"),
+            operator,
+            SHAPES[right].format(name="right"),
+        )
+        _FACTORIES[key] = eval(source)
+    return _FACTORIES[key]
+
+class CompiledFunction:
+    """
+    A compiled `FunctionDeclaration`
+    """
+
+    def __init__(self, name, nargs: int, nlocals: int, body, globals_: dict, memoizer=None, self_slot: int = None):
+        self.name = name
+        self.nargs = nargs
+        self.nlocals = nlocals
+        # where a call puts the function, its body sees it by name
+        self.self_slot = self_slot
+        self.body = body
+        self.globals = globals_
+        self.memoizer = memoizer
+
+class Compiler:
+    """
+    Compiles the body of a function (or the top level of a program).
+
+    Parameters and `let` bindings live in the slots of the frame, names
+    read at the top level are looked up by name in the global scope.
+    """
+
+    def __init__(self, globals_: dict, params: List = (), memoizer: Memoizer = None, name=None):
+        self.globals = globals_
+        self.memoizer = memoizer
+        self.name = name
+        self.scopes = [{}]
+        self.nlocals = 0
+
+        for param in params:
+            self.declare(param.name)
+        # after the parameters, it hides one with the same name
+        self.self_slot = self.declare(name) if name is not None else None
+
+    def declare(self, name):
+        self.scopes[-1][name.value] = self.nlocals
+        self.nlocals += 1
+        return self.nlocals - 1
+
+    def resolve(self, name):
+        """Slot of `name`, the scopes around the innermost one aren't seen"""
+        return self.scopes[-1].get(name.value)
+
+    def shape(self, node):
+        """How a binary operation should read `node`"""
+        if isinstance(node, Literal):
+            return "const", node._val
+        if isinstance(node, Variable):
+            slot = self.resolve(node.name)
+            if slot is not None:
+                return "local", slot
+        return "node", self.compile(node)
+
+    def compile(self, node):
+        if type(node) in OPERATORS:
+            return self.compile_binary(node, OPERATORS[type(node)])
+        method = getattr(self, "compile_" + type(node).__name__, None)
+        if method is None:
+            if isinstance(node, Literal):
+                return self.compile_Literal(node)
+            raise CompileError(f"Can't compile {type(node).__name__}")
+        return method(node)
+
+    def compile_binary(self, node, operator):
+        left_shape, left = self.shape(node.left)
+        right_shape, right = self.shape(node.right)
+        return binary_factory(operator, left_shape, right_shape)(left, right)
+
+    def compile_Literal(self, node):
+        value = node._val
+        return lambda frame: value
+
+    def compile_NonExpression(self, node):
+        return lambda frame: None
+
+    def compile_Variable(self, node):
+        slot = self.resolve(node.name)
+        if slot is not None:
+            return lambda frame: frame[slot]
+        if self.name is None and len(self.scopes) == 1:
+            return self.load_global(node.name)
+        return self.load_unbound(node.name)
+
+    def load_global(self, name):
+        globals_ = self.globals
+
+        def load(frame):
+            try:
+                return globals_[name]
+            except KeyError:
+                raise NameError(f"{name!r} is not defined")
+        return load
+
+    def load_unbound(self, name):
+        def load(frame):
+            raise NameError(f"{name!r} is not defined")
+        return load
+
+    def compile_BlockNode(self, node):
+        blocks = [self.compile(block) for block in node.blocks]
+        if len(blocks) == 1:
+            return blocks[0]
+
+        def block(frame):
+            result = None
+            for statement in blocks:
+                result = statement(frame)
+            return result
+        return block
+
+    def compile_VariableDeclaration(self, node):
+        # `var` is only allowed at the top level
+        globals_ = self.globals
+        memoizer = self.memoizer
+        name = node.name
+        value = self.compile(node.expression)
+
+        def declare(frame):
+            globals_[name] = value(frame)
+            if memoizer is not None:
+                memoizer.invalidate()
+        return declare
+
+    def compile_FunctionDeclaration(self, node):
+        globals_ = self.globals
+        memoizer = self.memoizer
+
+        def declare(frame):
+            globals_[node.name] = node
+            if memoizer is not None:
+                memoizer.invalidate()
+        return declare
+
+    def compile_Function(self, node):
+        load = self.compile(Variable(node.name))
+        args = [self.compile(arg) for arg in node.args.blocks]
+        nargs = len(args)
+        globals_ = self.globals
+        memoizer = self.memoizer
+        # last callee seen by this call site
+        cache = [None, None]
+
+        def callee(fun_decl):
+            if not isinstance(fun_decl, FunctionDeclaration):
+                raise TypeError(f"{fun_decl!r} is not a function")
+            function = compile_function(fun_decl, globals_, memoizer)
+            if nargs != function.nargs:
+                raise TypeError(
+                    f"{function.name.value}() takes {function.nargs} arguments but {nargs} were given"
+                )
+            return function
+
+        def call(frame):
+            fun_decl = load(frame)
+            if fun_decl is not cache[0]:
+                cache[1] = callee(fun_decl)
+                cache[0] = fun_decl
+            function = cache[1]
+            fun_frame = [arg(frame) for arg in args]
+            fun_frame.extend([None] * (function.nlocals - nargs))
+            fun_frame[function.self_slot] = fun_decl
+            return function.body(fun_frame)
+
+        if memoizer is None:
+            return call
+
+        # callee, its cache and the generation of the memoizer they belong to
+        memo = [None, None, None, -1]
+
+        def memoized_call(frame):
+            fun_decl = load(frame)
+            if fun_decl is not memo[0] or memo[3] != memoizer.generation:
+                memo[1] = callee(fun_decl)
+                memo[2] = memoizer.cache_for(fun_decl, globals_)
+                memo[3] = memoizer.generation
+                memo[0] = fun_decl
+            function, table = memo[1], memo[2]
+            fun_frame = [arg(frame) for arg in args]
+            if table is not None:
+                key = cache_key(fun_frame)
+                result = table.get(key)
+                if result is not MISSING:
+                    return result
+            fun_frame.extend([None] * (function.nlocals - nargs))
+            fun_frame[function.self_slot] = fun_decl
+            result = function.body(fun_frame)
+            if table is not None:
+                table.put(key, result)
+            return result
+        return memoized_call
+
+    def compile_NativeCall(self, node):
+        function = node.native.function
+        args = [self.compile(arg) for arg in node.args.blocks]
+        if not args:
+            return lambda frame: function()
+        if len(args) == 1:
+            arg = args[0]
+            return lambda frame: function(arg(frame))
+        return lambda frame: function(*[arg(frame) for arg in args])
+
+    def compile_Lambda(self, node):
+        self.scopes.append({})
+        bindings = []
+        for declaration in node.variables.blocks:
+            value = self.compile(declaration.expression)
+            bindings.append((self.declare(declaration.name), value))
+        body = self.compile(node.block_statement)
+        self.scopes.pop()
+
+        def let(frame):
+            for slot, value in bindings:
+                frame[slot] = value(frame)
+            return body(frame)
+        return let
+
+    def compile_Conditional(self, node):
+        hipotesis = self.compile(node.hipotesis)
+        tesis = self.compile(node.tesis)
+        antitesis = self.compile(node.antitesis)
+        return lambda frame: tesis(frame) if hipotesis(frame) else antitesis(frame)
+
+# FunctionDeclaration -> CompiledFunction, compiled on the first call
+_FUNCTIONS = weakref.WeakKeyDictionary()
+
+def compile_function(fun_decl: FunctionDeclaration, globals_: dict, memoizer: Memoizer = None) -> CompiledFunction:
+    function = _FUNCTIONS.get(fun_decl)
+    if function is None or function.globals is not globals_ or function.memoizer is not memoizer:
+        params = fun_decl.args.blocks
+        compiler = Compiler(globals_, params, memoizer, fun_decl.name)
+        body = compiler.compile(fun_decl.block_node)
+        function = _FUNCTIONS[fun_decl] = CompiledFunction(
+            fun_decl.name, len(params), compiler.nlocals, body, globals_, memoizer, compiler.self_slot
+        )
+    return function
+
+def execute(tree, ctx: Context, memoize=None):
+    """
+    `memoize` is a `Memoizer`, or True for one with the default limits
+    """
+    memoizer = Memoizer() if memoize is True else memoize or None
+    compiler = Compiler(ctx._dict, memoizer=memoizer)
+    program = compiler.compile(tree)
+    return program([None] * compiler.nlocals)
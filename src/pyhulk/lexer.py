@@ -1,6 +1,9 @@
+from array import array
 from enum import Enum
+import re
+import sys
 
-from pyhulk.log import logged
+from pyhulk.log import logged, traced
 
 class Tokens(Enum):
     ID = "ID"
@@ -49,13 +52,22 @@ def token_from_value(value, value2):
 
 @logged
 class Token:
-    def __init__(self, type_: "Tokens", value=None):
+    """
+    `pos` is the offset of the lexeme in the source, None for the shared
+    fixed-value tokens. It isn't part of the identity of a token.
+    """
+    __slots__ = ("type", "value", "pos", "_hash")
+
+    @traced("token")
+    def __init__(self, type_: "Tokens", value=None, pos=None):
         self.type = type_
         self.value = value if value else type_.value
-        self.logger.debug("Created token %s", self)
+        self.pos = pos
+        # tokens are the keys of the scopes
+        self._hash = hash((type_, self.value))
 
     def __hash__(self):
-        return hash((self.type, self.value))
+        return self._hash
 
     def __str__(self):
         """String representation of the class instance.
@@ -71,26 +83,40 @@ class Token:
         )
 
     def __eq__(self, other):
-        return isinstance(other, Token) and other.type == self.type and other.value == self.value
+        return self is other or (
+            isinstance(other, Token) and other.type == self.type and other.value == self.value
+        )
 
     def __repr__(self):
         return self.__str__()
 
+# one shared instance per fixed-value member (punctuation, keywords, EOF),
+# never mutate them
+SINGLETONS = {
+    member: Token(member)
+    for member in Tokens
+    if member not in LITERALS and member != Tokens.ID
+}
+
 RESERVED_KEYWORDS = {
-    "in": Token(Tokens.IN),
-    "let": Token(Tokens.LET),
-    "var": Token(Tokens.VAR),
-    "function": Token(Tokens.FUNCTION),
-    "if": Token(Tokens.IF),
-    "else": Token(Tokens.ELSE),
+    member.value: SINGLETONS[member]
+    for member in (Tokens.IN, Tokens.LET, Tokens.VAR, Tokens.FUNCTION, Tokens.IF, Tokens.ELSE)
 }
 
+def position(text: str, offset: int) -> tuple:
+    """(line, column) of `offset`, both start at 1"""
+    return text.count("\n", 0, offset) + 1, offset - text.rfind("\n", 0, offset)
+
 class LexingError(Exception):
     pass
 
 # denotes end of a sentence
 @logged
-class Lexer:
+class CharLexer:
+    """
+    Reference lexer, builds every lexeme one character at a time.
+    Kept around to check `TableLexer` against it.
+    """
 
     def __init__(self, text, line=1):
         self.text: str = text
@@ -116,7 +142,7 @@ class Lexer:
     def advance(self):
         """Advance the `pos` pointer and set the `current_char` variable."""
         if self.current_char == '\n':
-            self.lineno += 1
+            self.line += 1
             self.column = 0
 
         self.pos += 1
@@ -136,6 +162,7 @@ class Lexer:
     def skip_whitespace(self):
         self.get_result("space")
 
+    @traced("lex")
     def integer(self):
         """Return a (multidigit) integer consumed from the input."""
         # XXX you can use it twice to build a float
@@ -148,10 +175,10 @@ class Lexer:
         # number + new_num
         # or you can just add it as a string idc
         result = self.get_result("digit")
-        self.logger.debug("Lexing number %s", result)
 
         return result
 
+    @traced("lex")
     def string(self):
         result = ""
         # End Of String
@@ -161,16 +188,16 @@ class Lexer:
 
         if self.current_char is None:
             self.error(LexingError("Unterminated string literal"))
-        self.logger.debug("Lexing string %s", result)
         self.advance()
         return result
 
+    @traced("lex")
     def _id(self):
         """Handle identifiers and reserved keywords"""
+        start = self.pos
         result = self.get_result("alnum")
 
-        token = RESERVED_KEYWORDS.get(result, Token(Tokens.ID, result))
-        self.logger.debug("Lexing identifier %s", token)
+        token = RESERVED_KEYWORDS.get(result) or Token(Tokens.ID, sys.intern(result), start)
         return token
 
 
@@ -188,18 +215,19 @@ class Lexer:
             if self.current_char.isalpha():
                 return self._id()
 
+            start = self.pos
             if self.current_char.isdigit():
                 _integer = self.integer()
                 # could be float
                 if self.current_char == Tokens.DOT.value and self.peek().isdigit():
                     self.advance()
                     _mantisa = self.integer()
-                    return Token(Tokens.FLOAT, f"{_integer}.{_mantisa}")
-                return Token(Tokens.INTEGER, _integer)
+                    return Token(Tokens.FLOAT, f"{_integer}.{_mantisa}", start)
+                return Token(Tokens.INTEGER, _integer, start)
 
             if self.current_char == Tokens.QUOTATION.value:
                 self.advance()
-                return Token(Tokens.STRING, self.string())
+                return Token(Tokens.STRING, self.string(), start)
 
             token = token_from_value(self.current_char, self.peek())
             if not token:
@@ -208,6 +236,226 @@ class Lexer:
             # composite tokens
             for _ in range(len(token.value)):
                 self.advance()
-            return Token(token)
+            return SINGLETONS[token]
+
+        return SINGLETONS[Tokens.EOF]
+
+
+# value -> shared token, for every fixed-value token (punctuation and keywords)
+FIXED_TOKENS = {
+    member.value: SINGLETONS[member]
+    for member in Tokens
+    if member.value is not None and member not in LITERALS and member != Tokens.ID
+}
+
+# a single master pattern, leading whitespace is skipped in the same match
+# and `lastgroup` tells us what kind of lexeme we found
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<FLOAT>\d+\.\d+)
+      | (?P<INTEGER>\d+)
+      | (?P<ID>[^\W\d_][^\W_]*)
+      | "(?P<STRING>[^"]*)"
+      | (?P<OPERATOR>==|=>|[-+*/%^()><=.;,])
+      | (?P<UNTERMINATED>")
+      | (?P<EOF>\Z)
+      | (?P<INVALID>.)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+@logged
+class TableLexer:
+    """
+    Single-pass lexer driven by `TOKEN_PATTERN`.
+
+    Produces exactly the same stream of `Token`s as `CharLexer` but
+    works with slices of the source and does O(1) lookups for keywords
+    and operators.
+    """
+
+    def __init__(self, text, line=1):
+        self.text: str = text
+        self.pos: int = 0
+
+        self._match = TOKEN_PATTERN.match
+        self._dispatch = {
+            "FLOAT": self._float,
+            "INTEGER": self._integer,
+            "ID": self._id,
+            "STRING": self._string,
+            "OPERATOR": self._operator,
+            "UNTERMINATED": self._unterminated,
+            "EOF": self._eof,
+            "INVALID": self._invalid,
+        }
+
+    @property
+    def line(self):
+        return position(self.text, self.pos)[0]
+
+    @property
+    def column(self):
+        return position(self.text, self.pos)[1]
+
+    def error(self, exception):
+        print(f"Error lexing line {self.line} col {self.column}")
+        print(self.text)
+        print(" "*(self.column) + "^")
+        raise exception
+
+    def _float(self, value, start):
+        return Token(Tokens.FLOAT, value, start)
+
+    @traced("lex")
+    def _integer(self, value, start):
+        return Token(Tokens.INTEGER, value, start)
+
+    @traced("lex")
+    def _id(self, value, start):
+        return RESERVED_KEYWORDS.get(value) or Token(Tokens.ID, sys.intern(value), start)
+
+    @traced("lex")
+    def _string(self, value, start):
+        # the lexeme starts at the quote
+        return Token(Tokens.STRING, value, start - 1)
+
+    def _operator(self, value, start):
+        return FIXED_TOKENS[value]
+
+    def _unterminated(self, value, start):
+        # the reference lexer reports it at the end of the input
+        self.pos = len(self.text)
+        self.error(LexingError("Unterminated string literal"))
+
+    def _eof(self, value, start):
+        return SINGLETONS[Tokens.EOF]
+
+    def _invalid(self, value, start):
+        self.pos -= 1
+        self.error(LexingError("Invalid character"))
+
+    def get_next_token(self):
+        match = self._match(self.text, self.pos)
+        self.pos = match.end()
+        kind = match.lastgroup
+        return self._dispatch[kind](match.group(kind), match.start(kind))
+
+    def tokenize(self) -> "TokenBuffer":
+        """The rest of the input at once, without building `Token`s"""
+        text = self.text
+        match_ = self._match
+        kinds = array("B")
+        starts = array("l")
+        ends = array("l")
+        id_code = KIND_CODES[Tokens.ID]
+        keywords = KEYWORD_CODES
+        operators = OPERATOR_CODES
+        literals = LITERAL_CODES
+
+        while True:
+            match = match_(text, self.pos)
+            kind = match.lastgroup
+            start = match.start(kind)
+            end = self.pos = match.end()
+            if kind == "ID":
+                code = keywords.get(text[start:end], id_code)
+            elif kind == "OPERATOR":
+                code = operators[text[start:end]]
+            elif kind in literals:
+                code = literals[kind]
+                if kind == "STRING":
+                    # the lexeme includes the quotes
+                    start -= 1
+            elif kind == "EOF":
+                kinds.append(KIND_CODES[Tokens.EOF])
+                starts.append(start)
+                ends.append(end)
+                break
+            else:
+                self._dispatch[kind](match.group(kind), start)
+            kinds.append(code)
+            starts.append(start)
+            ends.append(end)
+
+        return TokenBuffer(text, kinds, starts, ends)
+
+# a token kind is stored as the index of its member
+KINDS = tuple(Tokens)
+KIND_CODES = {member: code for code, member in enumerate(KINDS)}
+KEYWORD_CODES = {value: KIND_CODES[token.type] for value, token in RESERVED_KEYWORDS.items()}
+OPERATOR_CODES = {value: KIND_CODES[token.type] for value, token in FIXED_TOKENS.items()}
+LITERAL_CODES = {member.name: KIND_CODES[member] for member in LITERALS}
+
+class TokenBuffer:
+    """
+    Token stream of a whole input as parallel arrays: the kind of every
+    token and the offsets of its lexeme. Lexemes and `Token`s are only
+    built when asked for, any token can be looked at by index.
+
+    Can be used as the lexer of a `Parser`.
+    """
+
+    def __init__(self, text: str, kinds: array, starts: array, ends: array):
+        self.text = text
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        # next token handed to the parser
+        self.index = 0
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index: int) -> Tokens:
+        return KINDS[self.kinds[index]]
+
+    def lexeme(self, index: int) -> str:
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def token(self, index: int) -> Token:
+        member = KINDS[self.kinds[index]]
+        fixed = SINGLETONS.get(member)
+        if fixed is not None:
+            return fixed
+        start = self.starts[index]
+        if member == Tokens.STRING:
+            return Token(member, self.text[start + 1:self.ends[index] - 1], start)
+        value = self.text[start:self.ends[index]]
+        if member == Tokens.ID:
+            value = sys.intern(value)
+        return Token(member, value, start)
+
+    def peek(self, offset: int = 0) -> Tokens:
+        """Kind of the token `offset` places after the next one"""
+        return KINDS[self.kinds[min(self.index + offset, len(self.kinds) - 1)]]
+
+    def get_next_token(self) -> Token:
+        token = self.token(self.index)
+        # EOF repeats
+        if self.index < len(self.kinds) - 1:
+            self.index += 1
+        return token
+
+    @property
+    def pos(self):
+        # end of the last token handed out, like the lexers
+        return self.ends[self.index - 1] if self.index else 0
+
+    @property
+    def line(self):
+        return position(self.text, self.pos)[0]
+
+    @property
+    def column(self):
+        return position(self.text, self.pos)[1]
+
+def tokenize(text: str) -> TokenBuffer:
+    return TableLexer(text).tokenize()
+
+
+LEXERS = {
+    "table": TableLexer,
+    "char": CharLexer,
+}
 
-        return Token(Tokens.EOF)
+Lexer = TableLexer
@@ -0,0 +1,205 @@
+"""
+Resource limits for one evaluation on the tree walker.
+
+    limits = Limits(steps=1_000_000, depth=200, int_bits=4096, deadline=0.5)
+    Interpreter(parser, limits=limits).interpret()
+
+`steps` counts evaluated nodes, `depth` nested calls, `int_bits` and
+`str_length` bound the values an operation may build (checked before
+computing it, `2 ^ 10000000` never runs) and `deadline` is in seconds from
+the start. Going over any of them raises `BudgetExceeded`.
+
+While an evaluation with limits runs, the node classes evaluate through
+guarded versions of `__call__`; other evaluations in the same process (other
+threads) keep running without limits, and nothing is guarded once the last
+limited evaluation ends. `hooked` goes through the same versions to call
+hooks (the profiler's) on the evaluations of one thread.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+from pyhulk.parser import AST, BinaryOperation, Exp, Function, Mult, Substraction, Sum
+
+# nodes between two looks at the clock
+CHECK_INTERVAL = 1024
+
+class BudgetExceeded(RuntimeError):
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        # which of the `Limits`
+        self.limit = limit
+
+class Limits:
+
+    def __init__(
+        self,
+        steps: int = None,
+        depth: int = None,
+        int_bits: int = None,
+        str_length: int = None,
+        deadline: float = None,
+    ):
+        self.steps = steps
+        self.depth = depth
+        self.int_bits = int_bits
+        self.str_length = str_length
+        self.deadline = deadline
+
+    def __repr__(self):
+        return f"<(Limits) [{', '.join(f'{key}: {value}' for key, value in vars(self).items() if value is not None)}]>"
+
+class Budget:
+    """What's left of the `Limits` of a running evaluation"""
+    __slots__ = ("limits", "fuel", "given", "used", "depth", "deadline", "sizes")
+
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        # steps are counted down in `fuel`, a chunk at a time
+        self.used = 0
+        self.depth = 0
+        self.deadline = time.perf_counter() + limits.deadline if limits.deadline is not None else None
+        self.sizes = limits.int_bits is not None or limits.str_length is not None
+        self.given = self.fuel = self._next_fuel()
+
+    def _next_fuel(self):
+        if self.limits.steps is None:
+            return CHECK_INTERVAL
+        return min(CHECK_INTERVAL, self.limits.steps - self.used)
+
+    def refuel(self):
+        """Out of fuel: account for the steps and look at the clock"""
+        self.used += self.given
+        if self.limits.steps is not None and self.used >= self.limits.steps:
+            raise BudgetExceeded("steps", f"More than {self.limits.steps} steps")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise BudgetExceeded("deadline", f"Took longer than {self.limits.deadline}s")
+        self.given = self.fuel = self._next_fuel()
+
+    @property
+    def steps(self):
+        """Steps taken so far"""
+        return self.used + self.given - self.fuel
+
+    def check_size(self, node, left, right):
+        cls = type(node)
+        int_bits = self.limits.int_bits
+        if int_bits is not None and type(left) is int and type(right) is int:
+            if cls is Exp:
+                bits = left.bit_length() * right if right > 0 and abs(left) > 1 else 1
+            elif cls is Mult:
+                bits = left.bit_length() + right.bit_length()
+            elif cls is Sum or cls is Substraction:
+                bits = max(left.bit_length(), right.bit_length()) + 1
+            else:
+                bits = 0
+            if bits > int_bits:
+                raise BudgetExceeded("int_bits", f"Integer result over {int_bits} bits")
+
+        str_length = self.limits.str_length
+        if str_length is not None:
+            length = 0
+            if cls is Sum and isinstance(left, str) and isinstance(right, str):
+                length = len(left) + len(right)
+            elif cls is Mult and isinstance(left, str) and type(right) is int:
+                length = len(left) * right
+            elif cls is Mult and type(left) is int and isinstance(right, str):
+                length = left * len(right)
+            if length > str_length:
+                raise BudgetExceeded("str_length", f"String result over {str_length} characters")
+
+# the budget of the evaluation running on this thread, or its hooks, if any
+_local = threading.local()
+_lock = threading.Lock()
+_running = 0
+_saved = None
+
+def _guarded_node(node, ctx):
+    budget = getattr(_local, "budget", None)
+    if budget is None:
+        hooks = getattr(_local, "hooks", None)
+        if hooks is not None and hooks[0] is not None:
+            return hooks[0](node, ctx)
+        return node.eval(ctx)
+    if not budget.fuel:
+        budget.refuel()
+    budget.fuel -= 1
+    return node.eval(ctx)
+
+def _guarded_call(node, ctx):
+    budget = getattr(_local, "budget", None)
+    if budget is None:
+        hooks = getattr(_local, "hooks", None)
+        if hooks is not None and hooks[1] is not None:
+            return hooks[1](node, ctx)
+        return node.eval(ctx)
+    if not budget.fuel:
+        budget.refuel()
+    budget.fuel -= 1
+    if budget.limits.depth is not None and budget.depth >= budget.limits.depth:
+        raise BudgetExceeded("depth", f"More than {budget.limits.depth} nested calls")
+    budget.depth += 1
+    try:
+        return node.eval(ctx)
+    finally:
+        budget.depth -= 1
+
+def _guarded_binary(node, ctx):
+    budget = getattr(_local, "budget", None)
+    if budget is None or not budget.sizes:
+        return _guarded_node(node, ctx)
+    if not budget.fuel:
+        budget.refuel()
+    budget.fuel -= 1
+    left = node.left(ctx)
+    right = node.right(ctx)
+    budget.check_size(node, left, right)
+    return node.operation(left, right)
+
+def _install():
+    global _running, _saved
+    with _lock:
+        if not _running:
+            _saved = (AST.__dict__["__call__"],)
+            AST.__call__ = _guarded_node
+            Function.__call__ = _guarded_call
+            BinaryOperation.__call__ = _guarded_binary
+        _running += 1
+
+def _uninstall():
+    global _running
+    with _lock:
+        _running -= 1
+        if not _running:
+            AST.__call__ = _saved[0]
+            del Function.__call__
+            del BinaryOperation.__call__
+
+@contextmanager
+def enforce(limits: Limits):
+    """Evaluations on this thread are bound by `limits` in the block"""
+    budget = Budget(limits)
+    previous = getattr(_local, "budget", None)
+    _install()
+    _local.budget = budget
+    try:
+        yield budget
+    finally:
+        _local.budget = previous
+        _uninstall()
+
+@contextmanager
+def hooked(node=None, call=None):
+    """
+    Evaluations on this thread go through `node(node, ctx)` for every node
+    and `call(node, ctx)` for every call in the block, unless they're limited
+    """
+    previous = getattr(_local, "hooks", None)
+    _install()
+    _local.hooks = (node, call)
+    try:
+        yield
+    finally:
+        _local.hooks = previous
+        _uninstall()
@@ -1,7 +1,15 @@
+import functools
+import json
 import logging
 import logging.config
+import os
+import sys
 from typing import Callable
 
+# sample rate of the hot path trace, read once at startup:
+# PYHULK_TRACE=1 traces every event, PYHULK_TRACE=0.01 one in a hundred
+TRACE_ENV = "PYHULK_TRACE"
+
 
 def logged(cls) -> Callable:
     "Class decorator for logging purposes"
@@ -10,3 +18,61 @@ def logged(cls) -> Callable:
     cls.logger_err = logging.getLogger("audit." + cls.__qualname__)
 
     return cls
+
+
+def trace_rate(value: str) -> float:
+    try:
+        rate = float(value or 0)
+    except ValueError:
+        return 0.0
+    return min(max(rate, 0.0), 1.0)
+
+
+TRACE_RATE = trace_rate(os.environ.get(TRACE_ENV))
+trace_logger = logging.getLogger("trace")
+
+
+def _trace_handler():
+    # records are JSON lines, don't wrap them in the usual format
+    if not trace_logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_logger.addHandler(handler)
+        trace_logger.setLevel(logging.DEBUG)
+        trace_logger.propagate = False
+
+
+def traced(event: str, rate: float = None) -> Callable:
+    """
+    Method decorator for hot paths, emits a JSON record with the result (or
+    the instance, for `__init__`) of one in every 1/rate calls.
+
+    Unless tracing was enabled at startup the method is returned untouched,
+    so there's nothing left to pay for.
+    """
+    rate = TRACE_RATE if rate is None else rate
+
+    def decorator(method):
+        if not rate:
+            return method
+
+        _trace_handler()
+        interval = max(round(1 / rate), 1)
+        source = method.__qualname__
+        calls = 0
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            nonlocal calls
+            result = method(self, *args, **kwargs)
+            calls += 1
+            if calls % interval == 0:
+                value = self if result is None else result
+                trace_logger.debug(
+                    json.dumps({"event": event, "source": source, "seq": calls, "value": str(value)})
+                )
+            return result
+
+        return wrapper
+
+    return decorator
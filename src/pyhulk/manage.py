@@ -1,14 +1,218 @@
-import os
+import argparse
+import json
 import sys
+from pathlib import Path
 
-from pyhulk.parser import repl
+from pyhulk.cache import load_program
+from pyhulk.lexer import Lexer
+from pyhulk.natives import flush
+from pyhulk.parser import ENGINES, Interpreter, Parser, repl, tree_size
+from pyhulk.transpiler import compile_file, load_compiled
 
-def get_command(command: list = sys.argv[1]):
-    """Macros to manage the db"""
-    if command == "repl":
-        repl()
+def run(path, engine=None, opt_level=0, dump=False, use_cache=True, limits=None, **options):
+    """
+    Run a script on `engine`, from its cached tree. Without an engine (nor
+    an optimization level, a dump, limits or options) it runs from its
+    compiled module if it's up to date, otherwise on the tree walker
+    """
+    compiled = engine is None and not (opt_level or dump or limits is not None or options)
+    module = load_compiled(path) if compiled else None
+    if module is not None:
+        try:
+            return module.hulk_main()
+        finally:
+            flush()
+
+    engine = engine or "tree"
+    if dump:
+        text = Path(path).read_text(encoding="utf-8")
+        interpreter = Interpreter(
+            Parser(Lexer(text)), engine=engine, opt_level=opt_level, dump=dump, limits=limits, **options
+        )
     else:
-        print(f"Bad command {command}")
+        tree = load_program(path, opt_level, use_cache)
+        interpreter = Interpreter(engine=engine, tree=tree, limits=limits, **options)
+    return interpreter.interpret()
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="pyhulk")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("repl", help="interactive interpreter")
+
+    compile_ = commands.add_parser("compile", help="translate a script to a Python module")
+    compile_.add_argument("path")
+    compile_.add_argument("-o", "--output", help="defaults to the script with a .py suffix")
+
+    run_ = commands.add_parser("run", help="run a script")
+    run_.add_argument("path")
+    run_.add_argument(
+        "--engine", choices=list(ENGINES), help="defaults to the compiled module if it's up to date, or tree"
+    )
+    run_.add_argument("-O", "--opt-level", type=int, choices=(0, 1, 2), default=0)
+    run_.add_argument("--dump-tree", action="store_true", help="print the tree before and after optimizing")
+    run_.add_argument("--no-cache", action="store_true", help="don't use __hulkcache__")
+    run_.add_argument("--memoize", action="store_true", help="cache the results of pure functions (closure engine)")
+    run_.add_argument(
+        "--stream", action="store_true", help="run one statement at a time, printing every value (tree engine)"
+    )
+    run_.add_argument("--tier-threshold", type=int, help="calls before a function is compiled (tiered engine)")
+    run_.add_argument("--no-tier-up", action="store_true", help="only count the calls (tiered engine)")
+    run_.add_argument(
+        "--tier-report", action="store_true", help="print the promoted functions and their speedup (tiered engine)"
+    )
+    run_.add_argument("--max-steps", type=int, help="evaluated nodes (tree engine)")
+    run_.add_argument("--max-depth", type=int, help="nested calls (tree engine)")
+    run_.add_argument("--max-int-bits", type=int, help="size of the integers built (tree engine)")
+    run_.add_argument("--max-str-length", type=int, help="length of the strings built (tree engine)")
+    run_.add_argument("--deadline", type=float, help="seconds to run (tree engine)")
+
+    profile = commands.add_parser("profile", help="run a script with the profiler (tree engine)")
+    profile.add_argument("path")
+    profile.add_argument("-O", "--opt-level", type=int, choices=(0, 1, 2), default=0)
+    profile.add_argument("--functions-only", action="store_true", help="only time calls, lower overhead")
+    profile.add_argument("--collapsed", metavar="PATH", help="write the call stacks for flame graphs")
+    profile.add_argument("--limit", type=int, default=20, help="rows per table")
+
+    batch = commands.add_parser("batch", help="run many scripts, or a program over many inputs, in parallel")
+    batch.add_argument("paths", nargs="*", metavar="path", help="scripts to run")
+    batch.add_argument("--program", metavar="PATH", help="program to evaluate once per input")
+    batch.add_argument("--inputs", metavar="PATH", help="JSON lines file, an object of bindings per line")
+    batch.add_argument("--engine", choices=list(ENGINES), default="tree")
+    batch.add_argument("-O", "--opt-level", type=int, choices=(0, 1, 2), default=0)
+    batch.add_argument("-j", "--workers", type=int, help="defaults to the number of CPUs")
+    batch.add_argument("--chunksize", type=int, default=16)
+    batch.add_argument("--timeout", type=float, help="seconds per task")
+    batch.add_argument("--unordered", action="store_true", help="print the results as they finish")
+
+    serve = commands.add_parser("serve", help="evaluation server, JSON lines over TCP or a Unix socket")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=7733)
+    serve.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead")
+    serve.add_argument("-j", "--workers", type=int, help="evaluation workers")
+    serve.add_argument("--processes", action="store_true", help="evaluate on processes instead of threads")
+
+    bench = commands.add_parser("bench", help="time the phases of the benchmark programs")
+    bench.add_argument("names", nargs="*", metavar="name", help="benchmarks to run, all by default")
+    bench.add_argument("--engine", choices=list(ENGINES), default="tree")
+    bench.add_argument("-O", "--opt-level", type=int, choices=(0, 1, 2), default=0)
+    bench.add_argument("--warmup", type=int, default=1)
+    bench.add_argument("--repeat", type=int, default=5)
+    bench.add_argument("--json", action="store_true", help="print the results as JSON")
+    bench.add_argument("--save", metavar="PATH", help="write the results, to use as a baseline")
+    bench.add_argument("--baseline", metavar="PATH", help="fail if slower than these results")
+    bench.add_argument("--threshold", type=float, default=0.1, help="tolerated slowdown, 0.1 is 10%%")
+
+    return parser
+
+def get_command(argv: list = None):
+    """Macros to manage the interpreter"""
+    parser = get_parser()
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command == "repl":
+        repl()
+    elif args.command == "compile":
+        try:
+            print(compile_file(args.path, args.output))
+        except FileExistsError as exc:
+            parser.error(str(exc))
+    elif args.command == "run":
+        options = {}
+        if args.memoize:
+            if args.engine != "closure":
+                parser.error("--memoize needs --engine closure")
+            options["memoize"] = True
+        tiering = None
+        if args.tier_threshold is not None or args.no_tier_up or args.tier_report:
+            if args.engine != "tiered":
+                parser.error("--tier-threshold, --no-tier-up and --tier-report need --engine tiered")
+            from pyhulk.tiered import THRESHOLD, Tiering
+            tiering = options["tiering"] = Tiering(
+                THRESHOLD if args.tier_threshold is None else args.tier_threshold, not args.no_tier_up
+            )
+        limits = None
+        bounds = (args.max_steps, args.max_depth, args.max_int_bits, args.max_str_length, args.deadline)
+        if any(bound is not None for bound in bounds):
+            if args.engine not in (None, "tree"):
+                parser.error("limits need --engine tree")
+            from pyhulk.limits import Limits
+            limits = Limits(*bounds)
+        if args.stream:
+            if args.engine not in (None, "tree") or args.dump_tree:
+                parser.error("--stream needs --engine tree and no --dump-tree")
+            from pyhulk.stream import run_stream
+            for value in run_stream(args.path, args.opt_level, limits=limits):
+                if value is not None:
+                    # after what `print` wrote before it
+                    flush()
+                    print(value, flush=True)
+            flush()
+        else:
+            print(run(args.path, args.engine, args.opt_level, args.dump_tree, not args.no_cache, limits, **options))
+            if args.tier_report:
+                print(tiering.report(), file=sys.stderr)
+    elif args.command == "profile":
+        from pyhulk.profiler import Profiler
+
+        profiler = Profiler(nodes=not args.functions_only)
+        tree = load_program(args.path, args.opt_level)
+        print(Interpreter(tree=tree, profiler=profiler).interpret())
+        nodes, size = tree_size(tree)
+        print(f"AST: {nodes} nodes, {size / 1024:.1f} KiB", file=sys.stderr)
+        print(profiler.report(args.limit), file=sys.stderr)
+        if args.collapsed:
+            profiler.write_collapsed(args.collapsed)
+    elif args.command == "batch":
+        from pyhulk import batch
+
+        options = dict(
+            workers=args.workers, chunksize=args.chunksize, timeout=args.timeout, ordered=not args.unordered
+        )
+        if args.program:
+            if args.paths or not args.inputs:
+                parser.error("--program takes --inputs and no scripts")
+            with open(args.inputs, encoding="utf-8") as file:
+                bindings = [json.loads(line) for line in file if line.strip()]
+            text = Path(args.program).read_text(encoding="utf-8")
+            results = batch.evaluate_many(text, bindings, **options)
+        else:
+            if not args.paths or args.inputs:
+                parser.error("expected scripts, or --program and --inputs")
+            results = batch.run_files(args.paths, args.engine, args.opt_level, **options)
+
+        failed = 0
+        for result in results:
+            failed += not result.ok
+            record = {"index": result.index, "task": result.task, "value": result.value, "error": result.error}
+            print(json.dumps(record, default=str), flush=True)
+        if failed:
+            parser.exit(1, f"{failed} tasks failed\n")
+    elif args.command == "serve":
+        import asyncio
+        from pyhulk.server import serve
+
+        try:
+            asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.processes))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "bench":
+        from pyhulk import bench
+
+        try:
+            results = bench.run_suite(args.names, args.engine, args.opt_level, args.warmup, args.repeat)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(json.dumps(results, indent=2) if args.json else bench.format_results(results))
+        if args.save:
+            bench.save_results(results, args.save)
+        if args.baseline:
+            try:
+                regressions = bench.compare(results, bench.load_baseline(args.baseline), args.threshold)
+            except ValueError as exc:
+                parser.error(str(exc))
+            if regressions:
+                parser.exit(1, "regressions:\n" + bench.format_regressions(regressions) + "\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+"""
+Memoization of pure HULK functions.
+
+A function is pure when its result only depends on its arguments: its body
+reads nothing but its parameters and `let` bindings, and only calls pure
+functions (itself included). Globals declared with `var` can be rebound, so
+reading one makes a function impure.
+
+`Memoizer` keeps a bounded LRU cache per pure function and is passed to the
+closure engine:
+
+    memo = Memoizer(maxsize=4096)
+    Interpreter(parser, engine="closure", memoize=memo).interpret()
+    memo.stats()
+"""
+from collections import OrderedDict
+import sys
+
+from pyhulk.parser import (
+    BinaryOperation,
+    BlockNode,
+    Conditional,
+    Function,
+    FunctionDeclaration,
+    Lambda,
+    Literal,
+    NativeCall,
+    NonExpression,
+    Variable,
+)
+
+# returned by `LRUCache.get` on a miss, None is a valid result
+MISSING = object()
+
+class LRUCache:
+
+    def __init__(self, maxsize=1024, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def sizeof(key, value):
+        return sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + sys.getsizeof(value)
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self._data:
+            return
+        self._data[key] = value
+        self.bytes += self.sizeof(key, value)
+        while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            old_key, old_value = self._data.popitem(last=False)
+            self.bytes -= self.sizeof(old_key, old_value)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class PurityAnalyzer:
+
+    def __init__(self, globals_: dict):
+        self.globals = globals_
+        self.results = {}
+        # functions being analyzed, assumed pure
+        self.in_progress = set()
+
+    def is_pure(self, fun_decl: FunctionDeclaration) -> bool:
+        if fun_decl in self.results:
+            return self.results[fun_decl]
+        if fun_decl in self.in_progress:
+            return True
+
+        self.in_progress.add(fun_decl)
+        params = {arg.name.value for arg in fun_decl.args.blocks}
+        pure = self.visit(fun_decl.block_node, [params])
+        self.in_progress.discard(fun_decl)
+
+        if pure and self.in_progress:
+            # may rely on the assumption about a caller, decide with the caller
+            return pure
+        self.results[fun_decl] = pure
+        return pure
+
+    def local(self, name, scopes) -> bool:
+        return any(name.value in scope for scope in scopes)
+
+    def visit(self, node, scopes) -> bool:
+        if isinstance(node, (Literal, NonExpression)):
+            return True
+        if isinstance(node, BinaryOperation):
+            return self.visit(node.left, scopes) and self.visit(node.right, scopes)
+        if isinstance(node, BlockNode):
+            return all(self.visit(block, scopes) for block in node.blocks)
+        if isinstance(node, Conditional):
+            return all(self.visit(child, scopes) for child in (node.hipotesis, node.tesis, node.antitesis))
+        if isinstance(node, Variable):
+            return self.local(node.name, scopes)
+        if isinstance(node, Lambda):
+            scope = set()
+            for declaration in node.variables.blocks:
+                if not self.visit(declaration.expression, scopes + [scope]):
+                    return False
+                scope.add(declaration.name.value)
+            return self.visit(node.block_statement, scopes + [scope])
+        if isinstance(node, NativeCall):
+            return node.native.pure and all(self.visit(arg, scopes) for arg in node.args.blocks)
+        if isinstance(node, Function):
+            if self.local(node.name, scopes):
+                # calling a value, can't know what it is
+                return False
+            callee = self.globals.get(node.name)
+            if not isinstance(callee, FunctionDeclaration) or not self.is_pure(callee):
+                return False
+            return all(self.visit(arg, scopes) for arg in node.args.blocks)
+        return False
+
+class Memoizer:
+    """
+    LRU caches for the pure functions of a program.
+
+    `maxsize` and `max_bytes` bound each function's cache, `max_bytes`
+    is an estimate from `sys.getsizeof`.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=16 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        # bumped whenever a global is rebound, call sites check it
+        self.generation = 0
+        self._analyzers = {}
+        self._caches = {}
+
+    def cache_for(self, fun_decl: FunctionDeclaration, globals_: dict):
+        """The cache of `fun_decl`, None if it isn't pure"""
+        analyzer = self._analyzers.get(id(globals_))
+        if analyzer is None:
+            analyzer = self._analyzers[id(globals_)] = PurityAnalyzer(globals_)
+        if not analyzer.is_pure(fun_decl):
+            return None
+        if fun_decl not in self._caches:
+            self._caches[fun_decl] = LRUCache(self.maxsize, self.max_bytes)
+        return self._caches[fun_decl]
+
+    def invalidate(self):
+        """A global changed, purity and cached results may be wrong"""
+        self.generation += 1
+        self._analyzers.clear()
+        for cache in self._caches.values():
+            cache.clear()
+
+    def stats(self):
+        return {fun_decl.name.value: cache.stats() for fun_decl, cache in self._caches.items()}
+
+def cache_key(values: list) -> tuple:
+    # 1, 1.0 and True hash the same but aren't the same argument
+    return (*values, *map(type, values))
@@ -0,0 +1,145 @@
+"""
+Builtin functions, implemented in Python and called directly.
+
+    print(x)  sqrt(x)  sin(x)  cos(x)  exp(x)  log(x)  rand()
+    len(s)  upper(s)  lower(s)  trim(s)  substr(s, start, length)  find(s, t)  str(x)
+
+The parser turns a call to a registered name into a `NativeCall` holding
+the Python function: there's no lookup when it runs and a native can't be
+redefined by a HULK function. Embedders register their own before parsing
+the programs that use them:
+
+    from pyhulk.natives import register
+    register("clamp", lambda x, low, high: max(low, min(x, high)), pure=True)
+
+A pure native only depends on its arguments and has no side effects: the
+optimizer folds its calls on literals and the memoizer caches the HULK
+functions calling it.
+
+`print` writes its argument and a newline to a buffer, which goes to stdout
+in large writes: when it fills up, at the end of every evaluation and at
+exit (`flush()`). It returns its argument.
+"""
+import atexit
+import inspect
+import math
+import random
+import re
+import sys
+import threading
+
+from pyhulk.lexer import RESERVED_KEYWORDS
+
+# characters of `print` output kept before writing them out
+PRINT_BUFFER = 64 * 1024
+
+# what the lexer takes as an identifier
+NAME = re.compile(r"[^\W\d_][^\W_]*\Z")
+
+class Native:
+    __slots__ = ("name", "function", "nargs", "pure")
+
+    def __init__(self, name: str, function, nargs: int, pure: bool):
+        self.name = name
+        self.function = function
+        self.nargs = nargs
+        self.pure = pure
+
+    def __repr__(self):
+        return f"<(Native) [name: {self.name}, nargs: {self.nargs}, pure: {self.pure}]>"
+
+# name -> Native
+NATIVES = {}
+
+def arity(function) -> int:
+    """Number of positional parameters of `function`"""
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        raise TypeError(f"Can't tell how many arguments {function!r} takes, pass nargs")
+    kinds = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    if any(parameter.kind == inspect.Parameter.VAR_POSITIONAL for parameter in parameters):
+        raise TypeError(f"{function!r} takes any number of arguments, pass nargs")
+    return sum(parameter.kind in kinds for parameter in parameters)
+
+def register(name: str, function, nargs: int = None, pure=False) -> Native:
+    """
+    Make `function` callable from HULK as `name`, `nargs` defaults to its
+    number of positional parameters
+    """
+    if not NAME.match(name) or name in RESERVED_KEYWORDS:
+        raise ValueError(f"{name!r} isn't a valid HULK name")
+    native = NATIVES[name] = Native(name, function, arity(function) if nargs is None else nargs, pure)
+    return native
+
+def unregister(name: str):
+    NATIVES.pop(name, None)
+
+def signature() -> tuple:
+    """What the registered natives look like to the parser and the optimizer"""
+    return tuple(sorted((native.name, native.nargs, native.pure) for native in NATIVES.values()))
+
+class Output:
+    """Text for stdout, written out about `size` characters at a time"""
+
+    def __init__(self, size=PRINT_BUFFER):
+        self.size = size
+        self.parts = []
+        self.length = 0
+        self.lock = threading.Lock()
+
+    def write(self, text: str):
+        with self.lock:
+            self.parts.append(text)
+            self.length += len(text)
+            if self.length >= self.size:
+                self._write()
+
+    def flush(self):
+        if not self.parts:
+            return
+        with self.lock:
+            self._write()
+        sys.stdout.flush()
+
+    def _write(self):
+        text = "".join(self.parts)
+        self.parts.clear()
+        self.length = 0
+        if text:
+            sys.stdout.write(text)
+
+OUTPUT = Output()
+
+def flush():
+    OUTPUT.flush()
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except (OSError, ValueError):
+        # stdout already closed
+        pass
+
+def hulk_print(value):
+    OUTPUT.write(f"{value}\n")
+    return value
+
+def substr(text: str, start: int, length: int) -> str:
+    return text[start:start + length]
+
+register("print", hulk_print, 1)
+register("sqrt", math.sqrt, 1, pure=True)
+register("sin", math.sin, 1, pure=True)
+register("cos", math.cos, 1, pure=True)
+register("exp", math.exp, 1, pure=True)
+register("log", math.log, 1, pure=True)
+register("rand", random.random, 0)
+register("len", len, 1, pure=True)
+register("upper", str.upper, 1, pure=True)
+register("lower", str.lower, 1, pure=True)
+register("trim", str.strip, 1, pure=True)
+register("substr", substr, 3, pure=True)
+register("find", str.find, 2, pure=True)
+register("str", str, 1, pure=True)
@@ -0,0 +1,192 @@
+"""
+Optimizations over the tree produced by `Parser.parse`.
+
+Levels:
+    0: nothing
+    1: fold operations and calls to pure natives on literals and prune
+       conditionals with a literal hypothesis, never changes the result or
+       the errors of a program
+    2: also propagate literal `let` bindings and simplify algebraic
+       identities (`x * 1`, `x + 0`, ...), assumes numeric operands
+"""
+import sys
+
+from pyhulk.parser import (
+    AST,
+    BinaryOperation,
+    BlockNode,
+    BookLiteral,
+    Conditional,
+    Exp,
+    FloatLiteral,
+    Function,
+    FunctionDeclaration,
+    IntLiteral,
+    Lambda,
+    Literal,
+    Mult,
+    NativeCall,
+    StrLiteral,
+    Substraction,
+    Sum,
+    Variable,
+    VariableDeclaration,
+    dump_tree,
+)
+
+# don't build huge values at compile time, leave them to the runtime
+MAX_FOLDED_BITS = 4096
+MAX_FOLDED_STR = 4096
+
+def literal(value) -> Literal:
+    if isinstance(value, bool):
+        return BookLiteral(value)
+    if isinstance(value, int):
+        return IntLiteral(value)
+    if isinstance(value, float):
+        return FloatLiteral(value)
+    return StrLiteral(value)
+
+def is_literal(node, value=None) -> bool:
+    if not isinstance(node, Literal):
+        return False
+    if value is None:
+        return True
+    # 1 == True but `x * True` isn't `x`, and `x * 1.0` turns an int into a float
+    return type(node._val) is int and node._val == value
+
+class Optimizer:
+
+    def __init__(self, level=1):
+        self.level = level
+        # let bindings known to be literals, innermost scope last
+        self.scopes = []
+
+    def visit(self, node: AST) -> AST:
+        if isinstance(node, BinaryOperation):
+            return self.visit_binary(node)
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            return node
+        return method(node)
+
+    def fold(self, node: BinaryOperation):
+        left, right = node.left._val, node.right._val
+        if isinstance(node, Exp) and isinstance(left, int) and isinstance(right, int):
+            if right > 0 and abs(left).bit_length() * right > MAX_FOLDED_BITS:
+                return node
+        if isinstance(node, Mult):
+            # the length of a repeated string, without building it
+            if isinstance(left, str) and isinstance(right, int) and len(left) * right > MAX_FOLDED_STR:
+                return node
+            if isinstance(left, int) and isinstance(right, str) and left * len(right) > MAX_FOLDED_STR:
+                return node
+        return self.folded(node, node.operation, left, right)
+
+    def folded(self, node: AST, function, *args) -> AST:
+        """Literal of `function(*args)`, or `node` when it can't be one"""
+        try:
+            value = function(*args)
+        except Exception:
+            # keep the error for the runtime
+            return node
+        if isinstance(value, str) and len(value) > MAX_FOLDED_STR:
+            return node
+        if not isinstance(value, (int, float, str)):
+            return node
+        return literal(value)
+
+    def simplify(self, node: BinaryOperation) -> AST:
+        left, right = node.left, node.right
+        if isinstance(node, Sum):
+            if is_literal(right, 0):
+                return left
+            if is_literal(left, 0):
+                return right
+        elif isinstance(node, Substraction):
+            if is_literal(right, 0):
+                return left
+        elif isinstance(node, Mult):
+            if is_literal(right, 1):
+                return left
+            if is_literal(left, 1):
+                return right
+        elif isinstance(node, Exp):
+            if is_literal(right, 1):
+                return left
+        return node
+
+    def visit_binary(self, node: BinaryOperation) -> AST:
+        node = type(node)(left=self.visit(node.left), right=self.visit(node.right))
+        if is_literal(node.left) and is_literal(node.right):
+            return self.fold(node)
+        if self.level >= 2:
+            return self.simplify(node)
+        return node
+
+    def visit_BlockNode(self, node):
+        return BlockNode([self.visit(block) for block in node.blocks])
+
+    def visit_Conditional(self, node):
+        hipotesis = self.visit(node.hipotesis)
+        if is_literal(hipotesis):
+            branch = node.tesis if hipotesis._val else node.antitesis
+            return self.unwrap(self.visit(branch))
+        return Conditional(hipotesis, self.visit(node.tesis), self.visit(node.antitesis))
+
+    def unwrap(self, node):
+        """The statement of single statement blocks"""
+        while isinstance(node, BlockNode) and len(node.blocks) == 1:
+            node = node.blocks[0]
+        return node
+
+    def visit_VariableDeclaration(self, node):
+        return VariableDeclaration(node.name, self.visit(node.expression))
+
+    def visit_FunctionDeclaration(self, node):
+        # parameters hide the let bindings of the caller
+        scopes, self.scopes = self.scopes, []
+        fun_decl = FunctionDeclaration(node.name, node.args, self.visit(node.block_node))
+        self.scopes = scopes
+        return fun_decl
+
+    def visit_Function(self, node):
+        return Function(node.name, self.visit(node.args))
+
+    def visit_NativeCall(self, node):
+        node = NativeCall(node.name, self.visit(node.args))
+        args = node.args.blocks
+        if node.native.pure and all(is_literal(arg) for arg in args):
+            return self.folded(node, node.native.function, *(arg._val for arg in args))
+        return node
+
+    def visit_Variable(self, node):
+        # a let only sees its own bindings, not the ones of the lets around it
+        value = self.scopes[-1].get(node.name.value) if self.scopes else None
+        return node if value is None else literal(value)
+
+    def visit_Lambda(self, node):
+        scope = {}
+        self.scopes.append(scope)
+        declarations = []
+        for declaration in node.variables.blocks:
+            expression = self.visit(declaration.expression)
+            declarations.append(VariableDeclaration(declaration.name, expression))
+            # None for the bindings that aren't literals
+            propagate = self.level >= 2 and is_literal(expression)
+            scope[declaration.name.value] = expression._val if propagate else None
+        body = self.visit(node.block_statement)
+        self.scopes.pop()
+
+        if is_literal(body) and all(is_literal(decl.expression) for decl in declarations):
+            return body
+        return Lambda(BlockNode(declarations), body)
+
+def optimize(tree: AST, level=1, dump=False) -> AST:
+    if dump:
+        print("before:", dump_tree(tree), sep="\n", file=sys.stderr)
+    if level > 0:
+        tree = Optimizer(level).visit(tree)
+    if dump:
+        print(f"after (level {level}):", dump_tree(tree), sep="\n", file=sys.stderr)
+    return tree
@@ -1,7 +1,10 @@
 from typing import Union, List
+import importlib
+import sys
 
-from pyhulk.lexer import Lexer, Tokens, LITERALS, CONDITIONALS
+from pyhulk.lexer import Lexer, Tokens, LITERALS, CONDITIONALS, position
 from pyhulk.log import logged
+from pyhulk.natives import NATIVES, flush
 
 class UnexpectedToken(SyntaxError):
     pass
@@ -32,6 +35,9 @@ class AST:
     """
     Master class for expressions
     """
+    __slots__ = ()
+    # slots holding what's worked out at runtime, not children
+    _caches = ()
 
     def __call__(self, ctx: "Context"):
         return self.eval(ctx)
@@ -47,6 +53,7 @@ class AST:
 
 
 class Literal(AST):
+    __slots__ = ("_val",)
     _val: Union[float, int, str]
 
     def __init__(self, value):
@@ -56,18 +63,23 @@ class Literal(AST):
         return self._val
 
 class StrLiteral(Literal):
+    __slots__ = ()
     _val: str
 
 class IntLiteral(Literal):
+    __slots__ = ()
     _val: int
 
 class FloatLiteral(Literal):
+    __slots__ = ()
     _val: float
 
 class BookLiteral(Literal):
+    __slots__ = ()
     _val: bool
 
 class BinaryOperation(AST):
+    __slots__ = ("left", "right")
 
     operation: "Callable" = None
 
@@ -82,53 +94,63 @@ class BinaryOperation(AST):
         return str(self.left) + self.__class__.__name__ + str(self.right)
 
 class Sum(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a + b
 
 class Substraction(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a + -b
 
 
 class Division(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a / b
 
 
 class Mult(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a * b
 
 class Modulo(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a % b
 
 class Exp(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a**b
 
 class Equals(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a == b
 
 class Higher(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a > b
 
 class Lower(BinaryOperation):
+    __slots__ = ()
 
     def operation(self, a, b):
         return a < b
 
 class VariableDeclaration(AST):
+    __slots__ = ("name", "expression")
 
     def __init__(self, name, expression: AST):
         self.name = name
@@ -142,6 +164,7 @@ class VariableDeclaration(AST):
         return f"<(VariableDeclaration) [name: {self.name}, value: {self.expression}]>"
 
 class Variable(AST):
+    __slots__ = ("name",)
 
     def __init__(self, name):
         self.name = name
@@ -156,6 +179,7 @@ class BlockNode(AST):
     """
     QOL class to evaluate multiple statements
     """
+    __slots__ = ("blocks",)
 
     def __init__(self, blocks: List[AST]):
         self.blocks = blocks
@@ -169,11 +193,16 @@ class BlockNode(AST):
         return self.blocks.__str__()
 
 class FunctionDeclaration(AST):
+    # the engines cache their compiled functions in weak dicts
+    __slots__ = ("name", "args", "block_node", "params", "__weakref__")
+    _caches = ("params",)
 
     def __init__(self, name, args: List[str], block_node: AST):
         self.name = name
         self.args = args
         self.block_node = block_node
+        # names the arguments are bound to, in order
+        self.params = tuple(arg.name for arg in args.blocks) if args is not None else ()
 
     def eval(self, ctx):
         ctx[self.name] = self
@@ -182,32 +211,86 @@ class FunctionDeclaration(AST):
     def __str__(self):
         return f"<(FunctionDeclaration) [name: {self.name}, args: {self.args}, block_node: {self.block_node}]>"
 
+# unused function frames, calls take them from here instead of building new ones
+_FRAMES = []
+FREE_FRAMES = 256
+# what a call site finds when the name isn't in the context
+_MISSING = object()
+
 class Function(AST):
+    __slots__ = ("name", "args", "_fun_decl")
+    _caches = ("_fun_decl",)
 
     def __init__(self, name, args):
         self.name = name
         self.args = args
+        # last function called from here, its arity is known to match
+        self._fun_decl = None
 
-    def eval(self, ctx):
+    def bind(self, ctx):
         fun_decl = ctx[self.name]
-        fun_args = fun_decl.args
+        if not isinstance(fun_decl, FunctionDeclaration):
+            raise TypeError(f"{self.name.value!r} is not a function")
+        if len(fun_decl.params) != len(self.args.blocks):
+            raise TypeError(arity_error(self.name, len(fun_decl.params), len(self.args.blocks)))
+        self._fun_decl = fun_decl
+        return fun_decl
 
-        _fun_ctx = {}
-        for index, arg in enumerate(fun_args.blocks):
-            _fun_ctx[arg.name] = self.args.blocks[index].eval(ctx)
-        fun_ctx = Context(_fun_ctx)
-        # allow recursivity
-        fun_ctx[self.name] = fun_decl
+    def eval(self, ctx):
+        fun_decl = ctx._dict.get(self.name, _MISSING)
+        if fun_decl is not self._fun_decl:
+            fun_decl = self.bind(ctx)
 
-        return fun_decl.block_node(fun_ctx)
+        try:
+            # shared by the threads, checking first could race
+            fun_ctx = _FRAMES.pop()
+        except IndexError:
+            fun_ctx = Context()
+        frame = fun_ctx._dict
+        try:
+            for name, arg in zip(fun_decl.params, self.args.blocks):
+                # through `__call__`, the arguments count against the limits too
+                frame[name] = arg(ctx)
+            # allow recursivity
+            frame[self.name] = fun_decl
+            return fun_decl.block_node(fun_ctx)
+        finally:
+            frame.clear()
+            if len(_FRAMES) < FREE_FRAMES:
+                _FRAMES.append(fun_ctx)
 
     def __str__(self):
         return f"<(Function) [name: {self.name}, args: {self.args}]>"
 
+def arity_error(name, expected: int, given: int) -> str:
+    return f"{name.value}() takes {expected} arguments but {given} were given"
+
+class NativeCall(AST):
+    """
+    Call to a function of `pyhulk.natives`, found when parsing
+    """
+    __slots__ = ("name", "args", "native")
+    _caches = ("native",)
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.native = NATIVES[name.value]
+
+    def eval(self, ctx):
+        args = self.args.blocks
+        if len(args) == 1:
+            return self.native.function(args[0](ctx))
+        return self.native.function(*[arg(ctx) for arg in args])
+
+    def __str__(self):
+        return f"<(NativeCall) [name: {self.name}, args: {self.args}]>"
+
 class Lambda(AST):
     """
     let-in expression
     """
+    __slots__ = ("variables", "block_statement")
 
     def __init__(self, variables: List[str], block_statement: AST):
         self.variables = variables
@@ -226,17 +309,19 @@ class Lambda(AST):
         return res
 
 class NonExpression(AST):
+    __slots__ = ()
 
     def eval(self, ctx):
         return None
 
 class Conditional(AST):
+    __slots__ = ("hipotesis", "tesis", "antitesis")
 
     def __init__(
         self,
         hipotesis: AST,
-        tesis: BlockNode,
-        antitesis: BlockNode
+        tesis: AST,
+        antitesis: AST
     ):
         self.hipotesis = hipotesis
         self.tesis = tesis
@@ -248,14 +333,139 @@ class Conditional(AST):
             return self.tesis(ctx)
         return self.antitesis(ctx)
 
+def fields(node: AST) -> dict:
+    """Attributes of a node, slots first"""
+    values = {}
+    for cls in reversed(type(node).__mro__):
+        for name in cls.__dict__.get("__slots__", ()):
+            if name != "__weakref__" and name not in cls._caches and hasattr(node, name):
+                values[name] = getattr(node, name)
+    values.update(getattr(node, "__dict__", {}))
+    return values
+
+def tree_size(node: AST) -> tuple:
+    """
+    (nodes, bytes) of a tree, counting the nodes and the lists holding
+    them but not the tokens and values they share
+    """
+    nodes = 0
+    size = 0
+    seen = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, (list, tuple)):
+            size += sys.getsizeof(node)
+            stack.extend(node)
+            continue
+        if not isinstance(node, AST):
+            continue
+        nodes += 1
+        size += sys.getsizeof(node)
+        if hasattr(node, "__dict__"):
+            size += sys.getsizeof(node.__dict__)
+        stack.extend(fields(node).values())
+    return nodes, size
+
+def check_calls(tree: AST):
+    """
+    Raise the `TypeError` of the first call with the wrong number of
+    arguments before anything runs, for the calls whose function is known:
+    natives, top level calls to the functions declared before them and the
+    recursive calls of a function
+    """
+    def children(node):
+        for value in fields(node).values():
+            if isinstance(value, AST):
+                yield value
+            elif isinstance(value, (list, tuple)):
+                yield from (child for child in value if isinstance(child, AST))
+
+    def check(node, arities: dict):
+        stack = [(node, arities)]
+        while stack:
+            node, arities = stack.pop()
+            if isinstance(node, Lambda):
+                # a let only sees its own bindings, and the natives
+                arities = {}
+            if isinstance(node, NativeCall):
+                expected = node.native.nargs
+            elif isinstance(node, Function):
+                expected = arities.get(node.name.value, len(node.args.blocks))
+            else:
+                expected = None
+            if expected is not None and expected != len(node.args.blocks):
+                raise TypeError(arity_error(node.name, expected, len(node.args.blocks)))
+            stack.extend((child, arities) for child in children(node))
+
+    # name -> arguments of the function bound to it at the top level
+    arities = {}
+    for block in getattr(tree, "blocks", (tree,)):
+        if isinstance(block, FunctionDeclaration):
+            name = block.name.value
+            arities[name] = len(block.params)
+            # the body only sees the arguments and the function itself
+            if all(param.value != name for param in block.params):
+                check(block.block_node, {name: len(block.params)})
+            continue
+        check(block, arities)
+        declarations = block.blocks if isinstance(block, BlockNode) else (block,)
+        for declaration in declarations:
+            if isinstance(declaration, VariableDeclaration):
+                arities.pop(declaration.name.value, None)
+
+def dump_tree(node: AST, indent=0) -> str:
+    """
+    Indented representation of a tree, one node per line.
+
+    `str` evaluates the nodes so it can't be used on most trees.
+    """
+    pad = "  " * indent
+    if isinstance(node, Literal):
+        return f"{pad}{type(node).__name__} {node._val!r}"
+
+    lines = [f"{pad}{type(node).__name__}"]
+    for key, value in fields(node).items():
+        if isinstance(value, AST):
+            lines.append(f"{pad}  {key}:")
+            lines.append(dump_tree(value, indent + 2))
+        elif isinstance(value, (list, tuple)):
+            lines.extend(dump_tree(child, indent + 1) for child in value)
+        else:
+            # tokens
+            lines.append(f"{pad}  {key}: {getattr(value, 'value', value)}")
+    return "\n".join(lines)
+
+def unbind_natives(node: AST, names: set) -> AST:
+    """`node` with its calls to the natives in `names` made calls to functions"""
+    if isinstance(node, NativeCall) and node.name.value in names:
+        node = Function(node.name, node.args)
+    for key, value in fields(node).items():
+        if isinstance(value, AST):
+            setattr(node, key, unbind_natives(value, names))
+        elif isinstance(value, list):
+            value[:] = [unbind_natives(child, names) if isinstance(child, AST) else child for child in value]
+    return node
+
 class Parser:
 
-    def __init__(self, lexer: Lexer, line=1):
+    def __init__(self, lexer: Lexer, line=1, functions: set = None):
         self.lexer = lexer
         self.current_token = self.lexer.get_next_token()
         self.line = line
+        # names of the functions declared so far, they hide the natives
+        self.functions = functions if functions is not None else set()
 
     def error(self, exception):
+        if self.current_token.pos is not None:
+            line, column = position(self.lexer.text, self.current_token.pos)
+            print(f"Error parsing line {line} col {column}")
+            print(self.lexer.text)
+            print(" "*(column - 1) + "^")
+            raise exception
         print(f"Error parsing line {self.line} col {self.lexer.pos+1}")
         print(self.lexer.text)
         print(" "*(self.lexer.column) + "^")
@@ -296,7 +506,9 @@ class Parser:
         name = self.current_token
         self.eat(Tokens.ID)
         args = self.arguments()
-        if args:
+        if args and name.value in NATIVES and name.value not in self.functions:
+            node = NativeCall(name, args)
+        elif args:
             node = Function(name, args)
         else:
             node = Variable(name)
@@ -347,6 +559,8 @@ class Parser:
         self.eat(Tokens.FUNCTION)
         name = self.current_token
         self.eat(Tokens.ID)
+        # before the body, a recursive call isn't a native one
+        self.functions.add(name.value)
         args = self.arguments()
 
         if self.current_token.type == Tokens.FINLINE:
@@ -367,11 +581,7 @@ class Parser:
 
         antitesis = self.expr()
 
-        return Conditional(
-            hipotesis,
-            BlockNode([tesis]),
-            BlockNode([antitesis]),
-        )
+        return Conditional(hipotesis, tesis, antitesis)
 
     def literal(self):
         """
@@ -488,25 +698,89 @@ class Parser:
             self.eat(Tokens.END)
             nodes.append(node)
 
-        return BlockNode(nodes)
+        tree = BlockNode(nodes)
+        # calls parsed before the declaration hiding their native
+        shadowed = self.functions & NATIVES.keys()
+        if shadowed:
+            unbind_natives(tree, shadowed)
+        return tree
+
+# engine name -> module exposing `execute(tree, ctx)`
+# `None` is the tree walker in this module
+ENGINES = {
+    "tree": None,
+    "vm": "pyhulk.vm",
+    "closure": "pyhulk.closure",
+    "resolved": "pyhulk.resolver",
+    "tiered": "pyhulk.tiered",
+}
 
 class Interpreter:
 
     GLOBAL_SCOPE = Context()
-    def __init__(self, parser: Parser):
+    def __init__(
+        self, parser: Parser = None, engine="tree", opt_level=0, dump=False, tree=None, profiler=None, limits=None,
+        **options
+    ):
+        """
+        `tree` is an already parsed (and optimized) program, used instead
+        of the parser.
+        `profiler` is a `pyhulk.profiler.Profiler`, tree engine only.
+        `limits` is a `pyhulk.limits.Limits`, tree engine only.
+        `options` are passed to the `execute` of the engine
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, expected one of {list(ENGINES)}")
+        if options and ENGINES[engine] is None:
+            raise ValueError(f"The {engine} engine takes no options")
+        if profiler is not None and ENGINES[engine] is not None:
+            raise ValueError("Only the tree engine can be profiled")
+        if limits is not None and ENGINES[engine] is not None:
+            raise ValueError("Only the tree engine enforces limits")
+        if limits is not None and profiler is not None:
+            raise ValueError("A profiled run can't have limits")
         self.parser = parser
-        self._tree = None
+        self.engine = engine
+        self.opt_level = opt_level
+        self.dump = dump
+        self.options = options
+        self.profiler = profiler
+        self.limits = limits
+        if tree is not None:
+            check_calls(tree)
+        self._tree = tree
 
     @property
     def tree(self):
         if self._tree is None:
-            self._tree = self.parser.parse()
+            tree = self.parser.parse()
+            if self.opt_level or self.dump:
+                from pyhulk.optimizer import optimize
+                tree = optimize(tree, self.opt_level, self.dump)
+            check_calls(tree)
+            self._tree = tree
         return self._tree
 
     def interpret(self):
+        try:
+            return self._interpret()
+        finally:
+            # what `print` left in its buffer goes out before the result
+            flush()
+
+    def _interpret(self):
         if not self.tree:
             return ""
-        return self.tree(self.GLOBAL_SCOPE)
+        if self.profiler is not None:
+            return self.profiler.run(self.tree, self.GLOBAL_SCOPE)
+        if self.limits is not None:
+            from pyhulk.limits import enforce
+            with enforce(self.limits):
+                return self.tree(self.GLOBAL_SCOPE)
+        if ENGINES[self.engine] is None:
+            return self.tree(self.GLOBAL_SCOPE)
+        engine = importlib.import_module(ENGINES[self.engine])
+        return engine.execute(self.tree, self.GLOBAL_SCOPE, **self.options)
 
 def repl():
     import os
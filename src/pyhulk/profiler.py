@@ -0,0 +1,161 @@
+"""
+Profiler for the tree walker.
+
+Time and calls are attributed to HULK functions, to node types and to the
+top level statements of the program, and the self time of every chain of
+HULK calls is kept for flame graphs (the "collapsed stack" format of
+flamegraph.pl and speedscope):
+
+    profiler = Profiler()
+    Interpreter(parser, profiler=profiler).interpret()
+    print(profiler.report())
+    profiler.write_collapsed("script.folded")
+
+Only the run's own thread is recorded: the hooks go through
+`pyhulk.limits.hooked`, installed while some thread runs limited or
+profiled and removed once the last one ends. `nodes=False` only
+instruments calls, which costs much less.
+"""
+import time
+
+from pyhulk.limits import hooked
+from pyhulk.parser import AST, BlockNode
+
+MAIN = "<main>"
+
+class Stats:
+    __slots__ = ("calls", "total", "self")
+
+    def __init__(self):
+        self.calls = 0
+        # ns, `total` includes the children
+        self.total = 0
+        self.self = 0
+
+class Profiler:
+
+    def __init__(self, nodes=True, timer=time.perf_counter_ns):
+        self.nodes = nodes
+        self.timer = timer
+        self.functions = {}
+        self.node_types = {}
+        self.statements = []
+        # "<main>;f;g" -> self time (ns) of g when called from f
+        self.stacks = {}
+
+    def _call_function(self):
+        functions = self.functions
+        stacks = self.stacks
+        timer = self.timer
+        names = [MAIN]
+        # time spent in the callees of each active call
+        children = [0]
+        active = {}
+
+        def profiled(node, ctx):
+            name = node.name.value
+            names.append(name)
+            children.append(0)
+            active[name] = active.get(name, 0) + 1
+            start = timer()
+            try:
+                # the node profiler when there's one
+                return AST.__call__(node, ctx)
+            finally:
+                elapsed = timer() - start
+                own = elapsed - children.pop()
+                children[-1] += elapsed
+                key = ";".join(names)
+                stacks[key] = stacks.get(key, 0) + own
+                names.pop()
+
+                stats = functions.get(name)
+                if stats is None:
+                    stats = functions[name] = Stats()
+                stats.calls += 1
+                stats.self += own
+                active[name] -= 1
+                # recursive calls are already part of the outermost one
+                if not active[name]:
+                    stats.total += elapsed
+
+        return profiled, children
+
+    def _call_node(self):
+        node_types = self.node_types
+        timer = self.timer
+        children = [0]
+        active = {}
+
+        def profiled(node, ctx):
+            cls = type(node)
+            children.append(0)
+            active[cls] = active.get(cls, 0) + 1
+            start = timer()
+            try:
+                return node.eval(ctx)
+            finally:
+                elapsed = timer() - start
+                own = elapsed - children.pop()
+                children[-1] += elapsed
+                stats = node_types.get(cls)
+                if stats is None:
+                    stats = node_types[cls] = Stats()
+                stats.calls += 1
+                stats.self += own
+                active[cls] -= 1
+                if not active[cls]:
+                    stats.total += elapsed
+
+        return profiled
+
+    def run(self, tree: AST, ctx):
+        """Evaluate `tree` like `BlockNode.eval`, one statement at a time"""
+        blocks = tree.blocks if isinstance(tree, BlockNode) else [tree]
+        function_call, function_children = self._call_function()
+        timer = self.timer
+        result = None
+        try:
+            with hooked(self._call_node() if self.nodes else None, function_call):
+                for index, block in enumerate(blocks):
+                    start = timer()
+                    try:
+                        result = block(ctx)
+                    finally:
+                        self.statements.append((index, block, timer() - start))
+        finally:
+            # whatever the functions didn't take
+            main = sum(elapsed for _, _, elapsed in self.statements) - function_children[0]
+            self.stacks[MAIN] = self.stacks.get(MAIN, 0) + main
+        return result
+
+    def collapsed(self) -> str:
+        """One "frame;frame;frame <microseconds>" line per call chain"""
+        return "\n".join(
+            f"{stack} {ns // 1000}" for stack, ns in sorted(self.stacks.items()) if ns >= 1000
+        )
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.collapsed() + "\n")
+
+    def report(self, limit=20) -> str:
+        lines = []
+
+        def table(title, rows):
+            lines.append(f"{title:<28}{'calls':>10}{'total ms':>12}{'self ms':>12}")
+            for label, stats in sorted(rows, key=lambda row: row[1].self, reverse=True)[:limit]:
+                lines.append(
+                    f"{label:<28}{stats.calls:>10}{stats.total / 1e6:>12.3f}{stats.self / 1e6:>12.3f}"
+                )
+            lines.append("")
+
+        table("function", self.functions.items())
+        if self.nodes:
+            table("node", [(cls.__name__, stats) for cls, stats in self.node_types.items()])
+
+        lines.append(f"{'statement':<28}{'ms':>10}")
+        for index, block, elapsed in sorted(self.statements, key=lambda row: row[2], reverse=True)[:limit]:
+            name = getattr(getattr(block, "name", None), "value", "")
+            lines.append(f"{f'{index + 1} {type(block).__name__} {name}':<28}{elapsed / 1e6:>10.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,153 @@
+"""
+Quickening of the arithmetic and comparison nodes of the resolved engine.
+
+A binary operation starts out adaptive: it evaluates through the generic
+`operation` and watches the types of its operands. Once a site has seen
+the same pair of types `WARMUP` times in a row it rewrites itself (its
+class) into a variant for that pair, which checks the types and applies the
+operator directly, reading a literal right operand in place. When the check
+fails the site deoptimizes back to the adaptive node, and after
+`MAX_DEOPTS` deoptimizations it settles on the generic node for good.
+
+Only the resolver's own copy of the tree is rewritten, never the parsed
+tree. `stats()` counts the sites and their transitions:
+
+    {"sites": 12, "specialized": 9, "deoptimized": 1, "generic": 0,
+     "kinds": {"Higher[int,int]": 3, ...}}
+"""
+import operator
+
+from pyhulk.parser import (
+    Division,
+    Equals,
+    Exp,
+    Higher,
+    Literal,
+    Lower,
+    Modulo,
+    Mult,
+    Substraction,
+    Sum,
+)
+
+# evaluations with the same operand types before specializing a site
+WARMUP = 8
+# deoptimizations before a site stays generic
+MAX_DEOPTS = 2
+
+# the generic `operation` of every node, as an operator
+OPERATORS = {
+    Sum: operator.add,
+    # `a + -b` and `a - b` only differ on types that never get here
+    Substraction: operator.sub,
+    Division: operator.truediv,
+    Mult: operator.mul,
+    Modulo: operator.mod,
+    Exp: operator.pow,
+    Equals: operator.eq,
+    Higher: operator.gt,
+    Lower: operator.lt,
+}
+# operand types a site is specialized for
+TYPES = {int: "int", float: "float", bool: "bool", str: "str"}
+
+STATS = {"sites": 0, "specialized": 0, "deoptimized": 0, "generic": 0, "kinds": {}}
+
+def stats() -> dict:
+    return {**STATS, "kinds": dict(STATS["kinds"])}
+
+def reset_stats():
+    STATS.update(sites=0, specialized=0, deoptimized=0, generic=0, kinds={})
+
+class Adaptive:
+    """Evaluates generically and looks at the operand types"""
+    __slots__ = ()
+
+    def __init__(self, left, right):
+        super().__init__(left, right)
+        self._types = None
+        self._countdown = WARMUP
+        self._deopts = 0
+        STATS["sites"] += 1
+
+    def eval(self, frame):
+        a = self.left(frame)
+        b = self.right(frame)
+        result = self.operation(a, b)
+        types = (type(a), type(b))
+        if types != self._types:
+            self._types = types
+            self._countdown = WARMUP - 1
+        else:
+            self._countdown -= 1
+            if not self._countdown:
+                self.specialize()
+        return result
+
+    def specialize(self):
+        left, right = self._types
+        if left not in TYPES or right not in TYPES:
+            return
+        self.__class__ = specialized(type(self), left, right, isinstance(self.right, Literal))
+        kind = self.__class__.__name__
+        STATS["specialized"] += 1
+        STATS["kinds"][kind] = STATS["kinds"].get(kind, 0) + 1
+
+    def deoptimize(self, a, b):
+        """Back to adaptive (or generic), for operands the variant doesn't take"""
+        # the variant is a subclass of the adaptive node
+        adaptive_cls = type(self).__mro__[1]
+        self._deopts += 1
+        self._types = None
+        self._countdown = WARMUP
+        STATS["deoptimized"] += 1
+        if self._deopts >= MAX_DEOPTS:
+            self.__class__ = _GENERIC[adaptive_cls]
+            STATS["generic"] += 1
+        else:
+            self.__class__ = adaptive_cls
+        return self.operation(a, b)
+
+# parser node -> adaptive node
+_ADAPTIVE = {}
+# adaptive node -> generic node
+_GENERIC = {}
+# (adaptive node, left type, right type, literal right operand) -> variant
+_SPECIALIZED = {}
+
+def adaptive(cls):
+    """Adaptive version of the `BinaryOperation` subclass `cls`"""
+    adaptive_cls = _ADAPTIVE.get(cls)
+    if adaptive_cls is None:
+        adaptive_cls = _ADAPTIVE[cls] = type(
+            f"Adaptive{cls.__name__}", (Adaptive, cls), {"__slots__": ("_types", "_countdown", "_deopts")}
+        )
+        _GENERIC[adaptive_cls] = type(f"Generic{cls.__name__}", (adaptive_cls,), {"__slots__": (), "eval": cls.eval})
+    return adaptive_cls
+
+def specialized(adaptive_cls, left_type, right_type, literal=False):
+    key = (adaptive_cls, left_type, right_type, literal)
+    cls = _SPECIALIZED.get(key)
+    if cls is not None:
+        return cls
+
+    apply = OPERATORS[adaptive_cls.__mro__[2]]
+    # the operands are evaluated without going through `AST.__call__`
+    if literal:
+        # the literal's type can't change, only the left operand is checked
+        def eval(self, frame):
+            a = self.left.eval(frame)
+            if type(a) is left_type:
+                return apply(a, self.right._val)
+            return self.deoptimize(a, self.right._val)
+    else:
+        def eval(self, frame):
+            a = self.left.eval(frame)
+            b = self.right.eval(frame)
+            if type(a) is left_type and type(b) is right_type:
+                return apply(a, b)
+            return self.deoptimize(a, b)
+
+    name = f"{adaptive_cls.__mro__[2].__name__}[{TYPES[left_type]},{TYPES[right_type]}]"
+    cls = _SPECIALIZED[key] = type(name, (adaptive_cls,), {"__slots__": (), "eval": eval})
+    return cls
@@ -0,0 +1,246 @@
+"""
+Lexical addressing for the tree walker.
+
+The resolver runs once over the parsed tree and gives every parameter and
+`let` binding a slot in the frame of its scope. Scopes don't nest, as on the
+tree walker a function body sees its parameters and the function itself and
+a `let` only its own bindings, so at runtime frames are fixed size lists and
+a lookup is an index, no hashing and no chain of frames to walk.
+
+Globals (`var` and `function` at the top level) are still looked up by name
+at the top level, and a name that isn't visible where it's read is reported
+before the program starts running. Arithmetic and comparisons specialize
+themselves on the types they see (`pyhulk.quicken`).
+"""
+from typing import List
+import weakref
+
+from pyhulk.parser import (
+    AST,
+    BinaryOperation,
+    BlockNode,
+    Conditional,
+    Context,
+    FunctionDeclaration,
+    Literal,
+    NativeCall,
+    NonExpression,
+)
+from pyhulk.quicken import adaptive
+
+class ResolveError(NameError):
+    pass
+
+class Frame:
+    __slots__ = ("slots", "globals")
+
+    def __init__(self, size: int, globals_: dict):
+        self.slots = [None] * size
+        self.globals = globals_
+
+class LocalVariable(AST):
+    __slots__ = ("name", "slot")
+
+    def __init__(self, name, slot: int):
+        self.name = name
+        self.slot = slot
+
+    def eval(self, frame):
+        return frame.slots[self.slot]
+
+class GlobalVariable(AST):
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def eval(self, frame):
+        try:
+            return frame.globals[self.name]
+        except KeyError:
+            raise NameError(f"{self.name!r} is not defined")
+
+class GlobalDeclaration(AST):
+    """
+    `var` at the top level
+    """
+    __slots__ = ("name", "expression")
+
+    def __init__(self, name, expression: AST):
+        self.name = name
+        self.expression = expression
+
+    def eval(self, frame):
+        frame.globals[self.name] = self.expression(frame)
+        return None
+
+class FunctionDefinition(AST):
+    """
+    `function` at the top level, binds the original `FunctionDeclaration`
+    so the global scope can be shared with the other engines
+    """
+    __slots__ = ("fun_decl",)
+
+    def __init__(self, fun_decl: FunctionDeclaration):
+        self.fun_decl = fun_decl
+
+    def eval(self, frame):
+        frame.globals[self.fun_decl.name] = self.fun_decl
+        return None
+
+class ResolvedFunction:
+
+    def __init__(self, name, nargs: int, nlocals: int, body: AST):
+        self.name = name
+        self.nargs = nargs
+        # the arguments and the function, last
+        self.nlocals = nlocals
+        self.body = body
+
+class Call(AST):
+    __slots__ = ("callee", "args", "_fun_decl", "_function")
+
+    def __init__(self, callee: AST, args: List[AST]):
+        self.callee = callee
+        self.args = args
+        # last function seen by this call site
+        self._fun_decl = None
+        self._function = None
+
+    def eval(self, frame):
+        fun_decl = self.callee(frame)
+        if fun_decl is not self._fun_decl:
+            if not isinstance(fun_decl, FunctionDeclaration):
+                raise TypeError(f"{fun_decl!r} is not a function")
+            self._function = resolve_function(fun_decl)
+            self._fun_decl = fun_decl
+        function = self._function
+        if len(self.args) != function.nargs:
+            raise TypeError(
+                f"{function.name.value}() takes {function.nargs} arguments but {len(self.args)} were given"
+            )
+
+        # let bindings get their own frames, a function frame only holds the arguments and itself
+        fun_frame = Frame(function.nlocals, frame.globals)
+        slots = fun_frame.slots
+        for index, arg in enumerate(self.args):
+            slots[index] = arg(frame)
+        slots[-1] = fun_decl
+        return function.body(fun_frame)
+
+class Let(AST):
+    __slots__ = ("bindings", "size", "body")
+
+    def __init__(self, bindings: List[tuple], size: int, body: AST):
+        self.bindings = bindings
+        self.size = size
+        self.body = body
+
+    def eval(self, frame):
+        let_frame = Frame(self.size, frame.globals)
+        slots = let_frame.slots
+        for slot, expression in self.bindings:
+            slots[slot] = expression(let_frame)
+        return self.body(let_frame)
+
+class Resolver:
+
+    def __init__(self, global_names: set = frozenset(), params: List = (), name=None):
+        self.global_names = global_names
+        # one dict (name -> slot) per frame, innermost last, none at the top level
+        self.scopes = []
+        if name is not None:
+            scope = {param.name.value: index for index, param in enumerate(params)}
+            # after the parameters, it hides one with the same name
+            scope[name.value] = len(params)
+            self.scopes.append(scope)
+
+    def variable(self, name) -> AST:
+        if self.scopes:
+            # the scopes around the innermost one aren't seen
+            slot = self.scopes[-1].get(name.value)
+            if slot is None:
+                raise ResolveError(f"{name!r} is not defined")
+            return LocalVariable(name, slot)
+        if name.value not in self.global_names:
+            raise ResolveError(f"{name!r} is not defined")
+        return GlobalVariable(name)
+
+    def resolve(self, node: AST) -> AST:
+        if isinstance(node, BinaryOperation):
+            return adaptive(type(node))(self.resolve(node.left), self.resolve(node.right))
+        if isinstance(node, (Literal, NonExpression)):
+            return node
+        method = getattr(self, "resolve_" + type(node).__name__, None)
+        if method is None:
+            raise ResolveError(f"Can't resolve {type(node).__name__}")
+        return method(node)
+
+    def resolve_BlockNode(self, node):
+        return BlockNode([self.resolve(block) for block in node.blocks])
+
+    def resolve_Conditional(self, node):
+        return Conditional(
+            self.resolve(node.hipotesis),
+            self.resolve(node.tesis),
+            self.resolve(node.antitesis),
+        )
+
+    def resolve_Variable(self, node):
+        return self.variable(node.name)
+
+    def resolve_VariableDeclaration(self, node):
+        # `var` is only allowed at the top level
+        return GlobalDeclaration(node.name, self.resolve(node.expression))
+
+    def resolve_FunctionDeclaration(self, node):
+        # report undefined names in the body now, not on the first call
+        resolve_function(node)
+        return FunctionDefinition(node)
+
+    def resolve_Function(self, node):
+        return Call(self.variable(node.name), [self.resolve(arg) for arg in node.args.blocks])
+
+    def resolve_NativeCall(self, node):
+        return NativeCall(node.name, BlockNode([self.resolve(arg) for arg in node.args.blocks]))
+
+    def resolve_Lambda(self, node):
+        scope = {}
+        self.scopes.append(scope)
+        bindings = []
+        for declaration in node.variables.blocks:
+            # resolved before binding, `let x = x + 1` can't read x
+            expression = self.resolve(declaration.expression)
+            scope[declaration.name.value] = len(bindings)
+            bindings.append((len(bindings), expression))
+        body = self.resolve(node.block_statement)
+        self.scopes.pop()
+        return Let(bindings, len(bindings), body)
+
+def global_names(tree: AST, globals_: dict) -> set:
+    """Names in the global scope plus the ones the program declares"""
+    names = {key.value for key in globals_}
+    for node in getattr(tree, "blocks", ()):
+        if isinstance(node, FunctionDeclaration):
+            names.add(node.name.value)
+        elif isinstance(node, BlockNode):
+            # var a = 1, b = 2;
+            names.update(decl.name.value for decl in node.blocks)
+    return names
+
+# FunctionDeclaration -> ResolvedFunction
+_FUNCTIONS = weakref.WeakKeyDictionary()
+
+def resolve_function(fun_decl: FunctionDeclaration) -> ResolvedFunction:
+    function = _FUNCTIONS.get(fun_decl)
+    if function is None:
+        params = fun_decl.args.blocks
+        body = Resolver(params=params, name=fun_decl.name).resolve(fun_decl.block_node)
+        function = _FUNCTIONS[fun_decl] = ResolvedFunction(fun_decl.name, len(params), len(params) + 1, body)
+    return function
+
+def resolve(tree: AST, globals_: dict) -> AST:
+    return Resolver(global_names(tree, globals_)).resolve(tree)
+
+def execute(tree, ctx: Context):
+    return resolve(tree, ctx._dict)(Frame(0, ctx._dict))
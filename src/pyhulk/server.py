@@ -0,0 +1,217 @@
+"""
+Evaluation server, programs stay compiled between requests.
+
+Listens on localhost TCP or a Unix socket and speaks JSON lines, one
+request object per line and one response per request. Requests on a
+connection are served concurrently, `id` is copied to the response so the
+client can match them:
+
+    {"id": 1, "op": "compile", "source": "x * 2 + y;"}
+    {"id": 1, "ok": true, "program": "5f1c..."}
+    {"id": 2, "op": "evaluate", "program": "5f1c...", "bindings": {"x": 1, "y": 2}}
+    {"id": 2, "ok": true, "value": 4}
+    {"id": 3, "op": "drop", "program": "5f1c..."}
+    {"id": 4, "op": "stats"}
+
+`evaluate` also takes a `source` instead of a `program`. Failures answer
+`{"ok": false, "error": "..."}`. Programs are compiled and evaluated on a
+thread pool, the server keeps the compiled `Program`s until they're
+dropped. With a process pool (`processes=True`) the server only keeps the
+sources: every worker compiles its own copy of a program the first time it
+evaluates it and keeps it in its `pyhulk.compile` cache, `drop` doesn't
+reach those. `stats` reports a latency histogram per operation.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import hashlib
+import json
+import time
+
+import pyhulk
+
+DEFAULT_PORT = 7733
+# longest request line, in bytes
+LINE_LIMIT = 16 * 1024 * 1024
+
+class RequestError(Exception):
+    pass
+
+class Histogram:
+    """
+    Latencies in power of two buckets of microseconds, bucket `n` counts
+    the requests that took less than 2**n us (and at least 2**(n-1))
+    """
+
+    def __init__(self, buckets=32):
+        self.buckets = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        micros = seconds * 1e6
+        index = min(int(micros).bit_length(), len(self.buckets) - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += micros
+        self.max = max(self.max, micros)
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound (us) of the bucket holding the percentile"""
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= fraction * self.count:
+                return 2 ** index
+        return 0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "max_us": self.max,
+            "p50_us": self.percentile(0.5),
+            "p90_us": self.percentile(0.9),
+            "p99_us": self.percentile(0.99),
+            # upper bound (us) -> requests
+            "buckets": {2 ** index: count for index, count in enumerate(self.buckets) if count},
+        }
+
+def program_id(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+def _compile(source: str):
+    # in a worker process, checks the source and keeps the compiled program
+    pyhulk.compile(source)
+
+def _evaluate(source: str, bindings: dict):
+    return pyhulk.compile(source).evaluate(bindings)
+
+class Server:
+
+    def __init__(self, workers: int = None, processes=False):
+        # id -> Program, or its source with a process pool
+        self.programs = {}
+        self.histograms = {}
+        self.errors = 0
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(workers)
+        self.handlers = {
+            "compile": self.compile,
+            "evaluate": self.evaluate,
+            "drop": self.drop,
+            "stats": self.stats,
+        }
+
+    async def _compile(self, source) -> str:
+        if not isinstance(source, str):
+            raise RequestError("'source' must be a string")
+        key = program_id(source)
+        if key not in self.programs:
+            # parsing and code generation off the event loop
+            loop = asyncio.get_running_loop()
+            if self.processes:
+                await loop.run_in_executor(self.executor, _compile, source)
+                self.programs[key] = source
+            else:
+                self.programs[key] = await loop.run_in_executor(self.executor, pyhulk.Program, source)
+        return key
+
+    async def compile(self, request):
+        return {"program": await self._compile(request.get("source"))}
+
+    async def evaluate(self, request):
+        if "source" in request:
+            program = self.programs[await self._compile(request["source"])]
+        else:
+            try:
+                program = self.programs[request.get("program")]
+            except KeyError:
+                raise RequestError(f"Unknown program {request.get('program')!r}")
+        bindings = request.get("bindings") or {}
+        if not isinstance(bindings, dict):
+            raise RequestError("'bindings' must be an object")
+        loop = asyncio.get_running_loop()
+        if self.processes:
+            return {"value": await loop.run_in_executor(self.executor, _evaluate, program, bindings)}
+        return {"value": await loop.run_in_executor(self.executor, program.evaluate, bindings)}
+
+    async def drop(self, request):
+        return {"dropped": self.programs.pop(request.get("program"), None) is not None}
+
+    async def stats(self, request):
+        return {
+            "programs": len(self.programs),
+            "errors": self.errors,
+            "latency": {op: histogram.snapshot() for op, histogram in self.histograms.items()},
+        }
+
+    async def handle(self, request) -> dict:
+        start = time.perf_counter()
+        op = request.get("op") if isinstance(request, dict) else None
+        response = {"id": request.get("id")} if isinstance(request, dict) else {"id": None}
+        try:
+            handler = self.handlers.get(op)
+            if handler is None:
+                raise RequestError(f"Unknown op {op!r}, expected one of {list(self.handlers)}")
+            response.update(ok=True, **await handler(request))
+        except Exception as exc:
+            self.errors += 1
+            response.update(ok=False, error=f"{type(exc).__name__}: {exc}")
+        if op in self.handlers:
+            histogram = self.histograms.get(op)
+            if histogram is None:
+                histogram = self.histograms[op] = Histogram()
+            histogram.add(time.perf_counter() - start)
+        return response
+
+    async def handle_line(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            self.errors += 1
+            return {"id": None, "ok": False, "error": f"Invalid JSON: {exc}"}
+        return await self.handle(request)
+
+    async def connection(self, reader, writer):
+        tasks = set()
+
+        async def respond(line):
+            response = await self.handle_line(line)
+            writer.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+            await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # longer than LINE_LIMIT, the stream can't be resynchronized
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.connection, path, limit=LINE_LIMIT)
+        return await asyncio.start_server(self.connection, host, port, limit=LINE_LIMIT)
+
+    def close(self):
+        self.executor.shutdown()
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, path=None, workers=None, processes=False):
+    server = Server(workers, processes)
+    listener = await server.start(host, port, path)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
@@ -1,12 +1,13 @@
 from logging.config import dictConfig
 from pathlib import Path
+import os
 import sys
 
 # Paths
 BASE_DIR = Path(__file__).parent
 
 # Config
-DEBUG = True
+DEBUG = os.environ.get("PYHULK_DEBUG") == "1"
 
 # Logging
 LOGGERS = {
@@ -0,0 +1,83 @@
+"""
+Statement at a time execution of scripts too big to parse at once.
+
+    for value in run_stream("generated.hulk"):
+        print(value)
+
+The file is memory mapped and cut at every `;` outside of a string, each
+statement is lexed, parsed and evaluated on its own and its tree dropped
+before the next one is read: memory doesn't grow with the size of the
+script (only with what it declares) and the first results come out
+straight away. `;` and `"` are single bytes in UTF-8, so statements are
+cut before decoding them.
+"""
+from contextlib import ExitStack, redirect_stdout
+import mmap
+import re
+import sys
+from pathlib import Path
+
+from pyhulk.lexer import tokenize
+from pyhulk.parser import Context, Interpreter, Parser
+
+# up to the `;` closing a statement, strings may have `;` inside
+STATEMENT = re.compile(rb'[^";]*(?:"[^"]*"[^";]*)*;')
+
+def statements(buffer):
+    """(byte offset, text) of every statement of `buffer`, in order"""
+    match = STATEMENT.match
+    pos = 0
+    end = len(buffer)
+    while pos < end:
+        found = match(buffer, pos)
+        if found is None:
+            # no closing `;`, let the parser report it
+            rest = bytes(buffer[pos:])
+            if not rest.isspace():
+                yield pos, rest.decode("utf-8")
+            return
+        yield pos, found.group().decode("utf-8")
+        pos = found.end()
+
+def open_script(path):
+    """Read only memory map of the script, `b""` when it's empty"""
+    with open(path, "rb") as file:
+        if not Path(path).stat().st_size:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def run_stream(path, opt_level=0, ctx: Context = None, limits=None):
+    """
+    Value of every statement of the script at `path` as it's evaluated,
+    on the tree walker. `ctx` defaults to the interpreter's global scope
+    """
+    if ctx is None:
+        ctx = Interpreter.GLOBAL_SCOPE
+    if opt_level:
+        from pyhulk.optimizer import optimize
+
+    with ExitStack() as stack:
+        if limits is not None:
+            # one budget for the whole script
+            from pyhulk.limits import enforce
+            stack.enter_context(enforce(limits))
+        buffer = open_script(path)
+        if isinstance(buffer, mmap.mmap):
+            stack.callback(buffer.close)
+
+        # user functions hide the natives in the statements after them
+        functions = set()
+        for offset, text in statements(buffer):
+            try:
+                # stdout is for the values, the parser reports its errors there
+                with redirect_stdout(sys.stderr):
+                    tree = Parser(tokenize(text), functions=functions).parse()
+            except Exception as exc:
+                # the parser counts lines from the start of the statement
+                skipped = text[:len(text) - len(text.lstrip())]
+                line = bytes(buffer[:offset]).count(b"\n") + skipped.count("\n") + 1
+                exc.add_note(f"In the statement starting at line {line}")
+                raise
+            if opt_level:
+                tree = optimize(tree, opt_level)
+            yield tree(ctx)
@@ -0,0 +1,283 @@
+"""
+Tiered execution: the tree walker, with its hot functions compiled to Python.
+
+Every function starts on the tree walker, which counts its calls. The call
+that takes a function to `threshold` calls promotes it: the declaration is
+translated by `pyhulk.transpiler`, built with `compile()`, and the calls
+after it (recursive ones included) run the compiled function. A pure
+function is also run compiled on the arguments of that call, to check the
+result and to time it against the tree walker.
+
+Only functions whose compiled version can't be told apart from the tree
+walker are promoted: the body reads its parameters and its `let` bindings
+and calls natives and itself, as the tree walker scopes them (a `let` only
+sees its own bindings).
+
+    tiering = Tiering(threshold=100)
+    Interpreter(parser, engine="tiered", tiering=tiering).interpret()
+    print(tiering.report())
+
+`Tiering(tier_up=False)` only counts the calls. The engine runs its own copy
+of the tree, the parsed one is left as it is.
+"""
+import copy
+import time
+
+from pyhulk.memo import PurityAnalyzer
+from pyhulk.parser import (
+    _FRAMES,
+    _MISSING,
+    FREE_FRAMES,
+    AST,
+    BinaryOperation,
+    BlockNode,
+    Conditional,
+    Context,
+    Function,
+    FunctionDeclaration,
+    Lambda,
+    Literal,
+    NativeCall,
+    NonExpression,
+    Variable,
+    fields,
+)
+from pyhulk.transpiler import TranspileError, Transpiler, python_name
+
+# calls on the tree walker before a function is compiled
+THRESHOLD = 50
+# compiled runs of the promoting call, the fastest is the one timed
+REPLAYS = 3
+
+class TieredFunction:
+    """What the tiers know about a `FunctionDeclaration`"""
+    __slots__ = ("name", "calls", "compiled_calls", "compiled", "source", "promoting", "tree_ns", "compiled_ns", "reason")
+
+    def __init__(self, name: str):
+        self.name = name
+        # calls on the tree walker, and calls from it to the compiled function
+        self.calls = 0
+        self.compiled_calls = 0
+        self.compiled = None
+        self.source = None
+        self.promoting = False
+        # the promoting call on each tier
+        self.tree_ns = None
+        self.compiled_ns = None
+        # why it wasn't promoted
+        self.reason = None
+
+    @property
+    def speedup(self):
+        """Measured on the promoting call, None when it wasn't replayed"""
+        if self.tree_ns is None or self.compiled_ns is None:
+            return None
+        return self.tree_ns / self.compiled_ns
+
+    def __repr__(self):
+        return f"<(TieredFunction) [name: {self.name}, calls: {self.calls}, compiled: {self.compiled is not None}]>"
+
+class Tiering:
+    """Call counts and promotions of the tiered evaluations it's passed to"""
+
+    def __init__(self, threshold: int = THRESHOLD, tier_up=True):
+        self.threshold = threshold
+        self.tier_up = tier_up
+        # FunctionDeclaration -> TieredFunction
+        self.functions = {}
+
+    def function(self, fun_decl: FunctionDeclaration) -> TieredFunction:
+        function = self.functions.get(fun_decl)
+        if function is None:
+            function = self.functions[fun_decl] = TieredFunction(fun_decl.name.value)
+        return function
+
+    def promote(self, fun_decl: FunctionDeclaration, function: TieredFunction, values: list, result, elapsed: int):
+        """
+        Compile `fun_decl`, which returned `result` for `values` in `elapsed`
+        ns on the tree walker
+        """
+        try:
+            source, compiled, pure = compile_function(fun_decl)
+        except TranspileError as exc:
+            function.reason = str(exc)
+            return
+
+        if pure:
+            best = None
+            for _ in range(REPLAYS):
+                start = time.perf_counter_ns()
+                try:
+                    replayed = compiled(*values)
+                except Exception as exc:
+                    function.reason = f"compiled, it raised {type(exc).__name__}"
+                    return
+                ns = time.perf_counter_ns() - start
+                best = ns if best is None else min(best, ns)
+            if type(replayed) is not type(result) or replayed != result:
+                function.reason = f"compiled, it returned {replayed!r} instead of {result!r}"
+                return
+            function.tree_ns = elapsed
+            function.compiled_ns = max(best, 1)
+        function.source = source
+        function.compiled = compiled
+
+    def promoted(self) -> dict:
+        """name -> speedup of the compiled functions"""
+        return {function.name: function.speedup for function in self.functions.values() if function.compiled}
+
+    def report(self) -> str:
+        lines = [f"{'function':<20}{'calls':>10}{'compiled':>10}{'speedup':>10}  tier"]
+        for function in sorted(
+            self.functions.values(), key=lambda function: function.calls + function.compiled_calls, reverse=True
+        ):
+            speedup = f"{function.speedup:.1f}x" if function.speedup is not None else "-"
+            if function.compiled is not None:
+                tier = "compiled" if function.speedup is not None else "compiled (impure, not timed)"
+            elif function.reason is not None:
+                tier = f"tree: {function.reason}"
+            else:
+                tier = "tree"
+            lines.append(f"{function.name:<20}{function.calls:>10}{function.compiled_calls:>10}{speedup:>10}  {tier}")
+        return "\n".join(lines)
+
+class TieredCall(Function):
+    """Call site counting the calls of its function, and calling it compiled once promoted"""
+    __slots__ = ("tiering", "_function")
+    _caches = ("_fun_decl", "_function")
+
+    def __init__(self, name, args, tiering: Tiering):
+        super().__init__(name, args)
+        self.tiering = tiering
+        # the TieredFunction of `_fun_decl`, None when it's called by another name
+        self._function = None
+
+    def eval(self, ctx):
+        fun_decl = ctx._dict.get(self.name, _MISSING)
+        if fun_decl is not self._fun_decl:
+            fun_decl = self.bind(ctx)
+            # the body sees the function by the name it's called with
+            self._function = self.tiering.function(fun_decl) if self.name.value == fun_decl.name.value else None
+        function = self._function
+        if function is None:
+            return Function.eval(self, ctx)
+
+        compiled = function.compiled
+        if compiled is not None:
+            function.compiled_calls += 1
+            return compiled(*[arg.eval(ctx) for arg in self.args.blocks])
+
+        function.calls += 1
+        tiering = self.tiering
+        if (
+            function.calls >= tiering.threshold
+            and tiering.tier_up
+            and not function.promoting
+            and function.reason is None
+        ):
+            return self.promote(ctx, fun_decl, function)
+
+        # `Function.eval`
+        try:
+            fun_ctx = _FRAMES.pop()
+        except IndexError:
+            fun_ctx = Context()
+        frame = fun_ctx._dict
+        try:
+            for name, arg in zip(fun_decl.params, self.args.blocks):
+                frame[name] = arg(ctx)
+            frame[self.name] = fun_decl
+            return fun_decl.block_node(fun_ctx)
+        finally:
+            frame.clear()
+            if len(_FRAMES) < FREE_FRAMES:
+                _FRAMES.append(fun_ctx)
+
+    def promote(self, ctx, fun_decl: FunctionDeclaration, function: TieredFunction):
+        """Time this call on the tree walker and compile the function"""
+        values = [arg.eval(ctx) for arg in self.args.blocks]
+        fun_ctx = Context(dict(zip(fun_decl.params, values)))
+        fun_ctx[self.name] = fun_decl
+        function.promoting = True
+        try:
+            start = time.perf_counter_ns()
+            result = fun_decl.block_node(fun_ctx)
+            elapsed = time.perf_counter_ns() - start
+        finally:
+            function.promoting = False
+        self.tiering.promote(fun_decl, function, values, result, elapsed)
+        return result
+
+def check_scopes(fun_decl: FunctionDeclaration) -> dict:
+    """
+    Raise `TranspileError` unless every name in the body of `fun_decl` is
+    one the tree walker finds, returns the natives called (name -> function)
+    """
+    name = fun_decl.name.value
+    if any(param.value == name for param in fun_decl.params):
+        raise TranspileError(f"{name} has a parameter named like it")
+    natives = {}
+
+    def visit(node, scope: set, recursive: bool):
+        if isinstance(node, Variable):
+            if node.name.value not in scope:
+                raise TranspileError(f"reads {node.name.value}")
+        elif isinstance(node, Function):
+            if not recursive or node.name.value != name:
+                raise TranspileError(f"calls {node.name.value}")
+            visit(node.args, scope, recursive)
+        elif isinstance(node, NativeCall):
+            natives[node.name.value] = node.native.function
+            visit(node.args, scope, recursive)
+        elif isinstance(node, Lambda):
+            # a let gets a scope of its own, the function isn't in it
+            local = set()
+            for declaration in node.variables.blocks:
+                visit(declaration.expression, local, False)
+                local.add(declaration.name.value)
+            visit(node.block_statement, local, False)
+        elif isinstance(node, (BinaryOperation, BlockNode, Conditional)):
+            for value in fields(node).values():
+                for child in value if isinstance(value, list) else (value,):
+                    visit(child, scope, recursive)
+        elif not isinstance(node, (Literal, NonExpression)):
+            raise TranspileError(f"has a {type(node).__name__}")
+
+    visit(fun_decl.block_node, {param.value for param in fun_decl.params}, True)
+    return natives
+
+class FunctionTranspiler(Transpiler):
+    """Transpiles the bodies of the engine's copy of the tree"""
+
+    def expression_TieredCall(self, node):
+        return self.expression_Function(node)
+
+def compile_function(fun_decl: FunctionDeclaration) -> tuple:
+    """(source, Python function, whether it's pure) of `fun_decl`"""
+    natives = check_scopes(fun_decl)
+    source = "\n".join(FunctionTranspiler().function(fun_decl)) + "\n"
+    namespace = {f"{name}_native": function for name, function in natives.items()}
+    exec(compile(source, f"<hulk {fun_decl.name.value}>", "exec"), namespace)
+    pure = PurityAnalyzer({fun_decl.name: fun_decl}).is_pure(fun_decl)
+    return source, namespace[python_name(fun_decl.name.value)], pure
+
+def copy_tree(node, tiering: Tiering):
+    """`node` with its calls replaced by `TieredCall`s"""
+    if isinstance(node, list):
+        return [copy_tree(child, tiering) for child in node]
+    if not isinstance(node, AST):
+        return node
+    if type(node) is Function:
+        return TieredCall(node.name, copy_tree(node.args, tiering), tiering)
+    new = copy.copy(node)
+    for name, value in fields(node).items():
+        if isinstance(value, (AST, list)):
+            setattr(new, name, copy_tree(value, tiering))
+    return new
+
+def execute(tree, ctx: Context, tiering: Tiering = None):
+    """
+    `tiering` collects the counts and promotions, by default a `Tiering`
+    with the default threshold
+    """
+    return copy_tree(tree, tiering if tiering is not None else Tiering())(ctx)
@@ -0,0 +1,258 @@
+"""
+Ahead of time translation of HULK programs to Python modules.
+
+Functions become `def`, `let` bindings become local variables (renamed so
+shadowing keeps working) and `if/else` becomes a conditional expression.
+The top level of the program goes into `hulk_main`, which returns the
+value of the last statement.
+
+HULK identifiers can't contain `_`, every name introduced by the
+transpiler does, so they never clash. Natives are taken from the registry
+of `pyhulk.natives` when `hulk_main` starts.
+"""
+from pathlib import Path
+from typing import List
+import hashlib
+import importlib.util
+import keyword
+import os
+import py_compile
+import tempfile
+
+from pyhulk.lexer import tokenize
+from pyhulk.parser import (
+    BlockNode,
+    Division,
+    Equals,
+    Exp,
+    FunctionDeclaration,
+    Higher,
+    Lambda,
+    Literal,
+    Lower,
+    Modulo,
+    Mult,
+    Parser,
+    Substraction,
+    Sum,
+    VariableDeclaration,
+)
+
+# bump when the generated code changes so old artifacts are rebuilt
+FORMAT_VERSION = 2
+
+HASH_HEADER = "# pyhulk-source-hash: "
+
+OPERATORS = {
+    Sum: "+",
+    Substraction: "+ -",
+    Mult: "*",
+    Division: "/",
+    Modulo: "%",
+    Exp: "**",
+    Equals: "==",
+    Higher: ">",
+    Lower: "<",
+}
+
+class TranspileError(Exception):
+    pass
+
+def source_hash(text: str) -> str:
+    return hashlib.sha256(f"{FORMAT_VERSION}:{text}".encode("utf-8")).hexdigest()
+
+def python_name(name: str) -> str:
+    if keyword.iskeyword(name) or keyword.issoftkeyword(name):
+        return name + "_"
+    return name
+
+class Transpiler:
+
+    def __init__(self):
+        # HULK name -> python name, innermost scope last
+        self.scopes: List[dict] = [{}]
+        self.counter = 0
+        # names of the natives called
+        self.natives = set()
+
+    def name(self, token):
+        for scope in reversed(self.scopes):
+            if token.value in scope:
+                return scope[token.value]
+        return python_name(token.value)
+
+    def bind(self, token):
+        """A fresh python name for a `let` binding"""
+        self.counter += 1
+        name = f"{token.value}_{self.counter}"
+        self.scopes[-1][token.value] = name
+        return name
+
+    def expression(self, node) -> str:
+        if type(node) in OPERATORS:
+            return f"({self.expression(node.left)} {OPERATORS[type(node)]} {self.expression(node.right)})"
+        method = getattr(self, "expression_" + type(node).__name__, None)
+        if method is None:
+            if isinstance(node, Literal):
+                return self.expression_Literal(node)
+            raise TranspileError(f"Can't transpile {type(node).__name__} as an expression")
+        return method(node)
+
+    def expression_Literal(self, node):
+        return repr(node._val)
+
+    def expression_NonExpression(self, node):
+        return "None"
+
+    def expression_Variable(self, node):
+        return self.name(node.name)
+
+    def expression_Function(self, node):
+        args = ", ".join(self.expression(arg) for arg in node.args.blocks)
+        return f"{self.name(node.name)}({args})"
+
+    def expression_NativeCall(self, node):
+        self.natives.add(node.name.value)
+        args = ", ".join(self.expression(arg) for arg in node.args.blocks)
+        return f"{node.name.value}_native({args})"
+
+    def expression_BlockNode(self, node):
+        if len(node.blocks) == 1:
+            return self.expression(node.blocks[0])
+        blocks = ", ".join(self.expression(block) for block in node.blocks)
+        return f"({blocks})[-1]"
+
+    def expression_Conditional(self, node):
+        return "({} if {} else {})".format(
+            self.expression(node.tesis),
+            self.expression(node.hipotesis),
+            self.expression(node.antitesis),
+        )
+
+    def expression_Lambda(self, node):
+        self.scopes.append({})
+        bindings = []
+        for declaration in node.variables.blocks:
+            value = self.expression(declaration.expression)
+            bindings.append(f"({self.bind(declaration.name)} := {value})")
+        body = self.expression(node.block_statement)
+        self.scopes.pop()
+        return f"({', '.join(bindings)}, {body})[-1]"
+
+    def function(self, node: FunctionDeclaration) -> List[str]:
+        params = [python_name(arg.name.value) for arg in node.args.blocks]
+        lines = [f"def {python_name(node.name.value)}({', '.join(params)}):"]
+
+        # a chain of `let` around the body becomes plain assignments
+        self.scopes.append({})
+        body = node.block_node
+        while isinstance(body, Lambda):
+            for declaration in body.variables.blocks:
+                value = self.expression(declaration.expression)
+                lines.append(f"    {self.bind(declaration.name)} = {value}")
+            body = body.block_statement
+        lines.append(f"    return {self.expression(body)}")
+        self.scopes.pop()
+        return lines
+
+    def program(self, tree: BlockNode, digest: str = None) -> str:
+        lines = [f"{HASH_HEADER}{digest or ''}", "# generated by pyhulk, do not edit", ""]
+
+        names = []
+        for node in tree.blocks:
+            if isinstance(node, (VariableDeclaration, FunctionDeclaration)):
+                names.append(python_name(node.name.value))
+            elif isinstance(node, BlockNode):
+                names.extend(python_name(decl.name.value) for decl in node.blocks)
+
+        body = []
+        if names:
+            body.append(f"global {', '.join(dict.fromkeys(names))}")
+        body.append("hulk_result = None")
+        for node in tree.blocks:
+            body.extend(self.statement(node))
+        body.append("return hulk_result")
+        if self.natives:
+            natives = ["from pyhulk.natives import NATIVES as hulk_natives"]
+            natives.extend(f'{name}_native = hulk_natives["{name}"].function' for name in sorted(self.natives))
+            body[1 if names else 0:0] = natives
+
+        lines.append("def hulk_main():")
+        for line in body:
+            lines.append("    " + line)
+        lines.append("")
+        lines.append('if __name__ == "__main__":')
+        if self.natives:
+            # `print` output first
+            lines.append("    hulk_value = hulk_main()")
+            lines.append("    from pyhulk.natives import flush")
+            lines.append("    flush()")
+            lines.append("    print(hulk_value)")
+        else:
+            lines.append("    print(hulk_main())")
+        lines.append("")
+        return "\n".join(lines)
+
+    def statement(self, node) -> List[str]:
+        if isinstance(node, FunctionDeclaration):
+            return self.function(node) + ["hulk_result = None"]
+        if isinstance(node, BlockNode) and all(isinstance(decl, VariableDeclaration) for decl in node.blocks):
+            # var a = 1, b = 2;
+            lines = [f"{python_name(decl.name.value)} = {self.expression(decl.expression)}" for decl in node.blocks]
+            return lines + ["hulk_result = None"]
+        return [f"hulk_result = {self.expression(node)}"]
+
+def transpile(tree: BlockNode, digest: str = None) -> str:
+    return Transpiler().program(tree, digest)
+
+def compiled_path(path: Path) -> Path:
+    return Path(path).with_suffix(".py")
+
+def is_compiled(output: Path) -> bool:
+    """Whether `output` is a module written by `compile_file`"""
+    try:
+        with open(output, encoding="utf-8") as file:
+            return file.readline().startswith(HASH_HEADER)
+    except (OSError, UnicodeDecodeError):
+        return False
+
+def compile_file(path, output=None) -> Path:
+    """
+    Translate the HULK script at `path` to a Python module and byte-compile it,
+    raises `FileExistsError` rather than replacing a file pyhulk didn't write
+    """
+    path = Path(path)
+    output = Path(output) if output else compiled_path(path)
+    if output.exists() and not is_compiled(output):
+        raise FileExistsError(f"{output} wasn't compiled by pyhulk, not overwriting it")
+    text = path.read_text(encoding="utf-8")
+
+    source = transpile(Parser(tokenize(text)).parse(), source_hash(text))
+
+    # write and rename so a concurrent `run` never sees half a module
+    fd, tmp = tempfile.mkstemp(dir=output.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(source)
+    os.replace(tmp, output)
+
+    py_compile.compile(str(output), doraise=True)
+    return output
+
+def load_compiled(path, output=None):
+    """
+    Import the module compiled from `path`, None if it's missing or stale
+    """
+    path = Path(path)
+    output = Path(output) if output else compiled_path(path)
+    if not output.exists():
+        return None
+
+    with open(output, encoding="utf-8") as file:
+        header = file.readline().rstrip("\n")
+    if header != HASH_HEADER + source_hash(path.read_text(encoding="utf-8")):
+        return None
+
+    spec = importlib.util.spec_from_file_location(f"hulk_{output.stem}", output)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,199 @@
+"""
+Evaluation of one program over many rows of bindings.
+
+    tree = Parser(tokenize("if (x > 0) x * y else 0;")).parse()
+    evaluate_columns(tree, {"x": numpy.array(...), "y": numpy.array(...)})
+
+With NumPy the arithmetic, comparisons and conditionals (as `where`) run
+elementwise over whole columns. Anything that can't be vectorized with the
+same results as the tree walker (strings, function calls, integers that
+would overflow 64 bits, a division by zero in any row) is evaluated one row
+at a time instead, which is also what happens without NumPy. Of the
+natives only `sqrt` is vectorized, NumPy's `exp` or `log` may round
+differently than `math`.
+"""
+import math
+
+from pyhulk.lexer import Token, Tokens
+from pyhulk.parser import (
+    AST,
+    Context,
+    Division,
+    Equals,
+    Exp,
+    Higher,
+    Lower,
+    Modulo,
+    Mult,
+    Substraction,
+    Sum,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# int64 results at least this big may have wrapped around
+INT_LIMIT = 2.0 ** 62
+
+class NotVectorizable(Exception):
+    pass
+
+class Vectorizer:
+
+    def __init__(self):
+        if numpy is not None:
+            self.operations = {
+                Sum: numpy.add,
+                Substraction: numpy.subtract,
+                Mult: numpy.multiply,
+                Division: numpy.true_divide,
+                Modulo: numpy.mod,
+                Exp: numpy.power,
+                Equals: numpy.equal,
+                Higher: numpy.greater,
+                Lower: numpy.less,
+            }
+            # natives with an elementwise version giving the same floats
+            self.natives = {math.sqrt: numpy.sqrt}
+
+    def visit(self, node: AST, scope: dict):
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            raise NotVectorizable(type(node).__name__)
+        return method(node, scope)
+
+    def visit_IntLiteral(self, node, scope):
+        return numpy.int64(node._val)
+
+    def visit_FloatLiteral(self, node, scope):
+        return numpy.float64(node._val)
+
+    def visit_BookLiteral(self, node, scope):
+        return numpy.bool_(node._val)
+
+    def visit_Variable(self, node, scope):
+        try:
+            return scope[node.name.value]
+        except KeyError:
+            # the rows that read it may not be the ones evaluated, like a
+            # branch of a conditional, the tree walker finds out
+            raise NotVectorizable(f"{node.name.value} is not defined")
+
+    def visit_VariableDeclaration(self, node, scope):
+        scope[node.name.value] = self.visit(node.expression, scope)
+        return None
+
+    def visit_NonExpression(self, node, scope):
+        return None
+
+    def visit_BlockNode(self, node, scope):
+        result = None
+        for block in node.blocks:
+            result = self.visit(block, scope)
+        return result
+
+    def visit_Lambda(self, node, scope):
+        # like the tree walker, a let only sees its own bindings
+        local = {}
+        self.visit(node.variables, local)
+        return self.visit(node.block_statement, local)
+
+    def visit_Conditional(self, node, scope):
+        hipotesis = self.visit(node.hipotesis, scope)
+        # both branches are computed for every row, `where` picks
+        return numpy.where(
+            numpy.asarray(hipotesis).astype(bool),
+            self.visit(node.tesis, scope),
+            self.visit(node.antitesis, scope),
+        )
+
+    def visit_NativeCall(self, node, scope):
+        function = self.natives.get(node.native.function)
+        if function is None:
+            raise NotVectorizable(node.name.value)
+        (arg,) = node.args.blocks
+        value = numpy.asarray(self.visit(arg, scope))
+        if value.dtype.kind not in "biuf":
+            raise NotVectorizable("only numbers are vectorized")
+        # float64 like `math`, an invalid domain raises in `errstate`
+        return function(value.astype(numpy.float64))
+
+    def operand(self, node, value):
+        kind = numpy.asarray(value).dtype.kind
+        if kind not in "biuf":
+            raise NotVectorizable("only numbers are vectorized")
+        if kind == "b" and not isinstance(node, (Equals, Higher, Lower)):
+            # True + True is 2 in Python, not True
+            return numpy.asarray(value, dtype=numpy.int64)
+        return value
+
+    def binary(self, node, scope):
+        left = self.operand(node, self.visit(node.left, scope))
+        right = self.operand(node, self.visit(node.right, scope))
+        result = self.operations[type(node)](left, right)
+        if numpy.asarray(result).dtype.kind in "iu" and isinstance(node, (Sum, Substraction, Mult, Exp)):
+            # Python ints don't overflow, redo it in floats to find out
+            exact = self.operations[type(node)](
+                numpy.asarray(left, dtype=numpy.float64), numpy.asarray(right, dtype=numpy.float64)
+            )
+            if numpy.any(numpy.abs(exact) >= INT_LIMIT):
+                raise NotVectorizable("integer overflow")
+        return result
+
+    visit_Sum = visit_Substraction = visit_Mult = visit_Division = binary
+    visit_Modulo = visit_Exp = visit_Equals = visit_Higher = visit_Lower = binary
+
+def rows(columns: dict) -> int:
+    sizes = {len(column) for column in columns.values()}
+    if len(sizes) > 1:
+        raise ValueError(f"Columns of different lengths {sorted(sizes)}")
+    return sizes.pop() if sizes else 1
+
+def evaluate_rows(tree: AST, columns: dict) -> list:
+    """Run `tree` on the tree walker once per row"""
+    results = []
+    names = {name: Token(Tokens.ID, name) for name in columns}
+    for index in range(rows(columns)):
+        ctx = Context({
+            names[name]: column[index].item() if hasattr(column[index], "item") else column[index]
+            for name, column in columns.items()
+        })
+        results.append(tree(ctx))
+    return results
+
+def evaluate_vectorized(tree: AST, columns: dict):
+    """
+    One array with the result of every row, raises `NotVectorizable`
+    when the tree has to be evaluated by rows
+    """
+    if numpy is None:
+        raise NotVectorizable("NumPy isn't installed")
+    scope = {name: numpy.asarray(column) for name, column in columns.items()}
+    with numpy.errstate(divide="raise", invalid="raise", over="raise"):
+        try:
+            result = Vectorizer().visit(tree, scope)
+        except (FloatingPointError, ZeroDivisionError, ValueError, OverflowError, TypeError) as exc:
+            # the tree walker raises for these, find out in which row
+            raise NotVectorizable(str(exc))
+    if result is None:
+        raise NotVectorizable("no value")
+    return numpy.broadcast_to(result, (rows(columns),))
+
+def evaluate_columns(tree: AST, columns: dict):
+    """
+    Result of `tree` for every row of `columns` (name -> sequence of
+    values), an array with NumPy and a list without it
+    """
+    try:
+        return evaluate_vectorized(tree, columns)
+    except NotVectorizable:
+        pass
+    results = evaluate_rows(tree, columns)
+    if numpy is None:
+        return results
+    if len({type(result) for result in results}) == 1 and type(results[0]) in (int, float, bool):
+        return numpy.array(results)
+    # mixed values stay as they are, `array` would turn them all to strings
+    return numpy.array(results, dtype=object)
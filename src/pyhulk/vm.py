@@ -0,0 +1,150 @@
+"""
+Stack based virtual machine for the bytecode in `pyhulk.bytecode`.
+
+HULK calls don't recurse in Python, the frames of the caller are saved
+in a list and the main loop jumps into the callee. Tail calls replace the
+frame of the caller so tail recursive functions run in constant memory,
+other recursion is only limited by `max_frames`.
+"""
+from pyhulk.bytecode import Code, Op, compile_function, compile_program
+from pyhulk.parser import Context, FunctionDeclaration
+
+CONST = int(Op.CONST)
+LOAD_LOCAL = int(Op.LOAD_LOCAL)
+STORE_LOCAL = int(Op.STORE_LOCAL)
+LOAD_GLOBAL = int(Op.LOAD_GLOBAL)
+STORE_GLOBAL = int(Op.STORE_GLOBAL)
+POP = int(Op.POP)
+ADD = int(Op.ADD)
+SUB = int(Op.SUB)
+MUL = int(Op.MUL)
+DIV = int(Op.DIV)
+MOD = int(Op.MOD)
+POW = int(Op.POW)
+EQ = int(Op.EQ)
+GT = int(Op.GT)
+LT = int(Op.LT)
+JUMP = int(Op.JUMP)
+JUMP_IF_FALSE = int(Op.JUMP_IF_FALSE)
+CALL = int(Op.CALL)
+RETURN = int(Op.RETURN)
+TAIL_CALL = int(Op.TAIL_CALL)
+CALL_NATIVE = int(Op.CALL_NATIVE)
+LOAD_UNBOUND = int(Op.LOAD_UNBOUND)
+
+# a saved frame is a tuple of 4 references, about 100 bytes with its locals
+MAX_FRAMES = 1_000_000
+
+class StackOverflow(RecursionError):
+    pass
+
+class VirtualMachine:
+
+    def __init__(self, global_scope: Context, max_frames: int = MAX_FRAMES):
+        self.global_scope = global_scope
+        self.max_frames = max_frames
+
+    def run(self, code: Code):
+        globals_ = self.global_scope._dict
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+        max_frames = self.max_frames
+
+        instructions = code.instructions
+        constants = code.constants
+        locals_ = [None] * code.nlocals
+        pc = 0
+
+        # the most frequent opcodes go first
+        while True:
+            op = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+            if op == LOAD_LOCAL:
+                push(locals_[arg])
+            elif op == CONST:
+                push(constants[arg])
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] + -right
+            elif op == GT:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == LT:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == EQ:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == LOAD_GLOBAL:
+                try:
+                    push(globals_[constants[arg]])
+                except KeyError:
+                    raise NameError(f"{constants[arg]!r} is not defined")
+            elif op == CALL or op == TAIL_CALL:
+                fun_decl = stack[-arg - 1]
+                if not isinstance(fun_decl, FunctionDeclaration):
+                    raise TypeError(f"{fun_decl!r} is not a function")
+                callee = compile_function(fun_decl)
+                if arg != callee.nargs:
+                    raise TypeError(
+                        f"{callee.name.value}() takes {callee.nargs} arguments but {arg} were given"
+                    )
+                if op == CALL:
+                    if len(frames) >= max_frames:
+                        raise StackOverflow(f"More than {max_frames} nested calls")
+                    frames.append((instructions, constants, locals_, pc))
+                locals_ = stack[len(stack) - arg:]
+                locals_.extend([None] * (callee.nlocals - arg))
+                locals_[callee.self_slot] = fun_decl
+                del stack[len(stack) - arg - 1:]
+                instructions = callee.instructions
+                constants = callee.constants
+                pc = 0
+            elif op == CALL_NATIVE:
+                function, nargs = constants[arg]
+                if nargs:
+                    args = stack[len(stack) - nargs:]
+                    del stack[len(stack) - nargs:]
+                    push(function(*args))
+                else:
+                    push(function())
+            elif op == RETURN:
+                if not frames:
+                    return pop()
+                instructions, constants, locals_, pc = frames.pop()
+            elif op == STORE_LOCAL:
+                locals_[arg] = pop()
+            elif op == POP:
+                pop()
+            elif op == DIV:
+                right = pop()
+                stack[-1] = stack[-1] / right
+            elif op == MOD:
+                right = pop()
+                stack[-1] = stack[-1] % right
+            elif op == POW:
+                right = pop()
+                stack[-1] = stack[-1] ** right
+            elif op == STORE_GLOBAL:
+                globals_[constants[arg]] = pop()
+            elif op == LOAD_UNBOUND:
+                raise NameError(f"{constants[arg]!r} is not defined")
+            else:
+                raise RuntimeError(f"Unknown opcode {op}")
+
+def execute(tree, ctx: Context, max_frames: int = MAX_FRAMES):
+    return VirtualMachine(ctx, max_frames).run(compile_program(tree))
@@ -0,0 +1,85 @@
+import threading
+import unittest
+
+from . import TEST_DIR
+import pyhulk
+from pyhulk.api import Program, ProgramCache
+
+
+class TestAPI(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_evaluate(self):
+        program = pyhulk.compile("x * 2 + y;")
+        self.assertEqual(program.evaluate({"x": 1, "y": 2}), 4)
+        self.assertEqual(program.evaluate({"x": 10, "y": 0.5}), 20.5)
+
+    def test_functions(self):
+        program = Program(
+            "function fib(n) => if (n > 1) fib(n - 1) + fib(n - 2) else n; fib(x);"
+        )
+        self.assertEqual(program.evaluate({"x": 10}), 55)
+        # every evaluation gets its own globals
+        self.assertEqual(program.evaluate({"x": 5}), 5)
+
+    def test_missing_binding(self):
+        with self.assertRaises(NameError):
+            Program("x + 1;").evaluate()
+
+    def test_cache(self):
+        cache = ProgramCache(maxsize=2)
+        program = cache.get("1 + a;")
+        self.assertIs(cache.get("1 + a;"), program)
+        cache.get("2 + a;")
+        cache.get("3 + a;")
+        self.assertEqual(
+            cache.stats(),
+            {"size": 2, "maxsize": 2, "hits": 1, "misses": 3, "evictions": 1},
+        )
+        self.assertIsNot(cache.get("1 + a;"), program)
+
+        cache.resize(1)
+        self.assertEqual(cache.stats()["size"], 1)
+        cache.clear()
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_syntax_error_not_cached(self):
+        cache = ProgramCache()
+        with self.assertRaises(Exception):
+            cache.get("1 +")
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_threads(self):
+        program = Program("let y = x * x in y + 1;")
+        results = {}
+
+        def worker(x):
+            results[x] = program.evaluate({"x": x})
+
+        threads = [threading.Thread(target=worker, args=(x,)) for x in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {x: x * x + 1 for x in range(20)})
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestAPI))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
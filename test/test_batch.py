@@ -0,0 +1,89 @@
+from pathlib import Path
+import os
+import tempfile
+import time
+import unittest
+
+from . import TEST_DIR
+from pyhulk.batch import BatchRunner, evaluate_many, run_files
+
+
+def double(value):
+    return value * 2
+
+
+def crash(value):
+    if value == 3:
+        os._exit(1)
+    return value
+
+
+def sleep(value):
+    time.sleep(value)
+    return value
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_ordered(self):
+        results = list(BatchRunner(workers=2, chunksize=3).run(double, range(10)))
+        self.assertEqual([result.value for result in results], [value * 2 for value in range(10)])
+        self.assertEqual([result.index for result in results], list(range(10)))
+
+    def test_unordered(self):
+        results = list(BatchRunner(workers=2, chunksize=1, ordered=False).run(double, range(10)))
+        self.assertEqual(sorted(result.value for result in results), [value * 2 for value in range(10)])
+
+    def test_errors(self):
+        results = list(BatchRunner(workers=2).run(double, [1, None, 3]))
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIn("TypeError", results[1].error)
+
+    def test_dead_worker(self):
+        results = list(BatchRunner(workers=2, chunksize=2).run(crash, range(6)))
+        self.assertEqual([result.value for result in results], [0, 1, 2, None, 4, 5])
+        self.assertEqual(results[3].error, "the worker process died")
+
+    def test_timeout(self):
+        results = list(BatchRunner(workers=2, chunksize=2, timeout=0.2).run(sleep, [0, 5, 0]))
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIn("timed out", results[1].error)
+
+    def test_evaluate_many(self):
+        bindings = [{"x": value, "y": 1} for value in range(20)] + [{"y": 1}]
+        results = list(evaluate_many("x * 2 + y;", bindings, workers=2, chunksize=4))
+        self.assertEqual([result.value for result in results[:-1]], [value * 2 + 1 for value in range(20)])
+        self.assertIn("NameError", results[-1].error)
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name, text in [("a", "function f(n) => n * 3; f(4);"), ("b", "1 / 0;"), ("c", '"c";')]:
+                path = Path(tmp) / f"{name}.hulk"
+                path.write_text(text, encoding="utf-8")
+                paths.append(path)
+            results = list(run_files(paths, engine="closure", workers=2))
+        self.assertEqual([result.value for result in results], [12, None, "c"])
+        self.assertIn("ZeroDivisionError", results[1].error)
+        self.assertEqual(results[0].task, str(paths[0]))
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestBatch))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
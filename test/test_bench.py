@@ -0,0 +1,59 @@
+import unittest
+
+from . import TEST_DIR
+from pyhulk.bench import BENCHMARKS, PHASES, compare, measure, run_suite
+
+
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_programs_run(self):
+        for engine in ("tree", "vm", "closure", "resolved"):
+            for benchmark in BENCHMARKS.values():
+                with self.subTest(engine=engine, benchmark=benchmark.name):
+                    timings = measure(benchmark, engine, opt_level=2)
+                    self.assertEqual(set(timings), set(PHASES))
+
+    def test_suite(self):
+        results = run_suite(["formulas"], warmup=0, repeat=1)
+        timing = results["benchmarks"]["formulas"]["evaluate"]
+        self.assertEqual(timing["min"], timing["median"])
+        with self.assertRaises(ValueError):
+            run_suite(["nope"])
+
+    def test_compare(self):
+        def results(evaluate, engine="tree"):
+            return {
+                "engine": engine,
+                "opt_level": 0,
+                "benchmarks": {
+                    "fib": {"evaluate": {"median": evaluate}, "optimize": {"median": 0.001}}
+                },
+            }
+
+        self.assertEqual(compare(results(10.5), results(10)), [])
+        self.assertEqual(compare(results(12), results(10)), [("fib", "evaluate", 10, 12)])
+        self.assertEqual(compare(results(12), results(10), threshold=0.5), [])
+        with self.assertRaises(ValueError):
+            compare(results(10), results(10, engine="vm"))
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestBench))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,64 @@
+import unittest
+import unittest.mock
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import Parser, Interpreter
+from pyhulk.closure import Compiler, binary_factory
+
+
+class TestClosure(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _interpret(self, text):
+        return Interpreter(Parser(Lexer(text)), engine="closure").interpret()
+
+    def test_specialized_operands(self):
+        compiler = Compiler({})
+        tree = Parser(Lexer("let x = 3 in x * 2 + x;")).parse()
+        program = compiler.compile(tree)
+
+        self.assertEqual(program([None] * compiler.nlocals), 9)
+
+    def test_factories_are_shared(self):
+        self.assertIs(
+            binary_factory("+", "local", "const"),
+            binary_factory("+", "local", "const"),
+        )
+
+    def test_self_slot(self):
+        result = self._interpret("function fact(n) => if (n > 1) n * fact(n - 1) else 1; fact(5);")
+        self.assertEqual(result, 120)
+
+    def test_redefinition(self):
+        result = self._interpret("function f(x) => x; f(1) + 1;")
+        self.assertEqual(result, 2)
+
+        result = self._interpret("function f(x) => x * 10; f(1) + 1;")
+        self.assertEqual(result, 11)
+
+    def test_arity(self):
+        with self.assertRaises(TypeError):
+            self._interpret("function blob(x) => x; blob();")
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    #s.addTests(load_from(TestAPI))
+    #s.addTests(load_from(TestPopulate))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -1,13 +1,17 @@
 import unittest
 import unittest.mock
 import time
+from math import log
 
 from . import TEST_DIR
 from pyhulk.lexer import Lexer
-from pyhulk.parser import Parser, Interpreter
+from pyhulk.parser import Context, Parser, Interpreter
 
 
 class TestExpression(unittest.TestCase):
+    engine = "tree"
+    opt_level = 0
+
     def setUp(self):
         pass
 
@@ -18,7 +22,7 @@ class TestExpression(unittest.TestCase):
         lexer = Lexer(text)
         parser = Parser(lexer)
 
-        return Interpreter(parser)
+        return Interpreter(parser, engine=self.engine, opt_level=self.opt_level)
 
     def _interpret(self, text):
         return self._prepare(text).interpret()
@@ -63,7 +67,6 @@ class TestExpression(unittest.TestCase):
         self.assertEqual(result, 30)
 
     def test_builtins(self):
-        return
         result = self._interpret("log(2);")
         self.assertEqual(result, log(2))
 
@@ -106,6 +109,65 @@ class TestExpression(unittest.TestCase):
 
         self.assertEqual(result, "doko")
 
+    def test_arity(self):
+        for text in (
+            "function add(a, b) => a + b; add(1);",
+            "function add(a, b) => a + b; add(1, 2, 3);",
+            "function down(n) => if (n > 0) down(n - 1, 0) else 0; 1;",
+        ):
+            with self.subTest(text=text):
+                prepared = self._prepare('var witness = "ran";' + text)
+                prepared.GLOBAL_SCOPE = Context()
+                with self.assertRaisesRegex(TypeError, "arguments but"):
+                    prepared.interpret()
+                # found before running
+                self.assertEqual(prepared.GLOBAL_SCOPE._dict, {})
+
+    def test_redefinition(self):
+        prepared = self._prepare(
+            "function pick(a) => a; var first = pick(1); function pick(a) => a * 10; first + pick(1);"
+        )
+        prepared.GLOBAL_SCOPE = Context()
+        self.assertEqual(prepared.interpret(), 11)
+
+    def test_scoping(self):
+        # every engine scopes names like the tree walker
+        for text, expected in (
+            ("var z = 5; let a = 1 in a + 1;", 2),
+            ("function fact(n) => if (n > 1) n * fact(n - 1) else 1; fact(5);", 120),
+            ("function inc(x) => let y = 1 in y + 1; var z = 5; inc(z) + z;", 7),
+        ):
+            with self.subTest(text=text):
+                prepared = self._prepare(text)
+                prepared.GLOBAL_SCOPE = Context()
+                self.assertEqual(prepared.interpret(), expected)
+        for text in (
+            "let a = 1 in let b = 2 in a + b;",
+            "var z = 5; function g(x) => x + z; g(1);",
+            "function g(x) => let y = 1 in x + y; g(1);",
+            "function h(x) => x; function g(x) => h(x); g(1);",
+        ):
+            with self.subTest(text=text):
+                prepared = self._prepare(text)
+                prepared.GLOBAL_SCOPE = Context()
+                with self.assertRaises(NameError):
+                    prepared.interpret()
+
+class TestVMExpression(TestExpression):
+    engine = "vm"
+
+class TestClosureExpression(TestExpression):
+    engine = "closure"
+
+class TestResolvedExpression(TestExpression):
+    engine = "resolved"
+
+class TestTieredExpression(TestExpression):
+    engine = "tiered"
+
+class TestOptimizedExpression(TestExpression):
+    opt_level = 2
+
 def main_suite() -> unittest.TestSuite:
     s = unittest.TestSuite()
     load_from = unittest.defaultTestLoader.loadTestsFromTestCase
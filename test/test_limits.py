@@ -0,0 +1,121 @@
+import threading
+import unittest
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.limits import BudgetExceeded, Limits, enforce
+from pyhulk.parser import AST, BinaryOperation, Context, Function, Interpreter, Parser
+
+LOOP = """
+function count(n) => if (n > 0) count(n - 1) + 1 else 0;
+count(60);
+"""
+
+
+class TestLimits(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _run(self, text, limits):
+        interpreter = Interpreter(Parser(Lexer(text)), limits=limits)
+        interpreter.GLOBAL_SCOPE = Context()
+        return interpreter.interpret()
+
+    def test_within_limits(self):
+        limits = Limits(steps=100000, depth=100, int_bits=64, str_length=100, deadline=10)
+        self.assertEqual(self._run(LOOP, limits), 60)
+        self.assertEqual(self._run('"ab" + "cd";', limits), "abcd")
+
+    def test_steps(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run(LOOP, Limits(steps=200))
+        self.assertEqual(raised.exception.limit, "steps")
+        # exactly the nodes of `1 + 2;`: the block, the sum and two literals
+        self.assertEqual(self._run("1 + 2;", Limits(steps=4)), 3)
+        with self.assertRaises(BudgetExceeded):
+            self._run("1 + 2;", Limits(steps=3))
+
+    def test_steps_taken(self):
+        tree = Parser(Lexer("1 + 2 * 3;")).parse()
+        with enforce(Limits()) as budget:
+            tree(Context())
+        self.assertEqual(budget.steps, 6)
+
+    def test_depth(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run(LOOP, Limits(depth=30))
+        self.assertEqual(raised.exception.limit, "depth")
+
+    def test_int_bits(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run("2 ^ 100000;", Limits(int_bits=4096))
+        self.assertEqual(raised.exception.limit, "int_bits")
+        self.assertEqual(self._run("2 ^ 10;", Limits(int_bits=4096)), 1024)
+
+    def test_call_arguments(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run("function f(x) => 1; f(2 ^ 100000);", Limits(int_bits=64))
+        self.assertEqual(raised.exception.limit, "int_bits")
+
+    def test_str_length(self):
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run('"ab" * 100;', Limits(str_length=50))
+        self.assertEqual(raised.exception.limit, "str_length")
+
+    def test_deadline(self):
+        text = "function spin(n) => if (n > 0) spin(n - 1) + spin(n - 1) else 0; spin(30);"
+        with self.assertRaises(BudgetExceeded) as raised:
+            self._run(text, Limits(deadline=0.05))
+        self.assertEqual(raised.exception.limit, "deadline")
+
+    def test_restored(self):
+        call = AST.__call__
+        with self.assertRaises(BudgetExceeded):
+            self._run(LOOP, Limits(steps=10))
+        self.assertIs(AST.__call__, call)
+        self.assertNotIn("__call__", vars(Function))
+        self.assertNotIn("__call__", vars(BinaryOperation))
+
+    def test_other_threads(self):
+        results = []
+        started = threading.Event()
+        done = threading.Event()
+
+        def unlimited():
+            started.wait()
+            tree = Parser(Lexer(LOOP)).parse()
+            results.append(tree(Context()))
+            done.set()
+
+        thread = threading.Thread(target=unlimited)
+        thread.start()
+        # the guards are installed while the other thread evaluates
+        with enforce(Limits(steps=10)):
+            started.set()
+            done.wait(10)
+        thread.join()
+        self.assertEqual(results, [60])
+
+    def test_engines(self):
+        with self.assertRaises(ValueError):
+            Interpreter(Parser(Lexer("1;")), engine="vm", limits=Limits(steps=10))
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestLimits))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
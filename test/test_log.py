@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer, Token
+from pyhulk.log import trace_rate, traced, trace_logger
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def next(self):
+        self.count += 1
+        return self.count
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_disabled(self):
+        # nothing wraps the hot paths unless tracing was enabled
+        self.assertFalse(hasattr(Token.__init__, "__wrapped__"))
+        self.assertFalse(hasattr(Lexer._id, "__wrapped__"))
+        self.assertIs(traced("lex", rate=0)(Counter.next), Counter.next)
+
+    def test_sampled(self):
+        method = traced("count", rate=0.25)(Counter.next)
+        counter = Counter()
+        with self.assertLogs(trace_logger, "DEBUG") as logs:
+            for _ in range(8):
+                method(counter)
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(
+            records,
+            [
+                {"event": "count", "source": "Counter.next", "seq": 4, "value": "4"},
+                {"event": "count", "source": "Counter.next", "seq": 8, "value": "8"},
+            ],
+        )
+        self.assertEqual(counter.count, 8)
+
+    def test_rate(self):
+        self.assertEqual(trace_rate(None), 0)
+        self.assertEqual(trace_rate("0.5"), 0.5)
+        self.assertEqual(trace_rate("10"), 1)
+        self.assertEqual(trace_rate("yes"), 0)
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestTrace))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
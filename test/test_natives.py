@@ -0,0 +1,146 @@
+import contextlib
+import io
+import math
+import unittest
+
+from . import TEST_DIR
+import pyhulk
+from pyhulk.cache import dumps, loads
+from pyhulk.lexer import Lexer
+from pyhulk.memo import PurityAnalyzer
+from pyhulk.natives import NATIVES, Output, arity, register, unregister
+from pyhulk.optimizer import optimize
+from pyhulk.parser import Context, FloatLiteral, Interpreter, NativeCall, Parser
+
+ENGINES = ("tree", "vm", "closure", "resolved")
+
+
+class TestNatives(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        unregister("twice")
+        unregister("tick")
+
+    def _interpret(self, text, engine="tree", opt_level=0):
+        interpreter = Interpreter(Parser(Lexer(text)), engine=engine, opt_level=opt_level)
+        interpreter.GLOBAL_SCOPE = Context()
+        return interpreter.interpret()
+
+    def test_math(self):
+        text = "function f(x) => sqrt(x) + log(1); f(9) * cos(0) + (let y = 0 in exp(y) + sin(y));"
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self._interpret(text, engine), 4.0)
+        self.assertEqual(self._interpret(text, opt_level=2), 4.0)
+        self.assertLess(self._interpret("rand();"), 1)
+
+    def test_strings(self):
+        text = 'upper(substr(trim("  hello "), 1, 3)) + str(len("abc")) + str(find("hello", "l"));'
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self._interpret(text, engine), "ELL32")
+
+    def test_parsed(self):
+        tree = Parser(Lexer("sqrt(4);")).parse()
+        self.assertIsInstance(tree.blocks[0], NativeCall)
+        self.assertIs(tree.blocks[0].native, NATIVES["sqrt"])
+        # found once when parsing, not in the scope
+        self.assertEqual(tree(Context()), 2.0)
+
+    def test_arity(self):
+        with self.assertRaisesRegex(TypeError, r"sqrt\(\) takes 1 arguments but 2 were given"):
+            self._interpret('print("ran"); sqrt(1, 2);')
+
+    def test_shadowing(self):
+        text = "log(1) + log(4); function log(x) => if (x > 1) log(x - 1) + 1 else x; log(3) + sqrt(4);"
+        tree = Parser(Lexer(text)).parse()
+        self.assertNotIsInstance(tree.blocks[0].left, NativeCall)
+        self.assertIsInstance(tree.blocks[2].right, NativeCall)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self._interpret(text.split(";", 1)[1], engine), 5.0)
+        self.assertEqual(self._interpret(text.split(";", 1)[1], opt_level=2), 5.0)
+        # only where it's declared
+        self.assertEqual(self._interpret("log(1);"), 0.0)
+
+    def test_print(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            result = self._interpret('print("one"); print(1 + 1) * 10;')
+            self.assertEqual(out.getvalue(), "one\n2\n")
+        self.assertEqual(result, 20)
+
+    def test_output_buffer(self):
+        output = Output(size=10)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            output.write("abc\n")
+            self.assertEqual(out.getvalue(), "")
+            output.write("defghij\n")
+            # one write once it's full
+            self.assertEqual(out.getvalue(), "abc\ndefghij\n")
+            output.write("k\n")
+            output.flush()
+        self.assertEqual(out.getvalue(), "abc\ndefghij\nk\n")
+
+    def test_register(self):
+        register("twice", lambda x: x * 2, pure=True)
+        self.assertEqual(NATIVES["twice"].nargs, 1)
+        self.assertEqual(self._interpret("twice(21);"), 42)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self._interpret("function f(x) => twice(x) + 1; f(2);", engine), 5)
+        with self.assertRaises(ValueError):
+            register("let", len, 1)
+        with self.assertRaises(ValueError):
+            register("two_words", len, 1)
+        with self.assertRaises(TypeError):
+            arity(print)
+
+    def test_fold(self):
+        tree = optimize(Parser(Lexer("sqrt(16) + 1;")).parse(), 1)
+        self.assertIsInstance(tree.blocks[0], FloatLiteral)
+        self.assertEqual(tree.blocks[0]._val, 5.0)
+        # errors and impure natives are left for the runtime
+        self.assertIsInstance(optimize(Parser(Lexer("sqrt(0 - 1);")).parse(), 1).blocks[0], NativeCall)
+        self.assertIsInstance(optimize(Parser(Lexer('print("a");')).parse(), 1).blocks[0], NativeCall)
+
+        calls = []
+        register("tick", lambda x: calls.append(x) or x, pure=False)
+        self.assertIsInstance(optimize(Parser(Lexer("tick(1);")).parse(), 1).blocks[0], NativeCall)
+        register("twice", lambda x: x * 2, pure=True)
+        self.assertEqual(optimize(Parser(Lexer("twice(3);")).parse(), 1).blocks[0]._val, 6)
+
+    def test_purity(self):
+        ctx = Context()
+        tree = Parser(Lexer("function f(x) => sqrt(x); function g(x) => rand() + x;")).parse()
+        tree(ctx)
+        analyzer = PurityAnalyzer(ctx._dict)
+        self.assertTrue(analyzer.is_pure(tree.blocks[0]))
+        self.assertFalse(analyzer.is_pure(tree.blocks[1]))
+
+    def test_cache(self):
+        tree = loads(dumps(Parser(Lexer('len("abcd") + sqrt(4);')).parse()))
+        self.assertEqual(tree(Context()), 6.0)
+
+    def test_api(self):
+        program = pyhulk.compile("function f(v) => sqrt(v) + 1; f(x);")
+        self.assertEqual(program.evaluate({"x": 9}), 4.0)
+        self.assertEqual(math.sqrt(2), pyhulk.compile("sqrt(2);").evaluate())
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestNatives))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
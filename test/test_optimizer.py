@@ -0,0 +1,130 @@
+import unittest
+import unittest.mock
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import (
+    Parser,
+    Interpreter,
+    BlockNode,
+    Conditional,
+    IntLiteral,
+    Lambda,
+    Mult,
+    Variable,
+    dump_tree,
+)
+from pyhulk.optimizer import optimize
+
+
+class TestOptimizer(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _optimize(self, text, level=1):
+        tree = optimize(Parser(Lexer(text)).parse(), level)
+        self.assertIsInstance(tree, BlockNode)
+        return tree.blocks[0]
+
+    def test_fold(self):
+        node = self._optimize("(5 * 2) + 10;")
+
+        self.assertIsInstance(node, IntLiteral)
+        self.assertEqual(node._val, 20)
+
+    def test_fold_keeps_errors(self):
+        node = self._optimize("1 / 0;")
+
+        self.assertNotIsInstance(node, IntLiteral)
+        with self.assertRaises(ZeroDivisionError):
+            Interpreter(Parser(Lexer("1 / 0;")), opt_level=1).interpret()
+
+    def test_huge_exponent(self):
+        node = self._optimize("9 ^ 999999;")
+
+        self.assertNotIsInstance(node, IntLiteral)
+
+    def test_huge_string(self):
+        self.assertIsInstance(self._optimize('"ab" * 10000000000;'), Mult)
+        self.assertIsInstance(self._optimize('10000000000 * "ab";'), Mult)
+        self.assertEqual(self._optimize('"ab" * 3;')._val, "ababab")
+
+    def test_prune_conditional(self):
+        node = self._optimize('if (1 > 2) "blob" else x;')
+        self.assertIsInstance(node, Variable)
+
+        node = self._optimize('if (x) 1 else 2;')
+        self.assertIsInstance(node, Conditional)
+
+    def test_identities(self):
+        self.assertIsInstance(self._optimize("x * 1;", 1), Mult)
+        self.assertIsInstance(self._optimize("x * 1 + 0;", 2), Variable)
+        self.assertIsInstance(self._optimize("x * 2;", 2), Mult)
+
+    def test_identities_keep_types(self):
+        for text in ("x / 1;", "x * 1.0;", "x + 0.0;", "1.0 * x;", "x ^ 1.0;"):
+            with self.subTest(text=text):
+                self.assertNotIsInstance(self._optimize(text, 2), Variable)
+        for text, expected in (
+            ("function f(x) => x / 1; f(4);", 4.0),
+            ("function f(x) => x * 1.0 + 0.0; f(4);", 4.0),
+            ("function f(x) => x * 1 + 0; f(4);", 4),
+        ):
+            with self.subTest(text=text):
+                result = Interpreter(Parser(Lexer(text)), opt_level=2).interpret()
+                self.assertEqual(result, expected)
+                self.assertIs(type(result), type(expected))
+
+    def test_let_propagation(self):
+        self.assertIsInstance(self._optimize("let x = 2 in x * x;", 1), Lambda)
+
+        node = self._optimize("let x = 2 in x * x;", 2)
+        self.assertIsInstance(node, IntLiteral)
+        self.assertEqual(node._val, 4)
+
+    def test_let_scopes(self):
+        text = "let a = 1 in let b = 2 in a + b;"
+        with self.assertRaises(NameError):
+            Interpreter(Parser(Lexer(text)), opt_level=0).interpret()
+        with self.assertRaises(NameError):
+            Interpreter(Parser(Lexer(text)), opt_level=2).interpret()
+        self.assertEqual(self._optimize("let a = 1 in let a = 2 in a * 3;", 2)._val, 6)
+
+    def test_function_body(self):
+        tree = optimize(Parser(Lexer("function f(x) => x * (2 + 3);")).parse())
+
+        self.assertIsInstance(tree.blocks[0].block_node.right, IntLiteral)
+
+    def test_dump(self):
+        with unittest.mock.patch("sys.stderr") as stderr:
+            Interpreter(Parser(Lexer("1 + 2;")), opt_level=1, dump=True).interpret()
+
+        output = "".join(str(call.args[0]) for call in stderr.write.call_args_list)
+        self.assertIn("Sum", output)
+        self.assertIn("IntLiteral 3", output)
+
+    def test_dump_tree(self):
+        tree = Parser(Lexer("function f(x) => let y = x in y;")).parse()
+
+        self.assertIn("Lambda", dump_tree(tree))
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    #s.addTests(load_from(TestAPI))
+    #s.addTests(load_from(TestPopulate))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -3,7 +3,20 @@ import unittest.mock
 import time
 
 from . import TEST_DIR
-from pyhulk.lexer import Lexer, Tokens, Token, LexingError
+from pyhulk.parser import (
+    AST,
+    BlockNode,
+    Conditional,
+    Context,
+    FunctionDeclaration,
+    IntLiteral,
+    Parser,
+    _FRAMES,
+    check_calls,
+    fields,
+    tree_size,
+)
+from pyhulk.lexer import Lexer, CharLexer, TableLexer, Tokens, Token, LexingError, SINGLETONS, position, tokenize
 
 
 class TestLexer(unittest.TestCase):
@@ -43,6 +56,189 @@ class TestLexer(unittest.TestCase):
         self.assertEqual(Token(Tokens.STRING, "hello world"), l.get_next_token())
 
 
+class TestTableLexer(unittest.TestCase):
+    """
+    Differential tests against the reference lexer
+    """
+
+    def _tokens(self, cls, text):
+        l = cls(text)
+        tokens = [l.get_next_token()]
+        while tokens[-1].type != Tokens.EOF:
+            tokens.append(l.get_next_token())
+        return tokens
+
+    def _compare(self, text):
+        self.assertEqual(
+            self._tokens(CharLexer, text),
+            self._tokens(TableLexer, text),
+        )
+
+    def test_default(self):
+        self.assertIs(Lexer, TableLexer)
+
+    def test_same_stream(self):
+        self._compare("function fib(n) => if (n > 1) fib(n-1) + fib(n-2) else 1;(fib(5));")
+        self._compare('let a = "hello world", b2 = 2.71 in a == b2;')
+        self._compare("var x = (5 ^ 2) % 3 / 1.5 * 2 - 1 < 4;\nx;\n")
+        self._compare("le 5.;")
+
+    def test_bad_string(self):
+        with self.assertRaises(LexingError):
+            self._tokens(TableLexer, 'blob doko "lorem noger;')
+
+    def test_invalid_character(self):
+        l = TableLexer("a $ b")
+        l.get_next_token()
+        with self.assertRaises(LexingError):
+            l.get_next_token()
+        self.assertEqual(l.column, 3)
+
+    def test_singletons(self):
+        for cls in (CharLexer, TableLexer):
+            first = self._tokens(cls, "let a = 1 in a + 1;")
+            second = self._tokens(cls, "let b = 2 in b + 2;")
+            self.assertIs(first[0], second[0])
+            self.assertIs(first[2], second[2])
+            self.assertIs(first[-1], second[-1])
+            self.assertIs(first[0], SINGLETONS[Tokens.LET])
+
+    def test_offsets(self):
+        for cls in (CharLexer, TableLexer):
+            tokens = self._tokens(cls, 'var ab = 12;\nab + "s" + 1.5;')
+            self.assertEqual([token.pos for token in tokens if token.pos is not None], [4, 9, 13, 18, 24])
+            self.assertEqual(position('var ab = 12;\nab', tokens[5].pos), (2, 1))
+        # not part of the identity
+        self.assertEqual(Token(Tokens.ID, "ab", 4), Token(Tokens.ID, "ab"))
+        self.assertEqual(hash(Token(Tokens.ID, "ab", 4)), hash(Token(Tokens.ID, "ab")))
+
+    def test_buffer(self):
+        texts = [
+            "function fib(n) => if (n > 1) fib(n-1) + fib(n-2) else 1;(fib(5));",
+            'let a = "hello world", b2 = 2.71 in a == b2;',
+            'var x = (5 ^ 2) % 3 / 1.5 * 2 - 1 < 4;\nx;\n"";',
+            "",
+        ]
+        for text in texts:
+            buffer = tokenize(text)
+            self.assertEqual(
+                [buffer.token(index) for index in range(len(buffer))],
+                self._tokens(TableLexer, text),
+            )
+            self.assertEqual(
+                [buffer.token(index).pos for index in range(len(buffer))],
+                [token.pos for token in self._tokens(TableLexer, text)],
+            )
+
+    def test_buffer_lookahead(self):
+        buffer = tokenize('let a = "x" in a;')
+        self.assertEqual(buffer.kinds.typecode, "B")
+        self.assertEqual(buffer.lexeme(3), '"x"')
+        self.assertEqual(buffer.peek(1), Tokens.ID)
+        buffer.get_next_token()
+        self.assertEqual(buffer.peek(), Tokens.ID)
+        self.assertEqual(buffer.peek(100), Tokens.EOF)
+        self.assertEqual(buffer.pos, 3)
+
+    def test_buffer_errors(self):
+        with self.assertRaises(LexingError):
+            tokenize('blob doko "lorem noger;')
+        with self.assertRaises(LexingError):
+            tokenize("a $ b")
+
+    def test_compact(self):
+        token = Token(Tokens.ID, "a")
+        self.assertFalse(hasattr(token, "__dict__"))
+
+
+class TestParser(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _parse(self, text):
+        return Parser(Lexer(text)).parse()
+
+    def test_compact_nodes(self):
+        tree = self._parse("function f(a) => if (a > 1) let b = a in b * 2 else 0 - a; f(2.5);")
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            self.assertFalse(hasattr(node, "__dict__"), type(node).__name__)
+            stack.extend(value for value in fields(node).values() if isinstance(value, AST))
+            stack.extend(getattr(node, "blocks", ()))
+
+    def test_conditional_branches(self):
+        conditional = self._parse("if (1 > 2) 3 else 4;").blocks[0]
+        self.assertIsInstance(conditional, Conditional)
+        self.assertIsInstance(conditional.tesis, IntLiteral)
+        self.assertIsInstance(conditional.antitesis, IntLiteral)
+
+    def test_tree_size(self):
+        nodes, size = tree_size(self._parse("1 + 2;"))
+        # block, sum and two literals
+        self.assertEqual(nodes, 4)
+        self.assertGreater(size, 0)
+        self.assertLess(tree_size(self._parse("1 + 2;"))[1], tree_size(self._parse("1 + 2; 3;"))[1])
+
+    def test_check_calls(self):
+        with self.assertRaisesRegex(TypeError, r"f\(\) takes 1 arguments but 2 were given"):
+            check_calls(self._parse("function f(a) => a; 1 + f(1, 2);"))
+        for text in (
+            # not declared yet, or not a function anymore
+            "f(1, 2); function f(a) => a;",
+            "function f(a) => a; var f = 1; f(1, 2);",
+            # a parameter or a let hides the function
+            "function f(f) => f(1, 2);",
+            "function f(a) => a; let g = 1 in f(1, 2);",
+        ):
+            with self.subTest(text=text):
+                check_calls(self._parse(text))
+
+    def test_call_site(self):
+        tree = self._parse("function f(a, b) => a - b; f(5, 2);")
+        ctx = Context()
+        self.assertEqual(tree(ctx), 3)
+        call = tree.blocks[1]
+        self.assertIs(call._fun_decl, tree.blocks[0])
+        self.assertEqual([param.value for param in tree.blocks[0].params], ["a", "b"])
+        # caches aren't part of the tree
+        self.assertNotIn("_fun_decl", fields(call))
+        self.assertNotIn("params", fields(tree.blocks[0]))
+
+        # calls go through the checks again with another function
+        ctx._dict[tree.blocks[0].name] = FunctionDeclaration(tree.blocks[0].name, BlockNode([]), IntLiteral(1))
+        with self.assertRaises(TypeError):
+            call(ctx)
+        ctx._dict[tree.blocks[0].name] = 7
+        with self.assertRaisesRegex(TypeError, "not a function"):
+            call(ctx)
+
+    def test_frames(self):
+        tree = self._parse("function f(n) => if (n > 0) f(n - 1) else n; f(10);")
+        tree(Context())
+        frames = list(_FRAMES)
+        self.assertTrue(frames)
+        self.assertTrue(all(not frame._dict for frame in frames))
+        tree(Context())
+        self.assertEqual({id(frame) for frame in _FRAMES}, {id(frame) for frame in frames})
+        # a call that raises gives its frame back too
+        with self.assertRaises(ZeroDivisionError):
+            self._parse("function g(n) => n / 0; g(1);")(Context())
+        self.assertTrue(all(not frame._dict for frame in _FRAMES))
+
+    def test_frames_threads(self):
+        class Emptied(list):
+            """Free list another thread empties right after it's looked at"""
+            def __bool__(self):
+                return True
+
+        tree = self._parse("function f(n) => if (n > 0) f(n - 1) + 1 else 0; f(5);")
+        with unittest.mock.patch("pyhulk.parser._FRAMES", Emptied()):
+            self.assertEqual(tree(Context()), 5)
+
 
 def main_suite() -> unittest.TestSuite:
     s = unittest.TestSuite()
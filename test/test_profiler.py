@@ -0,0 +1,116 @@
+import threading
+import unittest
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.limits import BudgetExceeded, Limits, enforce
+from pyhulk.natives import register, unregister
+from pyhulk.parser import AST, Context, Function, Interpreter, Parser, Sum
+from pyhulk.profiler import MAIN, Profiler
+
+PROGRAM = """
+function fib(n) => if (n > 1) fib(n - 1) + fib(n - 2) else n;
+function sq(x) => x * x;
+fib(10);
+sq(4);
+"""
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        unregister("elsewhere")
+
+    def _profile(self, text, **kwargs):
+        profiler = Profiler(**kwargs)
+        interpreter = Interpreter(Parser(Lexer(text)), profiler=profiler)
+        interpreter.GLOBAL_SCOPE = Context()
+        return interpreter.interpret(), profiler
+
+    def test_functions(self):
+        call, node_call = AST.__call__, Function.__call__
+        result, profiler = self._profile(PROGRAM)
+        self.assertEqual(result, 16)
+        self.assertEqual(profiler.functions["fib"].calls, 177)
+        self.assertEqual(profiler.functions["sq"].calls, 1)
+        self.assertEqual(profiler.node_types[Sum].calls, 88)
+        fib = profiler.functions["fib"]
+        self.assertLessEqual(fib.self, fib.total)
+        # restored after the run
+        self.assertIs(AST.__call__, call)
+        self.assertIs(Function.__call__, node_call)
+        self.assertNotIn("__call__", Function.__dict__)
+
+    def test_statements(self):
+        _, profiler = self._profile(PROGRAM, nodes=False)
+        self.assertEqual([index for index, _, _ in profiler.statements], [0, 1, 2, 3])
+        self.assertEqual(profiler.node_types, {})
+        self.assertIn("fib", profiler.report())
+        self.assertNotIn("node", profiler.report())
+
+    def test_collapsed(self):
+        ticks = iter(range(0, 10**9, 1000))
+        _, profiler = self._profile(
+            "function f(n) => if (n > 0) f(n - 1) else 0; f(2);",
+            nodes=False,
+            timer=lambda: next(ticks),
+        )
+        stacks = dict(line.rsplit(" ", 1) for line in profiler.collapsed().splitlines())
+        self.assertEqual(
+            set(stacks), {MAIN, f"{MAIN};f", f"{MAIN};f;f", f"{MAIN};f;f;f"}
+        )
+
+    def test_other_engines(self):
+        with self.assertRaises(ValueError):
+            Interpreter(engine="vm", profiler=Profiler())
+
+    def test_other_threads(self):
+        raised = []
+
+        def evaluate():
+            Parser(Lexer("function other(x) => x; other(1);")).parse()(Context())
+            tree = Parser(Lexer("function down(n) => if (n > 0) down(n - 1) else 0; down(5);")).parse()
+            with enforce(Limits(depth=2)):
+                try:
+                    tree(Context())
+                except BudgetExceeded:
+                    raised.append(True)
+
+        def elsewhere():
+            thread = threading.Thread(target=evaluate)
+            thread.start()
+            thread.join()
+            return 0
+
+        # the profiled program has another thread evaluate while it runs
+        register("elsewhere", elsewhere, pure=False)
+        _, profiler = self._profile("function mine(x) => elsewhere() + x; mine(1); mine(2);")
+        self.assertEqual(set(profiler.functions), {"mine"})
+        # the limited evaluations don't take the hooks away
+        self.assertEqual(profiler.functions["mine"].calls, 2)
+        self.assertEqual(raised, [True, True])
+
+    def test_errors_restore(self):
+        call = AST.__call__
+        with self.assertRaises(NameError):
+            self._profile("nope;")
+        self.assertIs(AST.__call__, call)
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestProfiler))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,101 @@
+import unittest
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import Context, Interpreter, Parser, Sum
+from pyhulk.quicken import MAX_DEOPTS, WARMUP, Adaptive, reset_stats, stats
+from pyhulk.resolver import resolve_function
+
+PROGRAM = """
+function fib(n) => if (n > 1) fib(n - 1) + fib(n - 2) else n;
+function area(r) => r * r * 3.14;
+function greet(name) => "hi " + name;
+fib(15) + area(2.0);
+"""
+
+
+class TestQuicken(unittest.TestCase):
+    def setUp(self):
+        reset_stats()
+
+    def tearDown(self):
+        pass
+
+    def _interpret(self, text, engine="resolved", ctx=None):
+        interpreter = Interpreter(Parser(Lexer(text)), engine=engine)
+        interpreter.GLOBAL_SCOPE = ctx if ctx is not None else Context()
+        return interpreter.interpret()
+
+    def _body(self, ctx, name):
+        fun_decl = next(value for key, value in ctx._dict.items() if key.value == name)
+        return resolve_function(fun_decl).body
+
+    def test_same_results(self):
+        for text in (PROGRAM, PROGRAM + 'greet("bob");', "1 + 2.5 * 2 - 7 / 2 + 2 ^ 10 % 7;", "3 > 2.5;"):
+            with self.subTest(text=text):
+                self.assertEqual(self._interpret(text), self._interpret(text, engine="tree"))
+
+    def test_specialized(self):
+        ctx = Context()
+        self._interpret(PROGRAM + "area(2.0);" * WARMUP, ctx=ctx)
+        counts = stats()
+        self.assertGreater(counts["specialized"], 0)
+        self.assertEqual(counts["deoptimized"], 0)
+        self.assertIn("Higher[int,int]", counts["kinds"])
+        # `r * r * 3.14`, the literal is read in place
+        self.assertEqual(type(self._body(ctx, "area")).__name__, "Mult[float,float]")
+
+    def test_warmup(self):
+        ctx = Context()
+        self._interpret("function add(a, b) => a + b;" + "add(1, 2);" * (WARMUP - 1), ctx=ctx)
+        body = self._body(ctx, "add")
+        self.assertIs(type(body).__bases__[0], Adaptive)
+        self._interpret("add(1, 2);", ctx=ctx)
+        self.assertEqual(type(body).__name__, "Sum[int,int]")
+        self.assertIsInstance(body, Sum)
+
+    def test_deoptimize(self):
+        ctx = Context()
+        self._interpret("function add(a, b) => a + b;" + "add(1, 2);" * WARMUP, ctx=ctx)
+        body = self._body(ctx, "add")
+        self.assertEqual(self._interpret('add("a", "b");', ctx=ctx), "ab")
+        self.assertIs(type(body).__bases__[0], Adaptive)
+        self.assertEqual(stats()["deoptimized"], 1)
+
+        # flip-flopping sites end up generic
+        for _ in range(MAX_DEOPTS):
+            self._interpret("add(1, 2);" * WARMUP, ctx=ctx)
+            self.assertEqual(self._interpret("add(1.5, 2);", ctx=ctx), 3.5)
+        self.assertEqual(type(body).__name__, "GenericSum")
+        self.assertEqual(stats()["generic"], 1)
+        self.assertEqual(self._interpret('add("a", "b");', ctx=ctx), "ab")
+
+    def test_errors(self):
+        ctx = Context()
+        self._interpret("function div(a, b) => a / b;" + "div(1, 2);" * WARMUP, ctx=ctx)
+        with self.assertRaises(ZeroDivisionError):
+            self._interpret("div(1, 0);", ctx=ctx)
+        with self.assertRaises(TypeError):
+            self._interpret('div("a", 1);', ctx=ctx)
+
+    def test_parsed_tree_untouched(self):
+        tree = Parser(Lexer("function sq(x) => x * x;" + "sq(3);" * WARMUP * 2)).parse()
+        Interpreter(tree=tree, engine="resolved").interpret()
+        self.assertIs(type(tree.blocks[0].block_node).__name__, "Mult")
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestQuicken))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
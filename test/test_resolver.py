@@ -0,0 +1,92 @@
+import unittest
+import unittest.mock
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import Parser, Interpreter, Context
+from pyhulk.resolver import resolve, resolve_function, LocalVariable, GlobalVariable, ResolveError
+
+
+class TestResolver(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _resolve(self, text, globals_=None):
+        return resolve(Parser(Lexer(text)).parse(), globals_ or {})
+
+    def _interpret(self, text, ctx=None):
+        interpreter = Interpreter(Parser(Lexer(text)), engine="resolved")
+        if ctx is not None:
+            interpreter.GLOBAL_SCOPE = ctx
+        return interpreter.interpret()
+
+    def test_addresses(self):
+        tree = self._resolve("let x = 1 in let y = 2 in y;")
+        outer = tree.blocks[0]
+        self.assertEqual((outer.size, outer.body.size), (1, 1))
+        self.assertEqual(outer.body.body.slot, 0)
+
+        fun_decl = self._resolve("function f(a, b) => b + f;").blocks[0].fun_decl
+        function = resolve_function(fun_decl)
+        b, f = function.body.left, function.body.right
+        self.assertIsInstance(b, LocalVariable)
+        # the function itself comes after its parameters
+        self.assertEqual((b.slot, f.slot, function.nlocals), (1, 2, 3))
+
+    def test_shadowing(self):
+        result = self._interpret("let x = 2 in let x = 10 in x + 1;")
+        self.assertEqual(result, 11)
+
+        # a let only sees its own bindings
+        with self.assertRaises(ResolveError):
+            self._resolve("let x = 2 in let y = x in y;")
+
+    def test_globals(self):
+        tree = self._resolve("var a = 1; a + 1;")
+        self.assertIsInstance(tree.blocks[1].left, GlobalVariable)
+
+        # only the top level reads them
+        with self.assertRaises(ResolveError):
+            self._resolve("function f(n) => n + a; var a = 1;")
+
+    def test_undefined_at_resolve_time(self):
+        ctx = Context()
+        with self.assertRaises(ResolveError):
+            self._interpret("var a = 1; doko;", ctx)
+        # nothing ran
+        self.assertEqual(ctx._dict, {})
+
+    def test_undefined_in_function(self):
+        with self.assertRaises(NameError):
+            self._resolve("function f(n) => n + doko;")
+
+    def test_let_hides_arguments(self):
+        with self.assertRaises(ResolveError):
+            self._interpret("function blob(x) => let y = x + 1 in y * x; blob(3);", Context())
+
+    def test_shared_global_scope(self):
+        ctx = Context()
+        Interpreter(Parser(Lexer("function sq(x) => x * x;")), engine="tree").tree(ctx)
+
+        self.assertEqual(self._interpret("sq(4);", ctx), 16)
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    #s.addTests(load_from(TestAPI))
+    #s.addTests(load_from(TestPopulate))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
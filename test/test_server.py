@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from . import TEST_DIR
+import pyhulk
+from pyhulk.server import Histogram, Server, program_id
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _session(self, *batches, **kwargs):
+        """
+        Responses by id to the requests, sent on one connection. A batch is
+        answered before the next one is sent.
+        """
+
+        async def session():
+            server = Server(workers=2, **kwargs)
+            responses = {}
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "hulk.sock")
+                listener = await server.start(path=path)
+                try:
+                    reader, writer = await asyncio.open_unix_connection(path)
+                    for requests in batches:
+                        for request in requests:
+                            line = request if isinstance(request, str) else json.dumps(request)
+                            writer.write(line.encode("utf-8") + b"\n")
+                        await writer.drain()
+                        for _ in requests:
+                            response = json.loads(await reader.readline())
+                            responses[response["id"]] = response
+                    writer.close()
+                    await writer.wait_closed()
+                    # let the server see the end of the stream
+                    await asyncio.sleep(0.01)
+                finally:
+                    listener.close()
+                    await listener.wait_closed()
+                    server.close()
+            return responses
+
+        return asyncio.run(session())
+
+    def test_compile_evaluate(self):
+        source = "x * 2 + y;"
+        key = program_id(source)
+        responses = self._session(
+            [{"id": 1, "op": "compile", "source": source}],
+            [{"id": 2, "op": "evaluate", "program": key, "bindings": {"x": 1, "y": 2}}],
+        )
+        self.assertEqual(responses[1], {"id": 1, "ok": True, "program": key})
+        self.assertEqual(responses[2]["value"], 4)
+
+    def test_errors(self):
+        responses = self._session([
+            {"id": 1, "op": "evaluate", "program": "nope"},
+            {"id": 2, "op": "compile", "source": "1 +"},
+            {"id": 3, "op": "evaluate", "source": "1 / x;", "bindings": {"x": 0}},
+            {"id": 4, "op": "fly"},
+            "not json",
+        ])
+        self.assertIn("Unknown program", responses[1]["error"])
+        self.assertFalse(responses[2]["ok"])
+        self.assertIn("ZeroDivisionError", responses[3]["error"])
+        self.assertIn("Unknown op", responses[4]["error"])
+        self.assertIn("Invalid JSON", responses[None]["error"])
+
+    def test_stats(self):
+        key = program_id("x + 1;")
+        requests = [{"id": i, "op": "evaluate", "source": "x + 1;", "bindings": {"x": i}} for i in range(10)]
+        responses = self._session(
+            requests,
+            [{"id": "stats", "op": "stats"}],
+            [{"id": "drop", "op": "drop", "program": key}],
+            [{"id": "again", "op": "evaluate", "program": key}],
+        )
+        self.assertEqual([responses[i]["value"] for i in range(10)], list(range(1, 11)))
+        stats = responses["stats"]
+        self.assertEqual(stats["programs"], 1)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["latency"]["evaluate"]["count"], 10)
+        self.assertTrue(responses["drop"]["dropped"])
+        self.assertFalse(responses["again"]["ok"])
+
+    def test_programs_kept(self):
+        async def session():
+            server = Server(workers=1)
+            try:
+                key = (await server.handle({"op": "compile", "source": "x - 1;"}))["program"]
+                program = server.programs[key]
+                response = await server.handle({"op": "evaluate", "program": key, "bindings": {"x": 3}})
+                await server.handle({"op": "drop", "program": key})
+                return program, response, dict(server.programs)
+            finally:
+                server.close()
+
+        before = pyhulk.cache_stats()
+        program, response, programs = asyncio.run(session())
+        self.assertIsInstance(program, pyhulk.Program)
+        self.assertEqual(response["value"], 2)
+        self.assertEqual(programs, {})
+        # not through the cache of `pyhulk.compile`
+        self.assertEqual(pyhulk.cache_stats(), before)
+
+    def test_processes(self):
+        responses = self._session(
+            [{"id": i, "op": "evaluate", "source": "x * x;", "bindings": {"x": i}} for i in range(4)],
+            processes=True,
+        )
+        self.assertEqual([responses[i]["value"] for i in range(4)], [0, 1, 4, 9])
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in (0.000001, 0.000003, 0.001, 0.002):
+            histogram.add(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 4)
+        self.assertEqual(snapshot["p50_us"], 4)
+        self.assertEqual(snapshot["p99_us"], 2048)
+        self.assertEqual(sum(snapshot["buckets"].values()), 4)
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestServer))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,93 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from . import TEST_DIR
+from pyhulk.limits import BudgetExceeded, Limits
+from pyhulk.manage import get_command
+from pyhulk.parser import Context
+from pyhulk.stream import run_stream, statements
+
+SCRIPT = """var a = 20;
+function twice(x) => x * 2;
+"a;b";
+twice(a) + 1;
+let b = 2 in b * 11;
+"""
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _script(self, text):
+        path = Path(self.directory.name) / "script.hulk"
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def test_statements(self):
+        texts = [text.strip() for _, text in statements(SCRIPT.encode("utf-8"))]
+        self.assertEqual(texts[2], '"a;b";')
+        self.assertEqual(len(texts), 5)
+        # the rest without a `;` goes to the parser
+        self.assertEqual(list(statements(b"1; 2")), [(0, "1;"), (2, " 2")])
+        self.assertEqual(list(statements(b"1;\n  \n")), [(0, "1;")])
+
+    def test_unicode(self):
+        path = self._script('var ñ = "día;noche"; ñ;')
+        self.assertEqual(list(run_stream(path, ctx=Context())), [None, "día;noche"])
+
+    def test_run(self):
+        values = list(run_stream(self._script(SCRIPT), ctx=Context()))
+        self.assertEqual(values, [None, None, "a;b", 41, 22])
+
+    def test_optimized(self):
+        values = list(run_stream(self._script(SCRIPT), opt_level=2, ctx=Context()))
+        self.assertEqual(values, [None, None, "a;b", 41, 22])
+
+    def test_lazy(self):
+        # the statements after the first value aren't even parsed yet
+        values = run_stream(self._script("1 + 1; )))"), ctx=Context())
+        self.assertEqual(next(values), 2)
+        with self.assertRaises(SyntaxError) as raised:
+            with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()):
+                next(values)
+        self.assertIn("In the statement starting at line 1", raised.exception.__notes__)
+        # nothing but values on stdout
+        self.assertEqual(out.getvalue(), "")
+
+    def test_empty(self):
+        self.assertEqual(list(run_stream(self._script(""), ctx=Context())), [])
+
+    def test_limits(self):
+        text = "function f(n) => if (n > 0) f(n - 1) else 0;" + "f(10);" * 100
+        with self.assertRaises(BudgetExceeded):
+            list(run_stream(self._script(text), ctx=Context(), limits=Limits(steps=1000)))
+
+    def test_command(self):
+        path = self._script(SCRIPT)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            get_command(["run", "--stream", "--no-cache", str(path)])
+        self.assertEqual(out.getvalue().split("\n"), ["a;b", "41", "22", ""])
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestStream))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,143 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.manage import get_command
+from pyhulk.parser import Context, Function, Interpreter, Parser
+from pyhulk.tiered import Tiering, check_scopes
+from pyhulk.transpiler import TranspileError
+
+PROGRAM = """
+function fib(n) => if (n > 1) fib(n - 1) + fib(n - 2) else n;
+function hyp(a, b) => sqrt(a * a + b * b);
+function area(r) => let pi = 3.14 in pi * 2;
+fib(15) + hyp(3, 4) + area(1);
+"""
+
+
+class TestTiered(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _interpret(self, text, tiering=None, ctx=None, engine="tiered"):
+        options = {"tiering": tiering} if tiering is not None else {}
+        interpreter = Interpreter(Parser(Lexer(text)), engine=engine, **options)
+        interpreter.GLOBAL_SCOPE = ctx if ctx is not None else Context()
+        return interpreter.interpret()
+
+    def _function(self, tiering, name):
+        return next(function for function in tiering.functions.values() if function.name == name)
+
+    def test_same_results(self):
+        expected = self._interpret(PROGRAM, engine="tree")
+        for tiering in (Tiering(), Tiering(threshold=1), Tiering(tier_up=False)):
+            with self.subTest(threshold=tiering.threshold, tier_up=tiering.tier_up):
+                self.assertEqual(self._interpret(PROGRAM, tiering), expected)
+
+    def test_promoted(self):
+        tiering = Tiering(threshold=10)
+        self._interpret(PROGRAM + "hyp(6, 8);" * 10, tiering)
+        promoted = tiering.promoted()
+        self.assertEqual(set(promoted), {"fib", "hyp"})
+        self.assertGreater(promoted["fib"], 0)
+        fib = self._function(tiering, "fib")
+        # the promoting call and the ones it makes run on the tree walker
+        self.assertGreaterEqual(fib.calls, 10)
+        self.assertGreater(fib.compiled_calls, 0)
+        self.assertTrue(fib.source.startswith("def fib(n):"))
+        self.assertIn("compiled", tiering.report())
+
+    def test_no_tier_up(self):
+        tiering = Tiering(threshold=1, tier_up=False)
+        self._interpret(PROGRAM, tiering)
+        self.assertEqual(tiering.promoted(), {})
+        # every call of fib(15) on the tree walker
+        self.assertEqual(self._function(tiering, "fib").calls, 1973)
+
+    def test_check_scopes(self):
+        def declaration(text):
+            return Parser(Lexer(text)).parse().blocks[0]
+
+        for text, reason in (
+            ("function f(x) => g(x);", "calls g"),
+            ("function f(x) => let y = 2 in y * x;", "reads x"),
+            ("function f(x) => let y = 2 in f(y);", "calls f"),
+            ("function f(x) => f;", "reads f"),
+            ("function f(f) => 1;", "parameter"),
+        ):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(TranspileError, reason):
+                    check_scopes(declaration(text))
+        natives = check_scopes(declaration("function f(x) => sqrt(x) + len(str(x));"))
+        self.assertEqual(set(natives), {"sqrt", "len", "str"})
+
+    def test_not_promoted(self):
+        tiering = Tiering(threshold=2)
+        ctx = Context()
+        self._interpret("var k = 3; function scale(x) => if (x > 100) k * x else x;", tiering, ctx)
+        self.assertEqual(self._interpret("scale(1) + scale(2) + scale(3);", tiering, ctx), 6)
+        self.assertEqual(self._function(tiering, "scale").reason, "reads k")
+        self.assertEqual(tiering.promoted(), {})
+
+    def test_impure(self):
+        tiering = Tiering(threshold=3)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self._interpret("function show(x) => print(x * 2);" + "show(1);" * 5, tiering)
+        # never run twice
+        self.assertEqual(out.getvalue(), "2\n" * 5)
+        self.assertEqual(tiering.promoted(), {"show": None})
+        self.assertEqual(self._function(tiering, "show").compiled_calls, 2)
+
+    def test_errors(self):
+        tiering = Tiering(threshold=1)
+        ctx = Context()
+        self._interpret("function div(a, b) => a / b;", tiering, ctx)
+        # the promoting call raises, the next one promotes
+        with self.assertRaises(ZeroDivisionError):
+            self._interpret("div(1, 0);", tiering, ctx)
+        self.assertEqual(tiering.promoted(), {})
+        self.assertEqual(self._interpret("div(1, 2);", tiering, ctx), 0.5)
+        self.assertIn("div", tiering.promoted())
+        with self.assertRaises(ZeroDivisionError):
+            self._interpret("div(1, 0);", tiering, ctx)
+
+    def test_parsed_tree_untouched(self):
+        tree = Parser(Lexer("function sq(x) => if (x > 0) sq(x - 1) else 0; sq(20);")).parse()
+        Interpreter(tree=tree, engine="tiered", tiering=Tiering(threshold=2)).interpret()
+        self.assertIs(type(tree.blocks[1]), Function)
+        self.assertIs(type(tree.blocks[0].block_node.tesis), Function)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "fib.hulk"
+            path.write_text(PROGRAM, encoding="utf-8")
+            with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()) as err:
+                get_command(["run", "--engine", "tiered", "--no-cache", "--tier-report", str(path)])
+                with self.assertRaises(SystemExit):
+                    get_command(["run", "--no-tier-up", str(path)])
+        self.assertEqual(out.getvalue(), "621.28\n")
+        self.assertIn("fib", err.getvalue())
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestTiered))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
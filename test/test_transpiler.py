@@ -0,0 +1,121 @@
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import Parser
+from pyhulk.transpiler import transpile, compile_file, load_compiled
+from pyhulk.manage import get_command, run
+
+
+class TestTranspiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, text):
+        namespace = {}
+        exec(transpile(Parser(Lexer(text)).parse()), namespace)
+        return namespace["hulk_main"]()
+
+    def test_expression(self):
+        self.assertEqual(self._run("((5 * 2) + 10) - 2 ^ 2;"), 16)
+        self.assertEqual(self._run('if (1 == 0) "blob" else "doko";'), "doko")
+
+    def test_function(self):
+        result = self._run("function fib(n) => if (n > 1) fib(n-1) + fib(n-2) else 1; fib(10);")
+
+        self.assertEqual(result, 89)
+
+    def test_let_shadowing(self):
+        result = self._run("function f(n) => let x = n + 1 in (let n = 3 in n) + n + x; f(2);")
+
+        self.assertEqual(result, 8)
+
+    def test_keyword_names(self):
+        result = self._run("var lambda = 2; function def(class) => class + lambda; def(1);")
+
+        self.assertEqual(result, 3)
+
+    def test_compile_and_run(self):
+        script = self.dir / "blob.hulk"
+        script.write_text("function sq(x) => x * x; sq(7);")
+
+        self.assertIsNone(load_compiled(script))
+        output = compile_file(script)
+        self.assertEqual(output, self.dir / "blob.py")
+        self.assertEqual(load_compiled(script).hulk_main(), 49)
+
+        with unittest.mock.patch("pyhulk.manage.Interpreter") as interpreter:
+            self.assertEqual(run(script), 49)
+        interpreter.assert_not_called()
+
+    def test_engine_asked_for(self):
+        script = self.dir / "blob.hulk"
+        script.write_text("function sq(x) => x * x; sq(7);")
+        compile_file(script)
+
+        with unittest.mock.patch("pyhulk.manage.load_compiled") as load:
+            self.assertEqual(run(script, "vm"), 49)
+            self.assertEqual(run(script, opt_level=1), 49)
+        load.assert_not_called()
+
+    def test_no_overwrite(self):
+        script = self.dir / "blob.hulk"
+        script.write_text("1;")
+        module = self.dir / "blob.py"
+        module.write_text("print('handwritten')\n")
+
+        with self.assertRaises(FileExistsError):
+            compile_file(script)
+        self.assertEqual(module.read_text(), "print('handwritten')\n")
+        with unittest.mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            get_command(["compile", str(script)])
+
+        # its own modules are rebuilt
+        module.unlink()
+        compile_file(script)
+        script.write_text("2;")
+        compile_file(script)
+        self.assertEqual(load_compiled(script).hulk_main(), 2)
+
+    def test_stale_artifact(self):
+        script = self.dir / "blob.hulk"
+        script.write_text("1;")
+        compile_file(script)
+        script.write_text("2;")
+
+        self.assertIsNone(load_compiled(script))
+        self.assertEqual(run(script), 2)
+
+    def test_command(self):
+        script = self.dir / "blob.hulk"
+        script.write_text("3 * 3;")
+
+        with unittest.mock.patch("builtins.print") as print_:
+            get_command(["compile", str(script)])
+            get_command(["run", str(script)])
+        print_.assert_called_with(9)
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    #s.addTests(load_from(TestAPI))
+    #s.addTests(load_from(TestPopulate))
+
+    return s
+
+
+def run_suite():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run_suite()
@@ -0,0 +1,127 @@
+import unittest
+
+from . import TEST_DIR
+from pyhulk.lexer import tokenize
+from pyhulk.parser import Parser
+from pyhulk.vectorize import (
+    NotVectorizable,
+    evaluate_columns,
+    evaluate_rows,
+    evaluate_vectorized,
+    numpy,
+)
+
+
+def parse(text):
+    return Parser(tokenize(text)).parse()
+
+
+class TestRows(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_rows(self):
+        tree = parse("if (x > 1) x * y else y;")
+        self.assertEqual(evaluate_rows(tree, {"x": [1, 2, 3], "y": [10, 20, 30]}), [10, 40, 90])
+
+    def test_lengths(self):
+        with self.assertRaises(ValueError):
+            evaluate_rows(parse("x + y;"), {"x": [1, 2], "y": [1]})
+
+
+@unittest.skipIf(numpy is None, "NumPy isn't installed")
+class TestVectorize(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _same(self, text, **columns):
+        columns = {name: numpy.asarray(column) for name, column in columns.items()}
+        tree = parse(text)
+        vectorized = evaluate_vectorized(tree, columns)
+        self.assertEqual(vectorized.tolist(), evaluate_rows(tree, columns))
+        return vectorized
+
+    def test_arithmetic(self):
+        self._same("x + y * 2 - x % 3 ^ 2;", x=[1, 5, -7], y=[2, 3, 4])
+        self._same("x / 4 + y;", x=[1, 5, -7], y=[0.5, 1.5, 2.5])
+        self._same("x + 1;", x=[True, False])
+
+    def test_comparisons(self):
+        self._same("x > y;", x=[1, 5, 2], y=[2, 3, 2])
+        self._same("x == y;", x=[1, 5, 2], y=[2, 3, 2])
+        self._same("x < 3;", x=[1, 5, 2])
+
+    def test_conditional(self):
+        self._same("if (x > 2) x * 10 else 0 - x;", x=[1, 5, 2])
+
+    def test_let_and_var(self):
+        self._same("var z = x * 2; z + let a = 3 in a;", x=[1, 2])
+
+    def test_constant(self):
+        self.assertEqual(self._same("1 + 2;", x=[1, 2, 3]).tolist(), [3, 3, 3])
+
+    def test_not_vectorizable(self):
+        for text, columns in [
+            ("function f(a) => a; f(x);", {"x": [1, 2]}),
+            ('x == "a";', {"x": ["a", "b"]}),
+            ("x ^ 40;", {"x": [3, 10]}),
+            ("1 / x;", {"x": [1, 0]}),
+        ]:
+            with self.subTest(text=text):
+                with self.assertRaises(NotVectorizable):
+                    evaluate_vectorized(parse(text), {k: numpy.asarray(v) for k, v in columns.items()})
+
+    def test_fallback(self):
+        self.assertEqual(
+            evaluate_columns(parse("x ^ 40;"), {"x": numpy.array([3, 10])}).tolist(),
+            [3 ** 40, 10 ** 40],
+        )
+        self.assertEqual(
+            evaluate_columns(parse("function f(a) => a * 2; f(x);"), {"x": numpy.arange(3)}).tolist(),
+            [0, 2, 4],
+        )
+        with self.assertRaises(ZeroDivisionError):
+            evaluate_columns(parse("1 / x;"), {"x": numpy.array([1, 0])})
+
+    def test_mixed_results(self):
+        result = evaluate_columns(parse('if (x > 0) "pos" else x;'), {"x": numpy.array([1, -1, 3])})
+        self.assertEqual(result.dtype, object)
+        self.assertEqual(result.tolist(), ["pos", -1, "pos"])
+
+    def test_unread_names(self):
+        # `y` is never read, every row takes the first branch
+        tree = parse("if (x > 0) x else y;")
+        self.assertEqual(evaluate_columns(tree, {"x": numpy.array([1, 2, 3])}).tolist(), [1, 2, 3])
+        with self.assertRaises(NameError):
+            evaluate_columns(tree, {"x": numpy.array([1, -2])})
+
+    def test_natives(self):
+        self._same("sqrt(x) + 1;", x=[1, 4, 2])
+        with self.assertRaises(NotVectorizable):
+            evaluate_vectorized(parse("exp(x);"), {"x": numpy.arange(3)})
+        with self.assertRaises(ValueError):
+            evaluate_columns(parse("sqrt(x);"), {"x": numpy.array([1, -1])})
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    s.addTests(load_from(TestRows))
+    s.addTests(load_from(TestVectorize))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()
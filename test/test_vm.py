@@ -0,0 +1,101 @@
+import unittest
+import unittest.mock
+
+from . import TEST_DIR
+from pyhulk.lexer import Lexer
+from pyhulk.parser import Parser, Interpreter
+from pyhulk.bytecode import Op, compile_program, compile_function
+from pyhulk.vm import StackOverflow
+
+
+class TestVM(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def _interpret(self, text, **options):
+        return Interpreter(Parser(Lexer(text)), engine="vm", **options).interpret()
+
+    def test_bad_engine(self):
+        with self.assertRaises(ValueError):
+            Interpreter(Parser(Lexer("1;")), engine="blob")
+
+    def test_bytecode(self):
+        code = compile_program(Parser(Lexer("let x = 2 in x * 3;")).parse())
+
+        self.assertEqual(code.nlocals, 1)
+        self.assertEqual(
+            [Op(op) for op in code.instructions[::2]],
+            [Op.CONST, Op.STORE_LOCAL, Op.LOAD_LOCAL, Op.CONST, Op.MUL, Op.RETURN],
+        )
+        self.assertIn("STORE_LOCAL", code.disassemble())
+
+    def test_self_slot(self):
+        tree = Parser(Lexer("function blob(x) => blob;")).parse()
+        code = compile_function(tree.blocks[0])
+
+        self.assertEqual(code.self_slot, 1)
+        self.assertEqual(code.nlocals, 2)
+
+    def test_deep_recursion(self):
+        # frames live on the heap, not on the Python stack
+        result = self._interpret(
+            "function count(n) => if (n > 0) 1 + count(n - 1) else 0; count(5000);"
+        )
+
+        self.assertEqual(result, 5000)
+
+    def test_tail_call(self):
+        tree = Parser(Lexer("function loop(n) => if (n == 0) 0 else loop(n - 1);")).parse()
+        code = compile_function(tree.blocks[0])
+
+        self.assertIn(int(Op.TAIL_CALL), code.instructions[::2])
+        self.assertNotIn(int(Op.CALL), code.instructions[::2])
+
+    def test_tail_recursion_constant_frames(self):
+        result = self._interpret(
+            "function loop(n, acc) => if (n == 0) acc else loop(n - 1, acc + n);"
+            "loop(100000, 0);",
+            max_frames=2,
+        )
+
+        self.assertEqual(result, 5000050000)
+
+    def test_frame_budget(self):
+        with self.assertRaises(StackOverflow):
+            self._interpret(
+                "function count(n) => if (n > 0) 1 + count(n - 1) else 0; count(100);",
+                max_frames=50,
+            )
+
+    def test_options_need_an_engine(self):
+        with self.assertRaises(ValueError):
+            Interpreter(Parser(Lexer("1;")), max_frames=2)
+
+    def test_arity(self):
+        with self.assertRaises(TypeError):
+            self._interpret("function blob(x) => x; blob(1, 2);")
+
+    def test_undefined(self):
+        with self.assertRaises(NameError):
+            self._interpret("doko;")
+
+
+def main_suite() -> unittest.TestSuite:
+    s = unittest.TestSuite()
+    load_from = unittest.defaultTestLoader.loadTestsFromTestCase
+    #s.addTests(load_from(TestAPI))
+    #s.addTests(load_from(TestPopulate))
+
+    return s
+
+
+def run():
+    t = unittest.TextTestRunner()
+    t.run(main_suite())
+
+
+if __name__ == "__main__":
+    run()